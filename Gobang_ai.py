@@ -0,0 +1,561 @@
+"""
+A computer player built on the GoBang rules.
+It uses iterative deepening negamax with alpha-beta pruning, a transposition table keyed by GoBang.hash,
+killer and history move ordering, and it only looks at the spots near the chess on the board.
+
+The transposition table and the history table are kept from one move to the next, so a search starts with what
+the last ones found. The table has two generations: new entries go to the young one, and when it is full
+the old one is dropped and the young one becomes old. An entry of the old generation which is used again
+goes back to the young one, so the table keeps the entries which are used and never holds more than table_size.
+On the time of the other player the AI can ponder: it searches the position after the reply it expects,
+and if the reply comes the search of the next move starts from the depth the ponder reached.
+"""
+import time
+
+from Gobang_core import Errorcode, GoBang
+from Gobang_eval import WINDOW_SCORES, PatternEvaluator
+
+# score of a won game, the number of steps to the end is taken off so the faster win is better
+WIN_SCORE = 10000000
+# scores above this one are wins or losses
+WIN_BOUND = WIN_SCORE - 1000
+INFINITY = WIN_SCORE + 1
+
+# flags of the transposition table entries
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class SearchTimeout(Exception):
+    """
+    raised inside the search when the time budget is used up
+    """
+
+
+class SearchResult:
+    def __init__(self, move, score, depth, nodes, elapsed, pv, table_probes=0, table_hits=0,
+                 ponder_hit=False, saved=0.0):
+        """
+        move: the best (x, y), None if there is no spot to move
+        score: the score of the move from the view of the player to move
+        depth: the deepest finished iteration
+        nodes: the number of searched positions
+        elapsed: seconds of the search
+        pv: the principal variation, a list of (x, y) starting with move
+        table_probes, table_hits: the transposition table lookups of the search and how many found an entry
+        ponder_hit: True if the position was pondered, the search started from the depth of the ponder
+        saved: seconds of the ponder on the position, the search did not have to do them again
+        """
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.pv = pv
+        self.table_probes = table_probes
+        self.table_hits = table_hits
+        self.ponder_hit = ponder_hit
+        self.saved = saved
+
+    def get_nps(self):
+        """
+        return the nodes per second of the search
+        """
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def get_hit_rate(self):
+        """
+        return the part of the transposition table lookups which found an entry
+        """
+        return self.table_hits / self.table_probes if self.table_probes else 0.0
+
+    def __repr__(self):
+        return (f'SearchResult(move={self.move}, score={self.score}, depth={self.depth}, '
+                f'nodes={self.nodes}, nps={self.get_nps():.0f})')
+
+
+class AlphaBetaAI:
+
+    def __init__(self, time_budget=1.0, max_depth=12, radius=2, max_candidates=12,
+                 table_size=1 << 20, evaluator=PatternEvaluator):
+        """
+        time_budget: seconds for one move
+        max_depth: the deepest iteration of iterative deepening
+        radius: only the empty spots within radius of a chess are searched
+        max_candidates: only the best ordered spots are searched in each position, None searches all of them
+        table_size: the biggest number of entries of the transposition table, both generations together
+        evaluator: the class of the static evaluation, evaluator(game) follows the game
+            and evaluator(game).evaluate() scores it from the view of the player to move,
+            PatternEvaluator or ScanEvaluator of Gobang_eval
+        """
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.radius = radius
+        self.max_candidates = max_candidates
+        self.table_size = table_size
+        self.evaluator = evaluator
+        # the evaluator of the game copy of the current search
+        self.position_evaluator = None
+
+        # hash -> (depth, score, flag, best move), the young generation and the old one
+        self.table = {}
+        self.old_table = {}
+        # the two last moves which caused a cutoff at each ply
+        self.killers = {}
+        # (x, y) -> the sum of depth * depth of its cutoffs, halved at each search so the old cutoffs fade
+        self.history = {}
+        self.nodes = 0
+        self.probes = 0
+        self.hits = 0
+        self.deadline = 0.0
+        # a function which returns True when the search must stop before the deadline, used by ponder
+        self.stop = None
+        # (hash, depth, move, score, seconds) of the last ponder, used by the next search
+        self.pondered = None
+        # the root moves which the search must not play, see search
+        self.exclude = frozenset()
+        # the number of chess within radius of each empty spot, kept by __play and __undo
+        self.near = {}
+        # the chess of the searched position, grid[x][y] like GoBang.map, kept by __play and __undo
+        # so __order does not build the map of the board at every node
+        self.grid = []
+        # the totals of all the searches, see get_stats
+        self.stats = {'searches': 0, 'ponders': 0, 'ponder_hits': 0, 'saved': 0.0,
+                      'table_probes': 0, 'table_hits': 0, 'generations': 0}
+
+    def __call__(self, game):
+        """
+        move policy interface, return the (x, y) to move for the game
+        """
+        return self.search(game).move
+
+    def seed(self, value):
+        """
+        called by the tournament before each game (see Gobang_tournament.play_one): the tables of the games
+        before are dropped, so a game does not depend on which games the process played first
+        the search has no random part, value is not used
+        """
+        self.table = {}
+        self.old_table = {}
+        self.killers = {}
+        self.history = {}
+        self.pondered = None
+
+    def search(self, game, exclude=()):
+        """
+        search the best move of the player to move in the game within the time budget
+        the moves in exclude are not searched at the root, it finds the second best move and so on (multi-PV)
+        the game is not changed, the search works on a copy
+        return a SearchResult
+        """
+        begin = time.perf_counter()
+        self.deadline = begin + self.time_budget
+        pondered = self.pondered
+        self.pondered = None
+        self.exclude = frozenset(exclude)
+        try:
+            return self.__search(game, begin, pondered)
+        finally:
+            self.exclude = frozenset()
+
+    def __search(self, game, begin, pondered):
+        self.__new_search()
+
+        game = game.copy()
+        self.position_evaluator = self.evaluator(game)
+        root_steps = game.get_steps()
+        if game.get_current_status() in (1, 2) and root_steps == 0 and not self.exclude:
+            center = (game.map_size // 2, game.map_size // 2)
+            return SearchResult(center, 0, 0, 0, time.perf_counter() - begin, [center])
+        self.__build_near(game)
+        moves = [move for move in self.__candidates(game) if move not in self.exclude]
+        if game.get_current_status() not in (1, 2) or not moves:
+            return SearchResult(None, 0, 0, 0, time.perf_counter() - begin, [])
+
+        best_move = self.__order(game, moves, 0, None)[0]
+        best_score = 0
+        finished = 0
+        ponder_hit = pondered is not None and pondered[0] == game.hash and not self.exclude
+        saved = 0.0
+        if ponder_hit:
+            # the other player played the expected reply, go on from the depth of the ponder
+            _, finished, move, score, saved = pondered
+            if move is not None:
+                best_move, best_score = move, score
+            self.stats['ponder_hits'] += 1
+            self.stats['saved'] += saved
+        best_move, best_score, finished = self.__deepen(game, best_move, best_score, finished, begin)
+        elapsed = time.perf_counter() - begin
+        self.stats['searches'] += 1
+        self.stats['table_probes'] += self.probes
+        self.stats['table_hits'] += self.hits
+        return SearchResult(best_move, best_score, finished, self.nodes, elapsed,
+                            self.__principal_variation(game, best_move), self.probes, self.hits,
+                            ponder_hit, saved)
+
+    def ponder(self, game, stop):
+        """
+        think on the time of the other player, game is the position after the move of this AI:
+        the reply of the other player is guessed from the transposition table, then the position after it
+        is searched until stop() returns True, the depth is max_depth or the result is proved
+        the next search starts from the depth of the ponder if the other player plays the guessed reply
+        return the guessed reply, None when there is nothing to ponder
+        """
+        if game.get_current_status() not in (1, 2):
+            return None
+        begin = time.perf_counter()
+        self.deadline = float('inf')
+        self.__new_search()
+        position = game.copy()
+        self.position_evaluator = self.evaluator(position)
+        self.__build_near(position)
+        entry = self.__probe(position.hash)
+        reply = entry[3] if entry is not None else None
+        moves = self.__candidates(position)
+        if not moves:
+            return None
+        if reply not in moves:
+            reply = self.__order(position, moves, 0, None)[0]
+        self.__play(position, reply)
+        moves = self.__candidates(position)
+        if position.get_current_status() not in (1, 2) or not moves:
+            return reply
+        self.stop = stop
+        try:
+            move, score, depth = self.__deepen(position, self.__order(position, moves, 0, None)[0], 0, 0, None)
+        finally:
+            self.stop = None
+        self.pondered = (position.hash, depth, move, score, time.perf_counter() - begin)
+        self.stats['ponders'] += 1
+        return reply
+
+    def get_stats(self):
+        """
+        return the totals of the searches: searches, ponders, ponder hits and their rate, seconds saved
+        by the ponder hits, transposition table lookups, hits and hit rate, the generations of the table
+        and its size now
+        """
+        stats = dict(self.stats)
+        stats['ponder_hit_rate'] = stats['ponder_hits'] / stats['ponders'] if stats['ponders'] else 0.0
+        stats['table_hit_rate'] = stats['table_hits'] / stats['table_probes'] if stats['table_probes'] else 0.0
+        stats['table_entries'] = len(self.table) + len(self.old_table)
+        return stats
+
+    def __new_search(self):
+        """
+        reset the counters of one search, the tables are kept
+        """
+        self.nodes = 0
+        self.probes = 0
+        self.hits = 0
+        self.killers = {}
+        self.history = {move: value >> 1 for move, value in self.history.items() if value > 1}
+
+    def __deepen(self, game, best_move, best_score, finished, begin):
+        """
+        iterative deepening from the depth after finished until the deadline, the stop function,
+        max_depth or a proved result, begin is the start of a timed search (None for ponder)
+        return (move, score, depth) of the deepest finished iteration
+        """
+        root_steps = game.get_steps()
+        for depth in range(finished + 1, self.max_depth + 1):
+            try:
+                score, move = self.__search_root(game, depth, best_move)
+            except SearchTimeout:
+                # the search stopped in the middle of a line, go back to the root position
+                while game.get_steps() > root_steps:
+                    game.rollback()
+                self.__build_near(game)
+                break
+            best_move, best_score, finished = move, score, depth
+            # a proved result does not change with a deeper search
+            if abs(score) >= WIN_BOUND:
+                break
+            # the next iteration would not finish in the time left
+            if begin is not None and time.perf_counter() - begin > self.time_budget / 2:
+                break
+        return best_move, best_score, finished
+
+    def __search_root(self, game, depth, first_move):
+        """
+        search all the moves of the root position to depth, first_move is tried first
+        return (score, move)
+        """
+        alpha = -INFINITY
+        best_move = first_move
+        moves = self.__candidates(game)
+        if self.exclude:
+            moves = [move for move in moves if move not in self.exclude]
+        moves = self.__order(game, moves, 0, first_move)
+        for move in moves:
+            self.__play(game, move)
+            score = -self.__negamax(game, depth - 1, -INFINITY, -alpha, 1)
+            self.__undo(game, move)
+            if score > alpha:
+                alpha = score
+                best_move = move
+        # the score without some root moves is not the score of the position
+        if not self.exclude:
+            self.__store(game.hash, depth, alpha, EXACT, best_move, 0)
+        return alpha, best_move
+
+    def __negamax(self, game, depth, alpha, beta, ply):
+        """
+        negamax with alpha-beta pruning, return the score from the view of the player to move
+        """
+        self.nodes += 1
+        if self.nodes & 127 == 0 and (time.perf_counter() > self.deadline
+                                       or (self.stop is not None and self.stop())):
+            raise SearchTimeout()
+        # the last move won the game, so the player to move has lost
+        if game.current_status == 3:
+            return -WIN_SCORE + ply
+        if depth <= 0:
+            return self.position_evaluator.evaluate(game)
+
+        alpha_origin = alpha
+        table_move = None
+        entry = self.__probe(game.hash)
+        self.probes += 1
+        if entry is not None:
+            self.hits += 1
+            entry_depth, entry_score, entry_flag, table_move = entry
+            if entry_depth >= depth:
+                entry_score = self.__score_from_table(entry_score, ply)
+                if entry_flag == EXACT:
+                    return entry_score
+                if entry_flag == LOWER:
+                    alpha = max(alpha, entry_score)
+                else:
+                    beta = min(beta, entry_score)
+                if alpha >= beta:
+                    return entry_score
+
+        moves = self.__order(game, self.__candidates(game), ply, table_move)
+        if not moves:
+            return 0
+        best_score = -INFINITY
+        best_move = moves[0]
+        for move in moves:
+            self.__play(game, move)
+            score = -self.__negamax(game, depth - 1, -beta, -alpha, ply + 1)
+            self.__undo(game, move)
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self.__record_cutoff(move, depth, ply)
+                break
+
+        if best_score <= alpha_origin:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.__store(game.hash, depth, best_score, flag, best_move, ply)
+        return best_score
+
+    def __store(self, key, depth, score, flag, move, ply):
+        """
+        keep the result of a position in the transposition table
+        a won or lost score is saved relative to the position instead of the root
+        """
+        if score >= WIN_BOUND:
+            score += ply
+        elif score <= -WIN_BOUND:
+            score -= ply
+        if len(self.table) >= self.table_size // 2:
+            self.__new_generation()
+        self.table[key] = (depth, score, flag, move)
+
+    def __probe(self, key):
+        """
+        return the entry of a position in the transposition table, None if there is none
+        an entry of the old generation is moved to the young one
+        """
+        entry = self.table.get(key)
+        if entry is None:
+            entry = self.old_table.pop(key, None)
+            if entry is not None:
+                if len(self.table) >= self.table_size // 2:
+                    self.__new_generation()
+                self.table[key] = entry
+        return entry
+
+    def __new_generation(self):
+        """
+        drop the old generation of the transposition table, the young one becomes old
+        """
+        self.old_table = self.table
+        self.table = {}
+        self.stats['generations'] += 1
+
+    def __score_from_table(self, score, ply):
+        """
+        turn a score of the transposition table back to the view of the root
+        """
+        if score >= WIN_BOUND:
+            return score - ply
+        if score <= -WIN_BOUND:
+            return score + ply
+        return score
+
+    def __record_cutoff(self, move, depth, ply):
+        """
+        remember a move which caused a beta cutoff in the killer slots and the history table
+        """
+        killers = self.killers.setdefault(ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        self.history[move] = self.history.get(move, 0) + depth * depth
+
+    def __build_near(self, game):
+        """
+        count the chess within radius of each spot for the position of the game and copy its chess to the grid
+        """
+        self.near = {}
+        self.grid = [list(row) for row in game.map]
+        for _, x, y in game.get_record_move():
+            self.__mark_near(game.map_size, x, y, 1)
+
+    def __mark_near(self, map_size, x, y, change):
+        """
+        add change to the count of every spot within radius of (x, y)
+        """
+        near = self.near
+        radius = self.radius
+        for nx in range(max(0, x - radius), min(map_size, x + radius + 1)):
+            for ny in range(max(0, y - radius), min(map_size, y + radius + 1)):
+                count = near.get((nx, ny), 0) + change
+                if count:
+                    near[(nx, ny)] = count
+                else:
+                    del near[(nx, ny)]
+
+    def __play(self, game, move):
+        """
+        move in the game and update the counts of the near spots and the grid
+        """
+        if game.move(move[0], move[1]) < 0:
+            raise ValueError(f'illegal move {move} in the search')
+        self.grid[move[0]][move[1]] = game.get_last_move()[0]
+        self.__mark_near(game.map_size, move[0], move[1], 1)
+
+    def __undo(self, game, move):
+        """
+        rollback the move and update the counts of the near spots and the grid
+        """
+        game.rollback()
+        self.grid[move[0]][move[1]] = 0
+        self.__mark_near(game.map_size, move[0], move[1], -1)
+
+    def __candidates(self, game):
+        """
+        return the empty spots within radius of a chess, without the forbidden spots of the rule (renju)
+        """
+        board = game.board
+        moves = [spot for spot in self.near if board.get(spot[0], spot[1]) == 0]
+        rule = game.rule
+        if rule.has_forbidden and game.current_status in (1, 2):
+            piece = 1 if game.current_status == 1 else -1
+            moves = [spot for spot in moves if not rule.is_forbidden(board, spot[0], spot[1], piece)]
+        return moves
+
+    def __order(self, game, moves, ply, first_move):
+        """
+        sort the moves: first_move (from the transposition table), then the killer moves,
+        then by the line patterns they make or block and by the history table
+        only the max_candidates best of them are kept
+        """
+        grid = self.grid
+        piece = 1 if game.current_status == 1 else -1
+        killers = self.killers.get(ply, ())
+        history = self.history
+        scored = []
+        for move in moves:
+            if move == first_move:
+                score = 1 << 60
+            else:
+                score = self.__spot_score(grid, game.map_size, move[0], move[1], piece) * 1024
+                score += history.get(move, 0)
+                if move in killers:
+                    score += 1 << 40
+            scored.append((score, move))
+        scored.sort(reverse=True)
+        moves = [move for _, move in scored]
+        if self.max_candidates is not None:
+            moves = moves[:self.max_candidates]
+        return moves
+
+    def __spot_score(self, grid, map_size, x, y, piece):
+        """
+        a cheap guess of how good an empty spot is for both players
+        on every line the connected chess next to the spot are counted for each color,
+        the spot that makes 5 links for the player to move is the best, blocking the other one comes next
+        """
+        total = 0
+        for dx, dy in ((0, 1), (1, 0), (1, 1), (-1, 1)):
+            for color, weight in ((piece, 2), (-piece, 1)):
+                count = 0
+                open_ends = 0
+                for sign in (1, -1):
+                    cur_x = x + dx * sign
+                    cur_y = y + dy * sign
+                    steps = 0
+                    while steps < 4 and 0 <= cur_x < map_size and 0 <= cur_y < map_size \
+                            and grid[cur_x][cur_y] == color:
+                        count += 1
+                        steps += 1
+                        cur_x += dx * sign
+                        cur_y += dy * sign
+                    if 0 <= cur_x < map_size and 0 <= cur_y < map_size and grid[cur_x][cur_y] == 0:
+                        open_ends += 1
+                if count >= 4:
+                    total += 1000000 * weight * weight
+                elif count > 0:
+                    total += WINDOW_SCORES[count + 1] * weight * (open_ends + 1) // 10
+        return total
+
+    def __principal_variation(self, game, first_move):
+        """
+        follow the best moves of the transposition table from the root
+        """
+        pv = []
+        move = first_move
+        seen = set()
+        while move is not None and game.hash not in seen and len(pv) < self.max_depth:
+            seen.add(game.hash)
+            if game.move(move[0], move[1]) < 0:
+                break
+            pv.append(move)
+            if game.get_current_status() not in (1, 2):
+                break
+            entry = self.__probe(game.hash)
+            move = entry[3] if entry is not None else None
+        for _ in pv:
+            game.rollback()
+        return pv
+
+
+def play_game(black, white, game=None, max_steps=None):
+    """
+    let two move policies play a game, a policy is called with the game and returns (x, y)
+    return the GoBang game at the end
+    """
+    if game is None:
+        game = GoBang()
+    if game.get_current_status() == 0:
+        game.start_move()
+    while game.get_current_status() in (1, 2):
+        if max_steps is not None and game.get_steps() >= max_steps:
+            break
+        policy = black if game.get_current_status() == 1 else white
+        move = policy(game)
+        if move is None or game.move(move[0], move[1]) < Errorcode.code_run:
+            break
+    return game
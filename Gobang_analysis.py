@@ -0,0 +1,373 @@
+"""
+Position analysis: the best moves of a position with their scores and principal variations (multi-PV).
+
+A position is a GoBang game or the moves which made it, black first. Analyser searches it with AlphaBetaAI:
+the best move, then the best one without it, and so on, so each of the top moves has a score of its own.
+The search goes to a fixed depth (depth=4) or it has a time limit for the whole position (seconds=2.0),
+shared by the moves.
+
+A batch analyses the position before every move of many games. The games are taken a group at a time,
+the positions of the group which are in the cache or seen twice are searched once, the others are searched
+on a process pool, one task for the positions of a game so the tables of the search are reused along the game.
+The cache is keyed by the Zobrist hash of the position (GoBang.hash, the same in every process) with the
+board size, the rule and the settings of the analysis. It can be saved to a JSON lines file and loaded
+by the next run.
+
+    analyser = Analyser(multi_pv=3, depth=4)
+    analysis = analyser.analyse_moves([(7, 7), (8, 8), (7, 8)])
+    for candidate in analysis.moves:
+        print(candidate.move, candidate.score, candidate.pv)
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from Gobang_ai import AlphaBetaAI
+from Gobang_book import read_games
+from Gobang_core import Errorcode, GoBang, zobrist_table
+
+
+class Candidate:
+    def __init__(self, move, score, pv):
+        """
+        move: the (x, y) to play
+        score: the score of the move from the view of the player to move
+        pv: the principal variation, a list of (x, y) starting with move
+        """
+        self.move = move
+        self.score = score
+        self.pv = pv
+
+    def to_dict(self):
+        return {'move': list(self.move), 'score': self.score, 'pv': [list(move) for move in self.pv]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(tuple(data['move']), data['score'], [tuple(move) for move in data['pv']])
+
+    def __repr__(self):
+        return f'Candidate(move={self.move}, score={self.score}, pv={self.pv})'
+
+
+class Analysis:
+    def __init__(self, moves, depth, nodes, elapsed):
+        """
+        moves: the list of Candidate, the best first
+        depth: the shallowest finished depth of the candidates
+        nodes: the number of searched positions
+        elapsed: seconds of the searches
+        """
+        self.moves = moves
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+
+    def get_best(self):
+        """
+        return the best Candidate, None if there is no move
+        """
+        return self.moves[0] if self.moves else None
+
+    def rank(self, move):
+        """
+        return the place of move among the candidates (0 the best), None if it is not one of them
+        """
+        for place, candidate in enumerate(self.moves):
+            if candidate.move == tuple(move):
+                return place
+        return None
+
+    def to_dict(self):
+        return {'moves': [candidate.to_dict() for candidate in self.moves], 'depth': self.depth,
+                'nodes': self.nodes, 'elapsed': self.elapsed}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls([Candidate.from_dict(candidate) for candidate in data['moves']], data['depth'],
+                   data['nodes'], data['elapsed'])
+
+    def __repr__(self):
+        return f'Analysis(moves={self.moves}, depth={self.depth}, nodes={self.nodes})'
+
+
+class AnalysisCache:
+    """
+    key -> Analysis, see Analyser.key
+    with a path the entries of the file are loaded and the new ones are appended to it, one JSON line each
+    """
+
+    def __init__(self, path=None):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.file = None
+        if path is None:
+            return
+        if os.path.exists(path):
+            with open(path) as file:
+                for line in file:
+                    if line.strip():
+                        data = json.loads(line)
+                        self.entries[data['key']] = Analysis.from_dict(data)
+        self.file = open(path, 'a')
+
+    def get(self, key):
+        """
+        return the Analysis of key, None if it is not in the cache
+        """
+        analysis = self.entries.get(key)
+        if analysis is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return analysis
+
+    def put(self, key, analysis):
+        self.entries[key] = analysis
+        if self.file is not None:
+            data = analysis.to_dict()
+            data['key'] = key
+            self.file.write(json.dumps(data) + '\n')
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class Analyser:
+
+    def __init__(self, multi_pv=3, depth=None, seconds=1.0, cache=None, **options):
+        """
+        multi_pv: the number of best moves of a position
+        depth: search each move to this depth, without time limit; None uses seconds
+        seconds: the time of a position when depth is None, each of the multi_pv searches has its part
+        cache: the AnalysisCache, a new one in memory by default
+        options: the other arguments of AlphaBetaAI (radius, max_candidates, table_size, evaluator)
+        """
+        self.multi_pv = multi_pv
+        self.depth = depth
+        self.seconds = seconds
+        self.cache = cache if cache is not None else AnalysisCache()
+        self.options = options
+        if depth is None:
+            self.ai = AlphaBetaAI(time_budget=seconds / multi_pv, **options)
+        else:
+            self.ai = AlphaBetaAI(time_budget=float('inf'), max_depth=depth, **options)
+
+    def get_settings(self):
+        """
+        return the arguments of the analyser without the cache, a new Analyser(**settings) analyses the same way
+        """
+        return dict(self.options, multi_pv=self.multi_pv, depth=self.depth, seconds=self.seconds)
+
+    def key(self, map_size, rule, hash):
+        """
+        return the cache key of a position: board size, rule, Zobrist hash and the settings of the analysis
+        """
+        limit = f'd{self.depth}' if self.depth is not None else f't{self.seconds:g}'
+        return f'{map_size}:{rule}:{hash:016x}:pv{self.multi_pv}:{limit}'
+
+    def search(self, game):
+        """
+        search the position of game without the cache, return its Analysis
+        """
+        candidates = []
+        depth = None
+        nodes = 0
+        begin = time.perf_counter()
+        for _ in range(self.multi_pv):
+            result = self.ai.search(game, [candidate.move for candidate in candidates])
+            if result.move is None:
+                break
+            candidates.append(Candidate(result.move, result.score, result.pv))
+            depth = result.depth if depth is None else min(depth, result.depth)
+            nodes += result.nodes
+        return Analysis(candidates, depth or 0, nodes, time.perf_counter() - begin)
+
+    def analyse(self, game):
+        """
+        return the Analysis of the position of game, from the cache if it was analysed before
+        """
+        key = self.key(game.map_size, game.rule.name, game.hash)
+        analysis = self.cache.get(key)
+        if analysis is None:
+            analysis = self.search(game)
+            self.cache.put(key, analysis)
+        return analysis
+
+    def analyse_moves(self, moves, map_size=16, rule='freestyle', backend='list'):
+        """
+        return the Analysis of the position after the (x, y) moves, black first
+        the moves can be GoBang.record_move as well, a list of (chess piece type, x, y)
+        """
+        game = GoBang(map_size, backend, rule)
+        game.load_moves([move[-2:] for move in moves])
+        return self.analyse(game)
+
+    def search_games(self, tasks):
+        """
+        search the positions of a list of (map_size, rule, moves, [(step, key)]) games,
+        the position of step is the one before moves[step], the steps are in order
+        and the game goes from one to the next a move at a time
+        return the list of (key, Analysis dict)
+        """
+        results = []
+        for map_size, rule, moves, steps in tasks:
+            game = GoBang(map_size, 'list', rule)
+            game.start_move()
+            for step, key in steps:
+                while game.get_steps() < step:
+                    x, y = moves[game.get_steps()]
+                    if game.move(x, y) < Errorcode.code_run:
+                        # a move the rule refuses (a game of another rule) is put on the board like load_moves
+                        game.load_moves(moves[:game.get_steps() + 1])
+                results.append((key, self.search(game).to_dict()))
+        return results
+
+
+def search_games(tasks, settings):
+    """
+    the task of a worker process, see Analyser.search_games
+    """
+    return Analyser(**settings).search_games(tasks)
+
+
+def position_keys(analyser, moves, map_size, rule):
+    """
+    return the cache key of the position before each of the (x, y) moves of a game
+    """
+    zobrist = zobrist_table(map_size)
+    hash = 0
+    keys = []
+    for step, (x, y) in enumerate(moves):
+        keys.append(analyser.key(map_size, rule, hash))
+        hash ^= zobrist[x][y][step & 1]
+    return keys
+
+
+def game_groups(games, group_size):
+    """
+    group the (moves, winner, map_size) games into lists of group_size
+    """
+    group = []
+    for game in games:
+        group.append(game)
+        if len(group) >= group_size:
+            yield group
+            group = []
+    if group:
+        yield group
+
+
+def analyse_games(games, analyser, rule='freestyle', group_size=64, workers=None):
+    """
+    analyse the position before every move of a stream of (moves, winner, map_size) games
+    yield for each game the list of (move, Analysis), move is the one which was played
+    the positions are searched once with the cache of the analyser, workers > 1 searches them on a process pool
+    """
+    pool = ProcessPoolExecutor(max_workers=workers) if workers is not None and workers > 1 else None
+    settings = analyser.get_settings()
+    try:
+        for group in game_groups(games, group_size):
+            keyed = [position_keys(analyser, moves, map_size, rule) for moves, _, map_size in group]
+            tasks = []
+            wanted = set()
+            cache = analyser.cache
+            for (moves, _, map_size), keys in zip(group, keyed):
+                steps = []
+                for step, key in enumerate(keys):
+                    if key in cache or key in wanted:
+                        cache.hits += 1
+                    else:
+                        cache.misses += 1
+                        wanted.add(key)
+                        steps.append((step, key))
+                if steps:
+                    tasks.append((map_size, rule, moves, steps))
+            if pool is None:
+                results = analyser.search_games(tasks)
+            else:
+                # the longest games first so the workers finish together
+                tasks.sort(key=lambda task: -len(task[3]))
+                futures = [pool.submit(search_games, tasks[start::workers], settings) for start in range(workers)]
+                results = [result for future in futures for result in future.result()]
+            for key, data in results:
+                cache.put(key, Analysis.from_dict(data))
+            for (moves, _, _), keys in zip(group, keyed):
+                yield [(move, cache.entries[key]) for move, key in zip(moves, keys)]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def parse_moves(text):
+    """
+    return the list of (x, y) of a text like '7,7 8,8 7,8'
+    """
+    return [tuple(int(value) for value in move.split(',')) for move in text.split()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='analyse GoBang positions: the best moves with their scores')
+    parser.add_argument('paths', nargs='*', help='record files (.gbr) or tournament JSON lines files to analyse')
+    parser.add_argument('--moves', help="the moves of one position, like '7,7 8,8 7,8'")
+    parser.add_argument('--size', type=int, default=16, help='board size of the position')
+    parser.add_argument('--rule', default='freestyle', help='rule of the games')
+    parser.add_argument('--pv', type=int, default=3, help='number of best moves')
+    parser.add_argument('--depth', type=int, help='search to this depth, without time limit')
+    parser.add_argument('--time', type=float, default=1.0, help='seconds of a position when there is no depth')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes, all cores by default')
+    parser.add_argument('--cache', help='JSON lines file of the analysed positions, reused by the next run')
+    parser.add_argument('--out', help='JSON lines file of the analysis of each game')
+    args = parser.parse_args()
+
+    with AnalysisCache(args.cache) as cache:
+        analyser = Analyser(args.pv, args.depth, args.time, cache)
+        if args.moves is not None:
+            analysis = analyser.analyse_moves(parse_moves(args.moves), args.size, args.rule)
+            for place, candidate in enumerate(analysis.moves):
+                pv = ' '.join(f'{x},{y}' for x, y in candidate.pv)
+                print(f'{place + 1}. {candidate.move} score {candidate.score}  pv {pv}')
+            print(f'depth {analysis.depth}, {analysis.nodes} nodes in {analysis.elapsed:.2f} s')
+        if not args.paths:
+            return
+
+        def games():
+            for path in args.paths:
+                yield from read_games(path)
+        out = open(args.out, 'w') if args.out else None
+        positions = 0
+        best = 0
+        begin = time.perf_counter()
+        for number, analyses in enumerate(analyse_games(games(), analyser, args.rule, workers=args.workers)):
+            positions += len(analyses)
+            best += sum(1 for move, analysis in analyses if analysis.rank(move) == 0)
+            if out is not None:
+                out.write(json.dumps({'game': number, 'positions': [
+                    dict(analysis.to_dict(), played=list(move), rank=analysis.rank(move))
+                    for move, analysis in analyses]}) + '\n')
+        if out is not None:
+            out.close()
+        elapsed = time.perf_counter() - begin
+        print(f'{positions} positions in {elapsed:.2f} s, {positions / elapsed if elapsed else 0:.1f} positions/s, '
+              f'cache hits {cache.hits}, misses {cache.misses}, '
+              f'best move played {best / positions if positions else 0:.1%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Process-wide cache of the assets of the game window.
+
+Every new round builds its GameGoBang again, the cache makes it cheap: pygame is initialized and the window
+is opened once (again only when its size changes), each picture is decoded, converted to the pixel format
+of the window and scaled once, each sound is decoded once and the fonts are loaded once.
+The drawn surfaces which only depend on the picture and the layout (the chess board, the panel)
+are kept by key too, so the memory stays the same after the first rounds.
+
+The sounds which are rarely played are decoded by a background thread, the window does not wait for them.
+If one is played before it is ready, play waits for it. A sound which cannot be decoded is silent,
+its error is reported on stderr the first time it is played.
+
+    from Gobang_assets import ASSETS
+    screen = ASSETS.display((800, 600), 'GoBang')
+    picture = ASSETS.image('b1.jpg')
+"""
+import sys
+import threading
+
+# pygame is imported by the first display, like Gobang_main.load_pygame
+pygame = None
+
+
+def load_pygame():
+    global pygame
+    if pygame is None:
+        import pygame as module
+        pygame = module
+    return pygame
+
+
+class LazySound:
+    """
+    a sound decoded by a background thread, it has the play method of pygame.mixer.Sound
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.sound = None
+        # the exception of a failed decoding and whether it was reported
+        self.error = None
+        self.reported = False
+        self.thread = threading.Thread(target=self.__load, name=f'gobang-sound-{path}', daemon=True)
+        self.thread.start()
+
+    def __load(self):
+        try:
+            self.sound = pygame.mixer.Sound(self.path)
+        except Exception as error:
+            self.error = error
+
+    def get_sound(self):
+        """
+        return the pygame Sound, wait for the thread if it is still decoding
+        None if it could not be decoded, the error is reported once
+        """
+        if self.sound is None:
+            self.thread.join()
+        if self.sound is None and not self.reported:
+            self.reported = True
+            print(f'cannot load the sound {self.path}: {self.error}', file=sys.stderr)
+        return self.sound
+
+    def is_ready(self):
+        return self.sound is not None
+
+    def play(self, *args):
+        """
+        play the sound, nothing when it could not be decoded
+        """
+        sound = self.get_sound()
+        if sound is None:
+            return None
+        return sound.play(*args)
+
+
+class AssetCache:
+    """
+    the assets of the process, see the module documentation
+    """
+
+    def __init__(self):
+        self.images = {}
+        self.sounds = {}
+        self.fonts = {}
+        self.surfaces = {}
+        self.display_size = None
+        self.display_title = None
+
+    def display(self, size, title=''):
+        """
+        return the screen surface of a window of size, pygame is initialized and the window opened
+        only the first time or when the size changes
+        """
+        load_pygame()
+        if not pygame.get_init():
+            pygame.init()
+        screen = pygame.display.get_surface()
+        if screen is None or self.display_size != tuple(size):
+            screen = pygame.display.set_mode(size)
+            self.display_size = tuple(size)
+        if title != self.display_title:
+            pygame.display.set_caption(title)
+            self.display_title = title
+        return screen
+
+    def image(self, path, side=None):
+        """
+        return the picture of path converted to the pixel format of the window,
+        scaled to a side * side square when side is given, each one is made once
+        """
+        key = (path, side)
+        image = self.images.get(key)
+        if image is None:
+            if side is None:
+                image = pygame.image.load(path).convert()
+            else:
+                image = pygame.transform.smoothscale(self.image(path), (side, side))
+            self.images[key] = image
+        return image
+
+    def sound(self, path, lazy=False):
+        """
+        return the decoded sound of path, lazy sounds are decoded by a background thread (LazySound)
+        """
+        sound = self.sounds.get(path)
+        if sound is None:
+            load_pygame()
+            sound = LazySound(path) if lazy else pygame.mixer.Sound(path)
+            self.sounds[path] = sound
+        return sound
+
+    def font(self, name, size):
+        """
+        return the system font name of size
+        """
+        key = (name, size)
+        font = self.fonts.get(key)
+        if font is None:
+            load_pygame()
+            font = pygame.font.SysFont(name, size)
+            self.fonts[key] = font
+        return font
+
+    def surface(self, key, build):
+        """
+        return the object kept with key, build() makes it the first time
+        it is used for the drawn surfaces which only depend on what is in the key
+        """
+        value = self.surfaces.get(key)
+        if value is None:
+            value = build()
+            self.surfaces[key] = value
+        return value
+
+    def clear(self):
+        """
+        forget all the assets, the window stays open
+        """
+        self.images.clear()
+        self.sounds.clear()
+        self.fonts.clear()
+        self.surfaces.clear()
+
+
+# the assets of the process
+ASSETS = AssetCache()
@@ -0,0 +1,143 @@
+"""
+Vectorized win detection over many boards at once with NumPy.
+The boards are an (N, map_size, map_size) int8 array shaped like GoBang.map:
+0 empty, 1 black chess, -1 white chess, boards[n][x][y] is the spot (x, y) of board n.
+"""
+import numpy as np
+
+# winners returns BOTH for a board where both colors have 5 links, it can not happen in a legal game
+BOTH = 2
+# the four lines through a spot: vertical, horizontal, right oblique, left oblique
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (-1, 1))
+
+
+def to_array(games):
+    """
+    return the (N, map_size, map_size) int8 array of a list of GoBang games
+    """
+    if not games:
+        return np.zeros((0, 16, 16), dtype=np.int8)
+    return np.array([game.map for game in games], dtype=np.int8)
+
+
+def pack_rows(stones):
+    """
+    stones is an (N, S, S) bool array of the chess of one color
+    return an (N, S) array where bit y of row x is the spot (x, y), with room for the shifts of the left oblique
+    """
+    size = stones.shape[2]
+    dtype = np.uint32 if size + 4 <= 32 else np.uint64
+    weights = (np.ones(1, dtype=dtype) << np.arange(size, dtype=dtype)).astype(dtype)
+    return (stones.astype(dtype) * weights).sum(axis=2, dtype=dtype)
+
+
+def has_five(boards, piece):
+    """
+    return an (N,) bool array, True for the boards where piece has 5 links
+    every row is packed into one integer, then the four lines are checked with shift-and-AND
+    over a sliding window of 5 rows, like the BitBoard backend of Gobang_core
+    """
+    boards = np.asarray(boards)
+    count, size = boards.shape[0], boards.shape[1]
+    if size < 5:
+        return np.zeros(count, dtype=bool)
+    if size + 4 > 64:
+        return slices_five(boards == piece)
+    rows = pack_rows(boards == piece)
+    span = size - 4
+    # vertical: 5 bits next to each other in one row
+    links = rows & (rows >> 1)
+    links &= links >> 2
+    links &= rows >> 4
+    found = links.any(axis=1)
+    # horizontal, right oblique and left oblique: the same bit in 5 rows after shifting row k by 0, k or -k
+    horizontal = rows[:, 0:span].copy()
+    right = rows[:, 0:span].copy()
+    left = rows[:, 0:span].copy()
+    for k in range(1, 5):
+        window = rows[:, k:span + k]
+        horizontal &= window
+        right &= window >> k
+        left &= window << k
+    found |= horizontal.any(axis=1)
+    found |= right.any(axis=1)
+    found |= left.any(axis=1)
+    return found
+
+
+def slices_five(stones):
+    """
+    the same as has_five for the boards which are too big to pack a row into 64 bits,
+    each line is checked with the AND of 5 shifted slices of the board
+    """
+    size = stones.shape[1]
+    found = np.zeros(stones.shape[0], dtype=bool)
+    for dx, dy in DIRECTIONS:
+        # the number of windows along x and y
+        span_x = size - 4 * abs(dx)
+        span_y = size - 4 * dy
+        windows = None
+        for k in range(5):
+            x0 = k * dx if dx >= 0 else 4 - k
+            y0 = k * dy
+            part = stones[:, x0:x0 + span_x, y0:y0 + span_y]
+            windows = part.copy() if windows is None else windows & part
+        found |= windows.reshape(stones.shape[0], -1).any(axis=1)
+    return found
+
+
+def winners(boards):
+    """
+    return an (N,) int8 array: 1 if black has 5 links, -1 if white has, 0 if none, BOTH if both
+    """
+    black = has_five(boards, 1)
+    white = has_five(boards, -1)
+    result = np.zeros(black.shape, dtype=np.int8)
+    result[black] = 1
+    result[white] = -1
+    result[black & white] = BOTH
+    return result
+
+
+def check_win(boards, last_moves):
+    """
+    the batch version of GoBang.check_win: last_moves is an (N, 2) array of the (x, y) of the last move of each board
+    return an (N,) int8 array with the color of the last move if that chess is part of 5 links, else 0
+    only the 9 spots around the last move on each of the four lines are read, like GoBang.check_win
+    """
+    boards = np.asarray(boards)
+    last_moves = np.asarray(last_moves)
+    count = boards.shape[0]
+    # a border of 4 empty spots, so the lines never go out of the array
+    padded = np.pad(boards, ((0, 0), (4, 4), (4, 4)))
+    index = np.arange(count)[:, None]
+    xs = last_moves[:, 0:1] + 4
+    ys = last_moves[:, 1:2] + 4
+    pieces = boards[np.arange(count), last_moves[:, 0], last_moves[:, 1]]
+    offsets = np.arange(-4, 5)
+    won = np.zeros(count, dtype=bool)
+    for dx, dy in DIRECTIONS:
+        line = padded[index, xs + offsets * dx, ys + offsets * dy] == pieces[:, None]
+        links = line[:, 0:5] & line[:, 1:6] & line[:, 2:7] & line[:, 3:8] & line[:, 4:9]
+        won |= links.any(axis=1)
+    won &= pieces != 0
+    return np.where(won, pieces, 0).astype(np.int8)
+
+
+def legal_moves(boards, winner=None):
+    """
+    return an (N, S, S) bool array of the legal spots of each board: the empty spots of the boards without a winner
+    winner is the result of winners, it is computed when it is not given
+    """
+    boards = np.asarray(boards)
+    if winner is None:
+        winner = winners(boards)
+    return (boards == 0) & (winner == 0)[:, None, None]
+
+
+def analyse(boards):
+    """
+    return (winners, legal moves) of all the boards
+    """
+    winner = winners(boards)
+    return winner, legal_moves(boards, winner)
@@ -0,0 +1,417 @@
+"""
+Opening book built from archived games.
+
+A position is looked up by its canonical hash: the Zobrist hash of the position is computed on the 8 symmetries
+of the board (4 rotations, each one mirrored) and the smallest one is kept, so the rotations and mirrors of
+a position share their entry. The moves are saved on the same symmetry as the hash.
+
+The book file starts with MAGIC and a header (map_size, number of entries), then the entries sorted by
+(hash, move), each one ENTRY: hash 8 bytes, move 2 bytes (x * map_size + y), games, wins and draws of the
+player who makes the move, 4 bytes each. The file is memory mapped and searched with a binary search,
+so opening a book costs nothing and a lookup reads a few pages.
+
+The book is built in a streaming way: the counts are kept in a dict which is written as a sorted run file
+when it gets big, the runs are merged at the end, so the memory does not depend on the number of games.
+"""
+import argparse
+import heapq
+import json
+import mmap
+import os
+import random
+import struct
+import tempfile
+
+from Gobang_core import zobrist_table
+from Gobang_record import RECORD_SUFFIX, read_records
+
+MAGIC = b'GBK1'
+BOOK_SUFFIX = '.gbk'
+HEADER = struct.Struct('<BQ')
+ENTRY = struct.Struct('<QHIII')
+# the 8 symmetries of a board: swap x and y, then mirror x, then mirror y
+SYMMETRIES = [(swap, mirror_x, mirror_y) for swap in (False, True)
+              for mirror_x in (False, True) for mirror_y in (False, True)]
+
+
+def symmetric_spot(x, y, map_size, symmetry):
+    """
+    return the spot (x, y) on the symmetry number symmetry (0 to 7) of the board, 0 is the board itself
+    """
+    swap, mirror_x, mirror_y = SYMMETRIES[symmetry]
+    if swap:
+        x, y = y, x
+    if mirror_x:
+        x = map_size - 1 - x
+    if mirror_y:
+        y = map_size - 1 - y
+    return x, y
+
+
+class SymmetryTables:
+    """
+    the tables of a board size for the 8 symmetries:
+    zobrist[s][x][y] is the pair of keys of the spot (x, y) once moved by the symmetry s,
+    spots[s][x * map_size + y] is the moved spot and inverse[s] maps a moved spot back
+    """
+
+    def __init__(self, map_size):
+        self.map_size = map_size
+        keys = zobrist_table(map_size)
+        self.spots = []
+        self.inverse = []
+        self.zobrist = []
+        for symmetry in range(len(SYMMETRIES)):
+            spots = [symmetric_spot(x, y, map_size, symmetry) for x in range(map_size) for y in range(map_size)]
+            inverse = [None] * (map_size * map_size)
+            for index, (x, y) in enumerate(spots):
+                inverse[x * map_size + y] = divmod(index, map_size)
+            self.spots.append(spots)
+            self.inverse.append(inverse)
+            self.zobrist.append([[keys[sx][sy] for sx, sy in spots[x * map_size:(x + 1) * map_size]]
+                                 for x in range(map_size)])
+
+    def hashes(self, record_move):
+        """
+        return the 8 hashes of the position of a record, a list of (chess piece type, x, y)
+        """
+        hashes = [0] * len(SYMMETRIES)
+        for piece, x, y in record_move:
+            color = 0 if piece == 1 else 1
+            for symmetry, table in enumerate(self.zobrist):
+                hashes[symmetry] ^= table[x][y][color]
+        return hashes
+
+    def canonical_move(self, hashes, x, y):
+        """
+        return (canonical hash, the move (x, y) as it is saved in the book)
+        when the position has its own symmetries more than one symmetry gives the smallest hash,
+        the smallest of the moved spots is saved so the same moves share one entry
+        """
+        key = min(hashes)
+        size = self.map_size
+        move = min(self.spots[symmetry][x * size + y] for symmetry, value in enumerate(hashes) if value == key)
+        return key, move[0] * size + move[1]
+
+
+# SymmetryTables of each board size, built the first time the size is used
+TABLES = {}
+
+
+def symmetry_tables(map_size):
+    tables = TABLES.get(map_size)
+    if tables is None:
+        tables = SymmetryTables(map_size)
+        TABLES[map_size] = tables
+    return tables
+
+
+class BookMove:
+    def __init__(self, x, y, games, wins, draws):
+        """
+        x, y: the spot of the move on the board of the position which was looked up
+        games, wins, draws: the games in the book where this move was played and their results for the mover
+        """
+        self.x = x
+        self.y = y
+        self.games = games
+        self.wins = wins
+        self.draws = draws
+
+    def get_score(self):
+        """
+        return the score of the move for the mover, a win is 1 and a draw is 0.5
+        """
+        return (self.wins + self.draws * 0.5) / self.games if self.games else 0.0
+
+    def __repr__(self):
+        return (f'BookMove(({self.x}, {self.y}), games={self.games}, wins={self.wins}, draws={self.draws}, '
+                f'score={self.get_score():.3f})')
+
+
+class OpeningBook:
+    """
+    read only access to a book file, use it with the with statement or call close
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f'{path} is not a GoBang opening book')
+        self.map_size, self.count = HEADER.unpack_from(self.map, len(MAGIC))
+        self.start = len(MAGIC) + HEADER.size
+        if self.start + self.count * ENTRY.size != len(self.map):
+            self.close()
+            raise ValueError(f'{path} is not complete')
+        self.tables = symmetry_tables(self.map_size)
+
+    def __len__(self):
+        return self.count
+
+    def __first(self, key):
+        """
+        return the number of the first entry whose hash is not less than key
+        """
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if struct.unpack_from('<Q', self.map, self.start + middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def entries(self, key):
+        """
+        return the (move, games, wins, draws) saved for a canonical hash
+        """
+        result = []
+        number = self.__first(key)
+        while number < self.count:
+            value, move, games, wins, draws = ENTRY.unpack_from(self.map, self.start + number * ENTRY.size)
+            if value != key:
+                break
+            result.append((move, games, wins, draws))
+            number += 1
+        return result
+
+    def lookup(self, game):
+        """
+        return the BookMove list of the position of a GoBang game, the most played first
+        the moves are on the board of the game, whatever symmetry was saved in the book
+        """
+        if game.map_size != self.map_size:
+            return []
+        return self.lookup_moves(game.get_record_move())
+
+    def lookup_moves(self, record_move):
+        """
+        the same as lookup for a list of (chess piece type, x, y)
+        """
+        hashes = self.tables.hashes(record_move)
+        key = min(hashes)
+        symmetry = hashes.index(key)
+        inverse = self.tables.inverse[symmetry]
+        moves = []
+        for move, games, wins, draws in self.entries(key):
+            x, y = inverse[move]
+            moves.append(BookMove(x, y, games, wins, draws))
+        moves.sort(key=lambda book_move: (-book_move.games, -book_move.get_score()))
+        return moves
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class BookPolicy:
+    """
+    a move policy which plays from the opening book while the position is in it, then asks the fallback policy
+    choice 'best' plays the move with the best score among the moves of min_games games or more,
+    'weighted' picks a move at random with the number of games as its weight
+    the book file is opened in the process which uses the policy, so it can be sent to the tournament workers
+    """
+
+    def __init__(self, path, fallback=None, min_games=2, choice='best', seed=None):
+        self.path = path
+        self.fallback = fallback
+        self.min_games = min_games
+        self.choice = choice
+        self.rng = random.Random(seed)
+        self.book = None
+        self.hits = 0
+        self.misses = 0
+
+    def seed(self, value):
+        self.rng.seed(value)
+        if hasattr(self.fallback, 'seed'):
+            self.fallback.seed(value)
+
+    def get_move(self, game):
+        """
+        return the (x, y) of the book for the position of the game, None if the position is not in the book
+        """
+        if self.book is None:
+            self.book = OpeningBook(self.path)
+        moves = [move for move in self.book.lookup(game)
+                 if move.games >= self.min_games and game.board.get(move.x, move.y) == 0]
+        if not moves:
+            return None
+        if self.choice == 'weighted':
+            move = self.rng.choices(moves, weights=[move.games for move in moves])[0]
+        else:
+            move = max(moves, key=lambda book_move: (book_move.get_score(), book_move.games))
+        return (move.x, move.y)
+
+    def __call__(self, game):
+        move = self.get_move(game)
+        if move is not None:
+            self.hits += 1
+            return move
+        self.misses += 1
+        return self.fallback(game) if self.fallback is not None else None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['book'] = None
+        return state
+
+
+def read_games(path):
+    """
+    yield the (moves, winner, map_size) of each game of a record file (.gbr)
+    or of a JSON lines file written by the tournament runner
+    """
+    if path.endswith(RECORD_SUFFIX):
+        for record in read_records(path):
+            yield record.moves, record.winner, record.map_size
+        return
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                game = json.loads(line)
+                data = bytes.fromhex(game['moves'])
+                map_size = game.get('map_size', 16)
+                if map_size <= 16:
+                    moves = [(value >> 4, value & 15) for value in data]
+                else:
+                    moves = [(data[index], data[index + 1]) for index in range(0, len(data), 2)]
+                yield moves, game['winner'], map_size
+
+
+def book_entries(games, map_size=16, max_plies=20):
+    """
+    yield (canonical hash, move, win, draw) for the first max_plies moves of each (moves, winner, map_size) game
+    win and draw are 1 or 0 for the player who made the move, the games of other sizes are skipped
+    """
+    tables = symmetry_tables(map_size)
+    zobrist = tables.zobrist
+    count = len(SYMMETRIES)
+    for moves, winner, size in games:
+        if size != map_size:
+            continue
+        hashes = [0] * count
+        piece = 1
+        for x, y in moves[:max_plies]:
+            key, move = tables.canonical_move(hashes, x, y)
+            yield key, move, 1 if winner == piece else 0, 1 if winner == 0 else 0
+            color = 0 if piece == 1 else 1
+            for symmetry in range(count):
+                hashes[symmetry] ^= zobrist[symmetry][x][y][color]
+            piece = -piece
+
+
+def write_run(counts, directory):
+    """
+    write the counts {(hash, move): [games, wins, draws]} sorted to a new run file and return its path
+    """
+    handle, path = tempfile.mkstemp(suffix='.run', dir=directory)
+    with os.fdopen(handle, 'wb') as file:
+        for (key, move), (games, wins, draws) in sorted(counts.items()):
+            file.write(ENTRY.pack(key, move, games, wins, draws))
+    return path
+
+
+def read_run(path, buffer_size=1 << 16):
+    """
+    yield the entries of a run file as ((hash, move), games, wins, draws)
+    """
+    with open(path, 'rb') as file:
+        while True:
+            block = file.read(buffer_size - buffer_size % ENTRY.size)
+            if not block:
+                return
+            for key, move, games, wins, draws in ENTRY.iter_unpack(block):
+                yield (key, move), games, wins, draws
+
+
+def build_book(paths, out, map_size=16, max_plies=20, min_games=2, run_entries=1 << 19):
+    """
+    build the book file out from the games of the files in paths, return the number of entries
+    at most run_entries counts are kept in memory, then they are written to a sorted run file;
+    the runs are merged into the book, the moves of less than min_games games are left out
+    """
+    directory = os.path.dirname(os.path.abspath(out))
+    runs = []
+    counts = {}
+    try:
+        for path in paths:
+            for key, move, win, draw in book_entries(read_games(path), map_size, max_plies):
+                entry = counts.get((key, move))
+                if entry is None:
+                    counts[(key, move)] = [1, win, draw]
+                    if len(counts) >= run_entries:
+                        runs.append(write_run(counts, directory))
+                        counts = {}
+                else:
+                    entry[0] += 1
+                    entry[1] += win
+                    entry[2] += draw
+        if counts or not runs:
+            runs.append(write_run(counts, directory))
+        counts = {}
+        total = 0
+        with open(out, 'wb') as file:
+            file.write(MAGIC)
+            file.write(HEADER.pack(map_size, 0))
+            current = None
+            for key, games, wins, draws in heapq.merge(*(read_run(run) for run in runs)):
+                if current is not None and current[0] == key:
+                    current[1] += games
+                    current[2] += wins
+                    current[3] += draws
+                    continue
+                if current is not None and current[1] >= min_games:
+                    file.write(ENTRY.pack(current[0][0], current[0][1], current[1], current[2], current[3]))
+                    total += 1
+                current = [key, games, wins, draws]
+            if current is not None and current[1] >= min_games:
+                file.write(ENTRY.pack(current[0][0], current[0][1], current[1], current[2], current[3]))
+                total += 1
+            file.seek(len(MAGIC))
+            file.write(HEADER.pack(map_size, total))
+        return total
+    finally:
+        for run in runs:
+            os.remove(run)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='build or look into a GoBang opening book')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='build a book from record files (.gbr) or tournament JSON lines')
+    build.add_argument('out', help='the book file (.gbk)')
+    build.add_argument('paths', nargs='+')
+    build.add_argument('--size', type=int, default=16, help='the board size of the games to use')
+    build.add_argument('--plies', type=int, default=20, help='moves of each game which go into the book')
+    build.add_argument('--min-games', type=int, default=2, help='leave out the moves of fewer games')
+    show = commands.add_parser('show', help='print the book moves of a position')
+    show.add_argument('book')
+    show.add_argument('moves', nargs='*', help='the moves of the position as x,y, black first')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        total = build_book(args.paths, args.out, args.size, args.plies, args.min_games)
+        print(f'{args.out}: {total} entries, {os.path.getsize(args.out)} bytes')
+        return
+    with OpeningBook(args.book) as book:
+        record = []
+        for index, text in enumerate(args.moves):
+            x, y = (int(value) for value in text.split(','))
+            record.append((1 if index % 2 == 0 else -1, x, y))
+        print(f'{args.book}: {len(book)} entries, board {book.map_size}')
+        for move in book.lookup_moves(record):
+            print(f'  {move}')
+
+
+if __name__ == '__main__':
+    main()
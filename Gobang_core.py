@@ -0,0 +1,624 @@
+"""
+The rules of GoBang without any user interface.
+It does not import pygame, so it can be used by the batch tools and the AI
+on machines without a display.
+"""
+import random
+
+from Gobang_rules import OTHER, OWN, REACH, WALL, get_rule
+
+# the line code value of a spot from chess * piece: 0 empty, 1 own chess, -1 other chess
+LINE_VALUES = (0, OWN, OTHER)
+
+
+class ListBoard:
+    """
+    The original board, map_size * map_size list of lists
+    0 : empty, 1 : black chess, -1 : white chess
+    """
+    # the four lines through a spot: vertical, horizontal, right oblique, left oblique
+    DIRECTIONS = ((0, 1), (1, 0), (1, 1), (-1, 1))
+
+    def __init__(self, map_size=16):
+        self.map_size = map_size
+        self.map = [[0 for y in range(0, map_size)] for x in range(0, map_size)]
+
+    def get(self, x, y):
+        """
+        return the chess on (x, y)
+        """
+        return self.map[x][y]
+
+    def set(self, x, y, piece):
+        """
+        put the chess piece on (x, y), 0 clears the spot
+        """
+        self.map[x][y] = piece
+
+    def clear(self):
+        """
+        take all the chess away, the rows stay the same list objects
+        """
+        for row in self.map:
+            row[:] = [0] * self.map_size
+
+    def count_line(self, x, y, dx, dy):
+        """
+        count the chess of the same color connected with (x, y) on the line (dx, dy), (x, y) itself included
+        the walk stops after 4 spots on each side, so 9 is the biggest value it can return
+        """
+        board = self.map
+        size = self.map_size
+        piece = board[x][y]
+        count = 1
+        for sign in (1, -1):
+            step_x = dx * sign
+            step_y = dy * sign
+            cur_x = x + step_x
+            cur_y = y + step_y
+            for _ in range(4):
+                if cur_x < 0 or cur_x >= size or cur_y < 0 or cur_y >= size or board[cur_x][cur_y] != piece:
+                    break
+                count += 1
+                cur_x += step_x
+                cur_y += step_y
+        return count
+
+    def has_five(self, x, y):
+        """
+        return True if the chess on (x, y) is part of 5 links on one of the four lines
+        """
+        for dx, dy in self.DIRECTIONS:
+            if self.count_line(x, y, dx, dy) >= 5:
+                return True
+        return False
+
+    def line_codes(self, x, y, piece, lines):
+        """
+        return the codes of the four lines through (x, y) seen by piece, see Gobang_rules.Rule.line_codes
+        lines are the spots of the four lines from the line table
+        """
+        board = self.map
+        codes = []
+        for line in lines:
+            code = 0
+            for spot in line:
+                if spot is None:
+                    value = WALL
+                else:
+                    value = LINE_VALUES[board[spot[0]][spot[1]] * piece]
+                code = (code << 2) | value
+            codes.append(code | (OWN << (REACH * 2)))
+        return codes
+
+    def copy(self):
+        """
+        return a new board with the same chess
+        """
+        board = ListBoard.__new__(ListBoard)
+        board.map_size = self.map_size
+        board.map = [list(row) for row in self.map]
+        return board
+
+    def key(self):
+        """
+        return a hashable value which is the same for two boards with the same chess
+        """
+        return tuple(tuple(row) for row in self.map)
+
+    def to_map(self):
+        """
+        return the board as a list of lists, for this board it is the board itself
+        """
+        return self.map
+
+
+class BitBoard:
+    """
+    Black and white chess are kept in two python integers, one bit for each spot.
+    Spot (x, y) is the bit x * stride + y, and stride is map_size + 1,
+    so there is an empty padding bit at the end of each row and a shift never wraps to the next row.
+    5 links are found with shift-and-AND on the four lines, only on the 9 spots of each line around the move,
+    so the cost of a check hardly grows with the board size.
+    """
+
+    def __init__(self, map_size=16):
+        self.map_size = map_size
+        self.stride = map_size + 1
+        # shift of one step along the line: vertical, horizontal, right oblique, left oblique
+        self.shifts = (1, self.stride, self.stride + 1, self.stride - 1)
+        # the bits of the 9 spots of each line from 4 steps before the move to 4 steps after it
+        self.windows = tuple(sum(1 << (shift * step) for step in range(0, 9)) for shift in self.shifts)
+        # the same for the spots of the line codes, REACH steps before and after the move
+        self.line_windows = tuple(sum(1 << (shift * step) for step in range(0, REACH * 2 + 1))
+                                  for shift in self.shifts)
+        self.black = 0
+        self.white = 0
+
+    def get(self, x, y):
+        """
+        return the chess on (x, y)
+        """
+        bit = 1 << (x * self.stride + y)
+        if self.black & bit:
+            return 1
+        if self.white & bit:
+            return -1
+        return 0
+
+    def set(self, x, y, piece):
+        """
+        put the chess piece on (x, y), 0 clears the spot
+        """
+        bit = 1 << (x * self.stride + y)
+        self.black &= ~bit
+        self.white &= ~bit
+        if piece == 1:
+            self.black |= bit
+        elif piece == -1:
+            self.white |= bit
+
+    def clear(self):
+        """
+        take all the chess away
+        """
+        self.black = 0
+        self.white = 0
+
+    def has_five(self, x, y):
+        """
+        return True if the chess on (x, y) is part of 5 links on one of the four lines
+        each line is cut to the 9 spots around (x, y) first, every 5 links among them go through (x, y)
+        """
+        index = x * self.stride + y
+        stones = self.black if (self.black >> index) & 1 else self.white
+        for shift, window in zip(self.shifts, self.windows):
+            low = index - shift * 4
+            line = (stones >> low if low >= 0 else stones << -low) & window
+            links = line & (line >> shift)
+            links &= links >> (shift * 2)
+            links &= line >> (shift * 4)
+            if links:
+                return True
+        return False
+
+    def line_codes(self, x, y, piece, lines):
+        """
+        return the codes of the four lines through (x, y) seen by piece, see Gobang_rules.Rule.line_codes
+        each line is cut to its spots first like has_five does, the walls come from the lines of the line table
+        """
+        index = x * self.stride + y
+        own, other = (self.black, self.white) if piece == 1 else (self.white, self.black)
+        codes = []
+        for shift, window, line in zip(self.shifts, self.line_windows, lines):
+            low = index - shift * REACH
+            if low >= 0:
+                own_line = (own >> low) & window
+                other_line = (other >> low) & window
+            else:
+                own_line = (own << -low) & window
+                other_line = (other << -low) & window
+            code = 0
+            bit = 0
+            for spot in line:
+                if spot is None:
+                    value = WALL
+                elif (own_line >> bit) & 1:
+                    value = OWN
+                elif (other_line >> bit) & 1:
+                    value = OTHER
+                else:
+                    value = 0
+                code = (code << 2) | value
+                bit += shift
+            codes.append(code | (OWN << (REACH * 2)))
+        return codes
+
+    def copy(self):
+        """
+        return a new board with the same chess
+        """
+        board = BitBoard.__new__(BitBoard)
+        board.map_size = self.map_size
+        board.stride = self.stride
+        board.shifts = self.shifts
+        board.windows = self.windows
+        board.line_windows = self.line_windows
+        board.black = self.black
+        board.white = self.white
+        return board
+
+    def key(self):
+        """
+        return a hashable value which is the same for two boards with the same chess
+        """
+        return (self.black, self.white)
+
+    def to_map(self):
+        """
+        return a new tuple of tuples with the chess of this board, indexed like the map of ListBoard
+        it is read-only, so a write to it raises TypeError instead of changing nothing
+        """
+        return tuple(tuple(self.get(x, y) for y in range(0, self.map_size)) for x in range(0, self.map_size))
+
+
+def zobrist_table(map_size):
+    """
+    return the Zobrist keys of a board size, table[x][y] is the pair of 64 bits keys (black, white) of the spot
+    the keys come from a fixed seed, so the hash of a position is the same in every process
+    """
+    table = ZOBRIST_TABLES.get(map_size)
+    if table is None:
+        rng = random.Random(map_size * 2140)
+        table = [[(rng.getrandbits(64), rng.getrandbits(64)) for y in range(0, map_size)]
+                 for x in range(0, map_size)]
+        ZOBRIST_TABLES[map_size] = table
+    return table
+
+
+# Zobrist keys of each board size, built by zobrist_table the first time the size is used
+ZOBRIST_TABLES = {}
+
+
+class GoBang:
+    # the board classes which can be picked with the backend parameter
+    BACKENDS = {'list': ListBoard, 'bitboard': BitBoard}
+
+    def __init__(self, map_size=16, backend='list', rule='freestyle'):
+        """
+        # map_size * map_size reresent a chessboard
+        # '# 0 : represent the empty
+        # 1 : represent the black chess
+        # -1 : represent the white chess
+        # backend is the name of the board class in BACKENDS, 'list' or 'bitboard'
+        # rule is the name of the rule in Gobang_rules.RULES: 'freestyle', 'exact', 'renju' or 'caro'
+        """
+        self.map_size = map_size
+        self.backend = backend
+        self.board = self.BACKENDS[backend](map_size)
+        self.rule = get_rule(rule, map_size)
+        # A historical record of each step,used for contrite chess.
+        # It is a list whose members are a tuple (chess piece type, map.x, map.y)
+        self.record_move = []
+
+        self.current_status = 0
+        self.winner = 0
+
+        # Zobrist hash of the chess on the board, it is updated by move and rollback
+        self.zobrist = zobrist_table(map_size)
+        self.hash = 0
+        # objects which follow the board, see add_listener
+        self.listeners = []
+
+    @property
+    def map(self):
+        """
+        the board, map[x][y] is the chess on (x, y)
+        it is the list of lists of the board itself for the list backend, writes to it change the board;
+        for the bitboard backend it is a read-only snapshot (tuples), the chess are changed with board.set
+        """
+        return self.board.to_map()
+
+    def copy(self):
+        """
+        return a new GoBang object with the same board, record and status
+        the board is copied by its backend, which is cheap for the bitboard
+        """
+        game = GoBang.__new__(GoBang)
+        game.map_size = self.map_size
+        game.backend = self.backend
+        game.board = self.board.copy()
+        game.rule = self.rule
+        game.record_move = list(self.record_move)
+        game.current_status = self.current_status
+        game.winner = self.winner
+        game.zobrist = self.zobrist
+        game.hash = self.hash
+        # the listeners follow this object only
+        game.listeners = []
+        return game
+
+    def add_listener(self, listener):
+        """
+        add an object which is told about every change of the board
+        listener.on_move(piece, x, y) is called after a chess is put by move
+        listener.on_rollback(piece, x, y) is called after a chess is taken away by rollback
+        """
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """
+        stop telling the listener about the changes of the board
+        """
+        self.listeners.remove(listener)
+
+    def key(self):
+        """
+        return a hashable value of the position, the chess on the board and the current status
+        """
+        return (self.board.key(), self.current_status)
+
+    def start_move(self):
+        """ 
+        start to move
+        no input
+        change the current_status to 1 which means start game and it is for black player's term  
+        """
+        self.current_status = 1
+
+    def clear(self):
+        """
+        take all the chess away and go back to the status before start_move, the board object is reused
+        the board object empties itself at once, so it costs less than building a new GoBang
+        """
+        if self.listeners:
+            while self.rollback() == Errorcode.code_run:
+                pass
+        else:
+            self.board.clear()
+            self.record_move = []
+            self.hash = 0
+        self.winner = 0
+        self.current_status = 0
+
+    def load_moves(self, moves, winner=0):
+        """
+        replace the position with the list of (x, y) moves, black first, without checking each move
+        it is the fast way to rebuild a game from a saved record which is known to be legal
+        winner is the winner of the record, the game is over if it is not 0
+        """
+        self.clear()
+        piece = 1
+        for x, y in moves:
+            self.board.set(x, y, piece)
+            self.record_move.append((piece, x, y))
+            self.hash ^= self.zobrist[x][y][0 if piece == 1 else 1]
+            for listener in self.listeners:
+                listener.on_move(piece, x, y)
+            piece = -piece
+        self.winner = winner
+        if winner != 0:
+            self.current_status = 3
+        else:
+            self.current_status = 1 if piece == 1 else 2
+
+    def restore(self, board, record_move, hash):
+        """
+        put the game at a saved position: a board object, the record which made it and its Zobrist hash
+        the objects are copied, so the same saved position can be restored many times
+        the winner and the status are computed again like move does, the listeners are not told
+        """
+        self.board = board.copy()
+        self.record_move = list(record_move)
+        self.hash = hash
+        self.winner = 0
+        if not self.record_move:
+            self.current_status = 1
+        elif self.if_gameover() == Errorcode.code_win:
+            self.current_status = 3
+        else:
+            self.current_status = 2 if self.record_move[-1][0] == 1 else 1
+
+    def get_last_move(self):
+        """
+        return the last step of move, which is a helper method for undo
+        """
+        return self.record_move[-1]
+
+    def get_winner(self):
+        """
+        return the winner from this class's field
+        """
+        return self.winner
+
+    def get_steps(self):
+        """
+        return the length of the record list, which means how many steps did the player move
+        """
+        return len(self.record_move)
+
+    def check_win(self):
+        """
+        The algorithm to judge the winning and losing: only the four lines through the last spot
+        (horizontal, vertical, left oblique, right oblique) can form a new 5 links.
+
+        The rule checks it. With freestyle the board backend does: ListBoard walks from the last spot to both sides
+        of each line and counts the connected drops of the same color, it never needs to go further than 4 spots
+        to each side, BitBoard uses shift-and-AND on the bits of the color. If one of the lines reaches 5,
+        it can be judged as victory. The other rules look up the patterns of the four lines, see Gobang_rules
+        """
+        piece, x, y = self.record_move[-1]
+        if self.rule.is_win(self.board, x, y, piece):
+            return piece
+        return 0
+
+    def check_win_scan(self):
+        """
+        The original full scan version of check_win, kept as the reference for check_win and the benchmark.
+
+        The algorithm to judge the winning and losing: it only needs to judge whether the four lines 
+        related to the current spot (horizontal, vertical, left oblique, right oblique) form 5 links.
+
+        Add all the drops on the line (black ~ 1, white ~ -1) in turn. 
+        If the sum of the absolute values of the consecutive drops reaches 5, it can be judged as victory
+        """
+        board = self.map
+        temp = 0
+        last_step = self.record_move[-1]
+
+        #first case, there are five same chess on the vertical line
+        #Check vertical line, x is fixed
+        for y in range(0, self.map_size):
+            # It should be continuous, if not, temp will be 0
+            if y > 0 and board[last_step[1]][y] != board[last_step[1]][y - 1]:
+                temp = 0
+            temp += board[last_step[1]][y]
+            if abs(temp) >= 5:
+                return last_step[0]
+
+        # second case, there are five same chess on the horizontal line
+        # check the Horizontal line, y is fixed
+        temp = 0
+        for x in range(0, self.map_size):
+            if x > 0 and board[x][last_step[2]] != board[x - 1][last_step[2]]:
+                temp = 0
+            temp += board[x][last_step[2]]
+            if abs(temp) >= 5:
+                return last_step[0]
+
+        # Right oblique line, calculate the coordinates of the upper left vertex. And then both x and y increase to the bottom right corner.
+        temp = 0
+        min_dist = min(last_step[1], last_step[2])
+        top_point = [last_step[1] - min_dist, last_step[2] - min_dist]
+        for incr in range(0, self.map_size):
+            # it cannot go out of boundary
+            if top_point[0] + incr > self.map_size - 1 or top_point[1] + incr > self.map_size - 1:
+                break
+            if incr > 0 and board[top_point[0] + incr][top_point[1] + incr] \
+                != board[top_point[0] + incr - 1][top_point[1] + incr - 1]:
+                temp = 0
+            temp += board[top_point[0] + incr][top_point[1] + incr]
+            if abs(temp) >= 5:
+                return last_step[0]
+
+        # Left oblique line, calculate the coordinates of the upper right vertex. Then x decreases and y increases, reaching the bottom-left vertex.
+        temp = 0
+        min_dist = min(self.map_size - 1 - last_step[1], last_step[2])
+        top_point = [last_step[1] + min_dist, last_step[2] - min_dist]
+        for incr in range(0, self.map_size):
+            if top_point[0] - incr < 0  or top_point[1] + incr > self.map_size - 1:
+                break
+            if incr > 0 and board[top_point[0] - incr][top_point[1] + incr] \
+                    != board[top_point[0] - incr + 1][top_point[1] + incr - 1]:
+                temp = 0
+            temp += board[top_point[0] - incr][top_point[1] + incr]
+            if abs(temp) >= 5:
+                return last_step[0]
+
+        return 0
+
+    
+    def if_gameover(self):
+        """
+        Determine whether this bureau is over
+        return code C if all the steps is complete
+        return code code_win if one player win
+        return code code_run to countinue
+        """
+        if len(self.record_move) >= self.map_size ** 2:
+            return Errorcode.code_over
+        winner = self.check_win()
+        if winner != 0:
+            self.winner = winner
+            return Errorcode.code_win
+
+        return Errorcode.code_run
+
+    
+    def move(self, x, y):
+        """
+        input the cordinate of the chess
+        and record it in the map with white and black color
+        and determine if game is over, and return the code
+        """
+        if self.current_status != 1 and self.current_status != 2:
+            return Errorcode.code_status_error
+        if self.map_size <= x or x < 0 or self.map_size <= y or y < 0:
+            return Errorcode.code_wrong_range
+        if self.board.get(x, y) != 0:
+            return Errorcode.code_pos
+
+        t = 1 if self.current_status == 1 else -1
+        if self.rule.has_forbidden and self.rule.is_forbidden(self.board, x, y, t):
+            return Errorcode.code_forbidden
+        self.board.set(x, y, t)
+        self.record_move.append((t, x, y))
+        self.hash ^= self.zobrist[x][y][0 if t == 1 else 1]
+        for listener in self.listeners:
+            listener.on_move(t, x, y)
+
+        # Determine whether it is over
+        ret = self.if_gameover()
+        if self.is_finish(ret):
+            if ret == Errorcode.code_win:
+                self.__set_current_status(3)
+            else:
+                self.__set_current_status(4)
+            return ret
+
+        # change the current_state after each step
+        last_step = self.record_move[-1]
+        current_stat = 2 if last_step[0] == 1 else 1
+        self.__set_current_status(current_stat)
+        return Errorcode.code_run
+
+    def __set_current_status(self, current_stat):
+        """
+        input the currect status and change the field of this class to current status
+        """
+        self.current_status = current_stat
+
+    def is_finish(self, err_code):
+        """
+        get the error code and return a boolean by the game stat
+        """
+        if err_code == Errorcode.code_error or err_code == Errorcode.code_win:
+            return True
+        return False
+
+    def rollback(self):
+        """
+        this function is for rollback the laststep
+        it will determine if there is exist steps, if not will return error code
+        then the function will use pop method to delete the latest steps from the move records
+        after remove will refresh the status of the game
+        """
+        if len(self.record_move) == 0:
+            return Errorcode.code_error
+        step = self.record_move.pop()
+        self.board.set(step[1], step[2], 0)
+        self.hash ^= self.zobrist[step[1]][step[2]][0 if step[0] == 1 else 1]
+        # there is no 5 links on the board any more
+        self.winner = 0
+        for listener in self.listeners:
+            listener.on_rollback(step[0], step[1], step[2])
+        # refresh the current status
+        if step[0] == 1:  
+            # If the current one is Black, then the state switches to waiting for Black to move
+            self.current_status = 1
+        elif step[0] == -1:
+            self.current_status = 2
+        else:
+            return Errorcode.code_error
+
+        return Errorcode.code_run
+
+
+    def get_current_status(self):
+        """
+        Get the current current_state
+        0 ~ No opening
+        1 ~ Wait for Black to move
+        2 ~ Wait for White to move
+        3 ~ End (one side wins)
+        4 ~ End (the board is full)
+        """
+        return self.current_status
+
+    def get_record_move(self):
+        """
+        return the record in this class
+        """
+        return self.record_move
+
+
+class Errorcode:
+    # The codes are class fields, so Errorcode.code_run can be used without building an object
+    code_forbidden = -5
+    code_pos = -4
+    code_wrong_range = -3
+    code_status_error = -2
+    code_error = -1
+    code_run = 0
+    code_over = 1
+    code_win = 2
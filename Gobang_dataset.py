@@ -0,0 +1,254 @@
+"""
+Training data export: every position of archived games becomes a sample for an evaluation model.
+
+A sample is
+    planes    (2, map_size, map_size) uint8, plane 0 the chess of the player to move, plane 1 the other chess
+    sides     int8, the player to move: 1 black, -1 white
+    moves     int16, the next move of the game, x * map_size + y
+    winners   int8, the winner of the game (GoBang.get_winner): 1 black, -1 white, 0 none
+Each position is written on the 8 symmetries of the board (the ones of Gobang_book.symmetric_spot), the board
+and the next move are moved together.
+
+The samples are written in shards of shard_size samples, one .npy file per field and shard
+(planes-00000.npy, sides-00000.npy, ...), only the last shard is shorter. np.load(path, mmap_mode='r')
+maps a shard without reading it, see load_shards. index.json lists the shards, it is written only when
+the export ends without an error, so a directory without it holds an unfinished export.
+
+The games are read one chunk at a time and the chunks are turned into samples on a process pool,
+only a few chunks are in flight and one shard is in memory, so the memory does not depend on the archive size.
+It needs NumPy.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from Gobang_book import SYMMETRIES, read_games, symmetric_spot
+
+FIELDS = ('planes', 'sides', 'moves', 'winners')
+INDEX_NAME = 'index.json'
+
+
+def symmetric_boards(boards, symmetry):
+    """
+    return the (N, S, S) boards on the symmetry number symmetry (0 to 7), like symmetric_spot moves a spot
+    """
+    swap, mirror_x, mirror_y = SYMMETRIES[symmetry]
+    if swap:
+        boards = boards.transpose(0, 2, 1)
+    if mirror_x:
+        boards = boards[:, ::-1, :]
+    if mirror_y:
+        boards = boards[:, :, ::-1]
+    return boards
+
+
+def game_samples(moves, winner, map_size=16, symmetries=8):
+    """
+    return the samples {field: array} of one game, a list of (x, y) moves black first:
+    the position before each move on the first symmetries symmetries of the board
+    """
+    count = len(moves)
+    sides = np.ones(count, dtype=np.int8)
+    sides[1::2] = -1
+    # boards[k] is the board before move k
+    boards = np.zeros((count, map_size, map_size), dtype=np.int8)
+    for step, (x, y) in enumerate(moves[:-1]):
+        boards[step + 1:, x, y] = sides[step]
+    own = boards == sides[:, None, None]
+    other = boards == -sides[:, None, None]
+    result = {field: [] for field in FIELDS}
+    for symmetry in range(symmetries):
+        planes = np.empty((count, 2, map_size, map_size), dtype=np.uint8)
+        planes[:, 0] = symmetric_boards(own, symmetry)
+        planes[:, 1] = symmetric_boards(other, symmetry)
+        result['planes'].append(planes)
+        result['moves'].append(np.array([x * map_size + y for x, y in
+                                         (symmetric_spot(x, y, map_size, symmetry) for x, y in moves)],
+                                        dtype=np.int16))
+        result['sides'].append(sides)
+        result['winners'].append(np.full(count, winner, dtype=np.int8))
+    return {field: np.concatenate(values) for field, values in result.items()}
+
+
+def chunk_samples(games, map_size=16, symmetries=8):
+    """
+    return the samples {field: array} of a list of (moves, winner) games
+    """
+    parts = [game_samples(moves, winner, map_size, symmetries) for moves, winner in games if moves]
+    if not parts:
+        return empty_samples(0, map_size)
+    return {field: np.concatenate([part[field] for part in parts]) for field in FIELDS}
+
+
+def empty_samples(count, map_size):
+    """
+    return {field: array} with room for count samples
+    """
+    return {
+        'planes': np.zeros((count, 2, map_size, map_size), dtype=np.uint8),
+        'sides': np.zeros(count, dtype=np.int8),
+        'moves': np.zeros(count, dtype=np.int16),
+        'winners': np.zeros(count, dtype=np.int8),
+    }
+
+
+class ShardWriter:
+    """
+    write samples to shards of shard_size samples in a directory, the shard in progress is kept in memory
+    the index of an export which was there before is removed, close writes the new one
+    """
+
+    def __init__(self, directory, map_size=16, shard_size=1 << 16, symmetries=8):
+        os.makedirs(directory, exist_ok=True)
+        index_path = os.path.join(directory, INDEX_NAME)
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        self.directory = directory
+        self.map_size = map_size
+        self.shard_size = shard_size
+        self.symmetries = symmetries
+        self.buffer = empty_samples(shard_size, map_size)
+        self.filled = 0
+        # the number of samples of each written shard
+        self.shards = []
+        self.samples = 0
+
+    def add(self, samples):
+        """
+        add the samples {field: array}, a full shard is written at once
+        """
+        count = len(samples['sides'])
+        start = 0
+        while start < count:
+            room = min(self.shard_size - self.filled, count - start)
+            for field in FIELDS:
+                self.buffer[field][self.filled:self.filled + room] = samples[field][start:start + room]
+            self.filled += room
+            start += room
+            if self.filled == self.shard_size:
+                self.flush()
+        self.samples += count
+
+    def flush(self):
+        """
+        write the samples in memory as the next shard
+        """
+        if not self.filled:
+            return
+        number = len(self.shards)
+        for field in FIELDS:
+            np.save(os.path.join(self.directory, f'{field}-{number:05d}.npy'), self.buffer[field][:self.filled])
+        self.shards.append(self.filled)
+        self.filled = 0
+
+    def close(self):
+        """
+        write the last shard and the index of the shards
+        """
+        self.flush()
+        index = {'map_size': self.map_size, 'shard_size': self.shard_size, 'symmetries': self.symmetries,
+                 'samples': self.samples, 'fields': list(FIELDS), 'shards': self.shards}
+        with open(os.path.join(self.directory, INDEX_NAME), 'w') as file:
+            json.dump(index, file, indent=1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # an export which failed keeps no index, its shards are not all there
+        if exc_type is None:
+            self.close()
+
+
+def load_index(directory):
+    with open(os.path.join(directory, INDEX_NAME)) as file:
+        return json.load(file)
+
+
+def load_shards(directory):
+    """
+    yield {field: array} for each shard of an export, the arrays are memory mapped
+    """
+    index = load_index(directory)
+    for number in range(len(index['shards'])):
+        yield {field: np.load(os.path.join(directory, f'{field}-{number:05d}.npy'), mmap_mode='r')
+               for field in index['fields']}
+
+
+def game_chunks(games, map_size, chunk_size):
+    """
+    group the (moves, winner, map_size) games of map_size into lists of (moves, winner) of chunk_size
+    """
+    chunk = []
+    for moves, winner, size in games:
+        if size != map_size:
+            continue
+        chunk.append((moves, winner))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_games(games, directory, map_size=16, shard_size=1 << 16, chunk_size=32, workers=None, symmetries=8):
+    """
+    write the samples of a stream of (moves, winner, map_size) games to shards in directory,
+    the games of other sizes are skipped, workers > 1 makes the samples on a process pool
+    return (games, samples) written
+    """
+    count = 0
+    with ShardWriter(directory, map_size, shard_size, symmetries) as writer:
+        if workers is None or workers <= 1:
+            for chunk in game_chunks(games, map_size, chunk_size):
+                writer.add(chunk_samples(chunk, map_size, symmetries))
+                count += len(chunk)
+            return count, writer.samples
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = []
+            for chunk in game_chunks(games, map_size, chunk_size):
+                pending.append(pool.submit(chunk_samples, chunk, map_size, symmetries))
+                count += len(chunk)
+                # keep a few chunks per worker in flight so the memory stays flat
+                if len(pending) >= workers * 2:
+                    writer.add(pending.pop(0).result())
+            for future in pending:
+                writer.add(future.result())
+        return count, writer.samples
+
+
+def export_files(paths, directory, map_size=16, shard_size=1 << 16, chunk_size=32, workers=None, symmetries=8):
+    """
+    export the games of record files (.gbr) or tournament JSON lines files, see export_games
+    """
+    def games():
+        for path in paths:
+            yield from read_games(path)
+    return export_games(games(), directory, map_size, shard_size, chunk_size, workers, symmetries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='export GoBang games as training samples in NumPy shards')
+    parser.add_argument('paths', nargs='+', help='record files (.gbr) or tournament JSON lines files')
+    parser.add_argument('--out', required=True, help='directory of the shards')
+    parser.add_argument('--size', type=int, default=16, help='board size of the games to export')
+    parser.add_argument('--shard', type=int, default=1 << 16, help='samples per shard')
+    parser.add_argument('--chunk', type=int, default=32, help='games per task of a worker')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes, all cores by default')
+    parser.add_argument('--symmetries', type=int, default=8, choices=(1, 2, 4, 8),
+                        help='symmetries of each position, 1 writes the positions as they are')
+    args = parser.parse_args()
+
+    begin = time.perf_counter()
+    games, samples = export_files(args.paths, args.out, args.size, args.shard, args.chunk, args.workers,
+                                  args.symmetries)
+    elapsed = time.perf_counter() - begin
+    print(f'{games} games, {samples} samples in {elapsed:.2f} s, {samples / elapsed:.0f} samples/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""
+Static evaluation of GoBang positions for the AI.
+Every window of 5 spots on a line which holds chess of only one color is a threat for that color,
+the more chess it holds the bigger the score (an open four is two windows of 4, a broken three is a window of 3).
+PatternEvaluator keeps the scores up to date after each move or rollback instead of scanning the whole board.
+"""
+
+# score of a window of 5 spots which holds k chess of one color and none of the other
+WINDOW_SCORES = (0, 1, 10, 100, 1000, 100000)
+
+# lines of 5 or more spots of each board size, built by board_lines the first time the size is used
+LINES = {}
+# (line index, index in the line) of the four lines through each spot, built by spot_lines
+SPOT_LINES = {}
+
+
+def build_window_table():
+    """
+    return the score of every window of 5 spots, indexed by its base 3 code
+    digit 0 is an empty spot, 1 is a black chess, 2 is a white chess, the first spot is the lowest digit
+    the score is positive for black and negative for white
+    """
+    table = []
+    for code in range(0, 3 ** 5):
+        black = 0
+        white = 0
+        for _ in range(0, 5):
+            digit = code % 3
+            code //= 3
+            if digit == 1:
+                black += 1
+            elif digit == 2:
+                white += 1
+        if white == 0:
+            table.append(WINDOW_SCORES[black])
+        elif black == 0:
+            table.append(-WINDOW_SCORES[white])
+        else:
+            table.append(0)
+    return table
+
+
+WINDOW_TABLE = build_window_table()
+# the base 3 digit of each chess
+DIGITS = {0: 0, 1: 1, -1: 2}
+
+
+def board_lines(map_size):
+    """
+    return all the lines of the board which can hold 5 links: rows, columns and both obliques
+    each line is a list of (x, y)
+    """
+    lines = LINES.get(map_size)
+    if lines is not None:
+        return lines
+    lines = []
+    for x in range(0, map_size):
+        lines.append([(x, y) for y in range(0, map_size)])
+    for y in range(0, map_size):
+        lines.append([(x, y) for x in range(0, map_size)])
+    for start in range(-(map_size - 1), map_size):
+        # right oblique, y - x is fixed
+        lines.append([(x, x + start) for x in range(0, map_size) if 0 <= x + start < map_size])
+        # left oblique, x + y is fixed
+        lines.append([(x, start + map_size - 1 - x) for x in range(0, map_size)
+                      if 0 <= start + map_size - 1 - x < map_size])
+    lines = [line for line in lines if len(line) >= 5]
+    LINES[map_size] = lines
+    return lines
+
+
+def spot_lines(map_size):
+    """
+    return a table of the lines through each spot, table[x][y] is a list of (line index, index in the line)
+    a spot near the corner can be on less than four lines, because short obliques are left out
+    """
+    table = SPOT_LINES.get(map_size)
+    if table is not None:
+        return table
+    table = [[[] for y in range(0, map_size)] for x in range(0, map_size)]
+    for index, line in enumerate(board_lines(map_size)):
+        for position, (x, y) in enumerate(line):
+            table[x][y].append((index, position))
+    SPOT_LINES[map_size] = table
+    return table
+
+
+def line_score(code, length):
+    """
+    return the sum of the window scores of a line from its base 3 code
+    """
+    total = 0
+    for _ in range(0, length - 4):
+        total += WINDOW_TABLE[code % 243]
+        code //= 3
+    return total
+
+
+def evaluate(game):
+    """
+    static evaluation of the position from the view of the player to move, scanning the whole board
+    it is the reference for PatternEvaluator
+    """
+    grid = game.map
+    total = 0
+    for line in board_lines(game.map_size):
+        code = 0
+        for x, y in reversed(line):
+            code = code * 3 + DIGITS[grid[x][y]]
+        total += line_score(code, len(line))
+    return total if game.current_status == 1 else -total
+
+
+class ScanEvaluator:
+    """
+    evaluator which scans the whole board each time, it has the same interface as PatternEvaluator
+    """
+
+    def __init__(self, game):
+        self.game = game
+
+    def evaluate(self, game=None):
+        """
+        return the score of the position from the view of the player to move
+        """
+        return evaluate(self.game if game is None else game)
+
+    def detach(self):
+        """
+        nothing to do, this evaluator does not follow the game
+        """
+
+
+class PatternEvaluator:
+    """
+    Keeps the base 3 code and the score of every line and the total score of the board.
+    It listens to the game, and after a move or a rollback it only updates the windows of the four lines
+    through the changed spot, each window score comes from WINDOW_TABLE.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.lines = board_lines(game.map_size)
+        self.spot_lines = spot_lines(game.map_size)
+        self.lengths = [len(line) for line in self.lines]
+        # powers[i] is 3 ** i, the value of digit i of a line code
+        self.powers = [3 ** i for i in range(0, game.map_size + 1)]
+        self.codes = [0] * len(self.lines)
+        self.scores = [0] * len(self.lines)
+        self.total = 0
+        for piece, x, y in game.get_record_move():
+            self.on_move(piece, x, y)
+        game.add_listener(self)
+
+    def detach(self):
+        """
+        stop following the game
+        """
+        self.game.remove_listener(self)
+
+    def evaluate(self, game=None):
+        """
+        return the score of the position from the view of the player to move
+        """
+        game = self.game if game is None else game
+        return self.total if game.current_status == 1 else -self.total
+
+    def on_move(self, piece, x, y):
+        """
+        a chess is put on (x, y)
+        """
+        self.__change(x, y, DIGITS[piece])
+
+    def on_rollback(self, piece, x, y):
+        """
+        the chess on (x, y) is taken away
+        """
+        self.__change(x, y, -DIGITS[piece])
+
+    def __change(self, x, y, digit):
+        """
+        add digit to the code of (x, y) on each line through it and update the windows which hold the spot
+        """
+        powers = self.powers
+        for index, position in self.spot_lines[x][y]:
+            code = self.codes[index]
+            # the windows starting from first to last hold the spot
+            first = max(0, position - 4)
+            last = min(position, self.lengths[index] - 5)
+            before = 0
+            after = 0
+            new_code = code + digit * powers[position]
+            for start in range(first, last + 1):
+                before += WINDOW_TABLE[(code // powers[start]) % 243]
+                after += WINDOW_TABLE[(new_code // powers[start]) % 243]
+            self.codes[index] = new_code
+            self.scores[index] += after - before
+            self.total += after - before
@@ -0,0 +1,189 @@
+"""
+Undo/redo history of a GoBang game as a tree of variations.
+A History follows its game as a listener, so every move and rollback of the game is recorded,
+the moves played after an undo start a new variation next to the old one.
+Undo and redo are one rollback or move, seek jumps to any move number of the current line
+and starts from a saved board (a snapshot every snapshot_every moves) when it is shorter than walking.
+"""
+from Gobang_core import Errorcode
+
+
+class Variation:
+    """
+    one node of the tree: the position after a move
+    children are the moves tried from this position, selected is the index of the child redo plays
+    """
+    __slots__ = ('piece', 'x', 'y', 'parent', 'children', 'selected', 'depth', 'snapshot')
+
+    def __init__(self, piece, x, y, parent):
+        self.piece = piece
+        self.x = x
+        self.y = y
+        self.parent = parent
+        self.children = []
+        self.selected = 0
+        self.depth = 0 if parent is None else parent.depth + 1
+        # (board, record_move, hash) of the position, only kept on every snapshot_every depth
+        self.snapshot = None
+
+    def get_move(self):
+        return (self.x, self.y)
+
+    def __repr__(self):
+        return f'Variation(depth={self.depth}, move={self.get_move()}, children={len(self.children)})'
+
+
+class History:
+
+    def __init__(self, game, snapshot_every=32):
+        """
+        game: the GoBang object to follow, the moves already on its board are the first line of the tree
+        snapshot_every: the distance in moves between two saved boards
+        """
+        self.game = game
+        self.snapshot_every = snapshot_every
+        self.root = Variation(0, -1, -1, None)
+        self.current = self.root
+        # the spots whose chess changed since take_changes was called
+        self.changed = []
+        for piece, x, y in game.get_record_move():
+            self.on_move(piece, x, y)
+        game.add_listener(self)
+
+    def on_move(self, piece, x, y):
+        """
+        go to the child of the move, it is a new variation if the move was never played here
+        """
+        node = self.current
+        for index, child in enumerate(node.children):
+            if child.x == x and child.y == y and child.piece == piece:
+                break
+        else:
+            child = Variation(piece, x, y, node)
+            node.children.append(child)
+            index = len(node.children) - 1
+            # the chess and the hash are already updated when the listeners are told,
+            # the moves which were on the board before the history was made are not saved
+            if child.depth % self.snapshot_every == 0 and len(self.game.record_move) == child.depth:
+                child.snapshot = (self.game.board.copy(), list(self.game.record_move), self.game.hash)
+        node.selected = index
+        self.current = child
+        self.changed.append((x, y))
+
+    def on_rollback(self, piece, x, y):
+        """
+        go back to the parent, its selected child stays the one we leave, so redo comes back here
+        """
+        self.current = self.current.parent
+        self.changed.append((x, y))
+
+    def undo(self):
+        """
+        take the last move back, return the Errorcode of GoBang.rollback
+        """
+        return self.game.rollback()
+
+    def redo(self, index=None):
+        """
+        play the selected move from the current position again, or the variation number index
+        return the Errorcode of GoBang.move, code_error if there is nothing to redo
+        """
+        node = self.current
+        if index is None:
+            index = node.selected
+        if not 0 <= index < len(node.children):
+            return Errorcode.code_error
+        child = node.children[index]
+        return self.game.move(child.x, child.y)
+
+    def variations(self):
+        """
+        return the (x, y) of every move which was tried from the current position
+        """
+        return [child.get_move() for child in self.current.children]
+
+    def line(self):
+        """
+        return the nodes of the current line: the root, the moves up to the current position,
+        then the selected moves which redo would play
+        """
+        nodes = []
+        node = self.current
+        while node is not None:
+            nodes.append(node)
+            node = node.parent
+        nodes.reverse()
+        node = self.current
+        while node.children:
+            node = node.children[node.selected]
+            nodes.append(node)
+        return nodes
+
+    def get_steps(self):
+        """
+        return the number of moves of the current line
+        """
+        return len(self.line()) - 1
+
+    def seek(self, number):
+        """
+        go to the position after number moves of the current line
+        it walks with rollback and move, or restores the nearest saved board before number and walks from there
+        when that is shorter; the saved board is only used when no other listener follows the game
+        return code_run, or code_wrong_range if the line has no such move
+        """
+        line = self.line()
+        if not 0 <= number < len(line):
+            return Errorcode.code_wrong_range
+        depth = start = self.current.depth
+        # only the spots between the two positions change, whatever way is used to go there
+        changed = self.changed + [(x, y) for _, x, y in self.game.record_move[number:depth]]
+        base = self.__snapshot_before(line, number)
+        if number - base.depth + 1 < abs(depth - number) and self.game.listeners == [self]:
+            self.__restore(base)
+            depth = base.depth
+        while depth > number:
+            self.game.rollback()
+            depth -= 1
+        while depth < number:
+            depth += 1
+            if self.game.move(line[depth].x, line[depth].y) < Errorcode.code_run:
+                return Errorcode.code_error
+        self.changed = changed + [(x, y) for _, x, y in self.game.record_move[start:number]]
+        return Errorcode.code_run
+
+    def __snapshot_before(self, line, number):
+        """
+        return the nearest node with a saved board at or before number on the line, the root if there is none,
+        the root is the empty board
+        """
+        depth = number - number % self.snapshot_every
+        while depth > 0:
+            if line[depth].snapshot is not None:
+                return line[depth]
+            depth -= self.snapshot_every
+        return self.root
+
+    def __restore(self, base):
+        """
+        put the game at the saved board of base
+        """
+        if base is self.root:
+            self.game.restore(self.game.BACKENDS[self.game.backend](self.game.map_size), [], 0)
+        else:
+            self.game.restore(*base.snapshot)
+        self.current = base
+
+    def take_changes(self):
+        """
+        return the spots whose chess changed since the last call, each spot once
+        """
+        changed = list(dict.fromkeys(self.changed))
+        self.changed = []
+        return changed
+
+    def detach(self):
+        """
+        stop following the game
+        """
+        self.game.remove_listener(self)
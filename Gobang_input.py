@@ -0,0 +1,330 @@
+"""
+Recorded input streams of the game window and their headless replay.
+
+InputRecorder logs the mouse clicks and the keys which the window handles (MOUSEBUTTONUP, KEYDOWN), each one
+with the milliseconds since the recording started: python Gobang_main.py --record session.gbi.
+The file starts with MAGIC and a header (seed, board size, unit, rule), then the events one after another,
+EVENT (milliseconds, kind) and the fields of the kind: x, y and button for a click, the key code for a key.
+
+replay_input feeds the events of a file to a window on the SDL dummy drivers through GameGoBang.loop_iteration,
+as fast as it can or at the times they were recorded (speed 2 is twice as fast). The module random is seeded
+with the seed of the file before the window is made, so the background pictures of the rounds are the same
+and a replay ends on the same position every time, see ReplayReport.digest.
+The time each event takes to be handled is kept in a histogram for each target (board, undo, redo, new round,
+key) and for each block of events, so a slowdown over a long session shows up.
+
+write_session makes a long session without a human: random clicks on the board, an undo every few moves
+and New Round when a round ends.
+
+    python Gobang_input.py session.gbi --realtime
+    python Gobang_input.py long.gbi --make 5000 --undo-every 5
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import random
+import struct
+import time
+
+from Gobang_profile import Histogram, headless_window
+
+MAGIC = b'GBI1'
+INPUT_SUFFIX = '.gbi'
+# seed, map_size, unit, length of the rule name, then the rule name
+HEADER = struct.Struct('<IHHB')
+# milliseconds since the start of the recording, kind
+EVENT = struct.Struct('<IB')
+CLICK = 1
+KEY = 2
+# the fields of each kind: x, y, button of a click and the code of a key
+FIELDS = {CLICK: struct.Struct('<HHB'), KEY: struct.Struct('<I')}
+# the targets of the events, see event_target
+TARGETS = ('board', 'undo', 'redo', 'new', 'exit', 'key')
+
+
+class InputRecorder:
+    """
+    write the events of a window to an input file, window.recorder = InputRecorder(path, window, seed)
+    seed is the one random was seeded with before the window was made
+    clock() returns the seconds since the recording started, the time of the events
+    """
+
+    def __init__(self, path, window, seed=0, clock=None):
+        self.file = open(path, 'wb')
+        rule = window.rule.name.encode()
+        self.file.write(MAGIC + HEADER.pack(seed, window.map_size, window.unit, len(rule)) + rule)
+        begin = time.perf_counter()
+        self.clock = clock or (lambda: time.perf_counter() - begin)
+        self.count = 0
+
+    def record(self, events):
+        """
+        write the clicks and the keys among the pygame events
+        """
+        from Gobang_main import pygame
+        if self.file is None:
+            return
+        milliseconds = int(self.clock() * 1000)
+        for event in events:
+            if event.type == pygame.MOUSEBUTTONUP:
+                self.file.write(EVENT.pack(milliseconds, CLICK)
+                                + FIELDS[CLICK].pack(event.pos[0], event.pos[1], event.button))
+            elif event.type == pygame.KEYDOWN:
+                self.file.write(EVENT.pack(milliseconds, KEY) + FIELDS[KEY].pack(event.key))
+            else:
+                continue
+            self.count += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_input(path):
+    """
+    return (header, events) of an input file, header is {'seed', 'map_size', 'unit', 'rule'}
+    and events the list of (milliseconds, kind, fields)
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f'{path} is not a GoBang input file')
+    seed, map_size, unit, length = HEADER.unpack_from(data, len(MAGIC))
+    position = len(MAGIC) + HEADER.size
+    header = {'seed': seed, 'map_size': map_size, 'unit': unit,
+              'rule': data[position:position + length].decode()}
+    position += length
+    events = []
+    while position < len(data):
+        if position + EVENT.size > len(data):
+            raise ValueError(f'{path} ends in the middle of an event')
+        milliseconds, kind = EVENT.unpack_from(data, position)
+        position += EVENT.size
+        fields = FIELDS[kind]
+        if position + fields.size > len(data):
+            raise ValueError(f'{path} ends in the middle of an event')
+        events.append((milliseconds, kind, fields.unpack_from(data, position)))
+        position += fields.size
+    return header, events
+
+
+def make_event(kind, fields):
+    """
+    return the pygame event of a recorded event
+    """
+    from Gobang_main import pygame
+    if kind == CLICK:
+        x, y, button = fields
+        return pygame.event.Event(pygame.MOUSEBUTTONUP, pos=(x, y), button=button)
+    return pygame.event.Event(pygame.KEYDOWN, key=fields[0])
+
+
+def event_target(window, kind, fields):
+    """
+    return what the event is for in the window, one of TARGETS
+    """
+    if kind == KEY:
+        return 'key'
+    x, y = fields[0], fields[1]
+    for name, (range_x, range_y) in (('new', (window.new_x, window.new_y)),
+                                     ('exit', (window.button_exit_x, window.button_exit_y)),
+                                     ('undo', (window.button_undo_x, window.button_undo_y)),
+                                     ('redo', (window.button_redo_x, window.button_redo_y))):
+        if range_x[0] < x < range_x[1] and range_y[0] < y < range_y[1]:
+            return name
+    return 'board'
+
+
+def window_digest(window):
+    """
+    return a short digest of the state of a window: the moves, the status and the background picture
+    two replays of the same file give the same digest
+    """
+    state = repr((window.get_record_move(), window.get_current_status(), window.picture))
+    return hashlib.sha1(state.encode()).hexdigest()[:16]
+
+
+class ReplayReport:
+    """
+    the handling time of the events of a replay: a Histogram for each target and for all the events,
+    the mean of each block of block_size events and the slowest events
+    """
+
+    def __init__(self, block_size=1000, slowest=10):
+        self.histograms = {}
+        self.total = Histogram()
+        self.block_size = block_size
+        # the mean microseconds of each full block of events
+        self.blocks = []
+        self.block_total = 0
+        self.slowest_size = slowest
+        # (nanoseconds, number, target) of the slowest events, a heap
+        self.slowest = []
+        self.events = 0
+        self.elapsed = 0.0
+        self.digest = None
+        self.exited = False
+
+    def add(self, target, nanoseconds):
+        histogram = self.histograms.get(target)
+        if histogram is None:
+            histogram = self.histograms[target] = Histogram()
+        histogram.add(nanoseconds)
+        self.total.add(nanoseconds)
+        self.block_total += nanoseconds
+        self.events += 1
+        if self.events % self.block_size == 0:
+            self.blocks.append(self.block_total / self.block_size / 1e3)
+            self.block_total = 0
+        if len(self.slowest) < self.slowest_size:
+            heapq.heappush(self.slowest, (nanoseconds, self.events - 1, target))
+        elif nanoseconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (nanoseconds, self.events - 1, target))
+
+    def get_drift(self):
+        """
+        return the mean handling time of the blocks of the second half of the session divided by the one
+        of the first half, more than 1 when the events get slower along the session, 1.0 with less than two blocks
+        """
+        half = len(self.blocks) // 2
+        if not half:
+            return 1.0
+        first = sum(self.blocks[:half]) / half
+        second = sum(self.blocks[-half:]) / half
+        return second / first if first else 1.0
+
+    def to_dict(self):
+        return {
+            'events': self.events,
+            'elapsed': self.elapsed,
+            'digest': self.digest,
+            'exited': self.exited,
+            'total': self.total.to_dict(),
+            'targets': {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+            'blocks_us': self.blocks,
+            'drift': self.get_drift(),
+            'slowest': [{'event': number, 'target': target, 'us': nanoseconds / 1e3}
+                        for nanoseconds, number, target in sorted(self.slowest, reverse=True)],
+        }
+
+    def __repr__(self):
+        lines = [f'{"target":8s} {"events":>8s} {"mean us":>9s} {"p50 us":>9s} {"p99 us":>9s} {"max us":>10s}']
+        for name, histogram in list(self.histograms.items()) + [('all', self.total)]:
+            value = histogram.to_dict()
+            lines.append(f'{name:8s} {value["calls"]:8d} {value["mean_us"]:9.1f} {value["p50_us"]:9.1f} '
+                         f'{value["p99_us"]:9.1f} {value["max_us"]:10.1f}')
+        lines.append(f'{self.events} events in {self.elapsed:.2f} s, drift {self.get_drift():.2f} '
+                     f'over {len(self.blocks)} blocks of {self.block_size}, digest {self.digest}')
+        return '\n'.join(lines)
+
+
+def replay_input(path, realtime=False, speed=1.0, block_size=1000):
+    """
+    replay an input file in a headless window and return its ReplayReport
+    realtime waits for the time of each event divided by speed, else the events are handled one after another
+    the replay stops at a click on the Exit button
+    """
+    header, events = read_input(path)
+    window = headless_window(header['seed'], header['map_size'], header['unit'], header['rule'])
+    window.start_round()
+    window.display_update()
+    report = ReplayReport(block_size)
+    clock = time.perf_counter_ns
+    begin = time.perf_counter()
+    for milliseconds, kind, fields in events:
+        if realtime:
+            delay = begin + milliseconds / 1000 / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        target = event_target(window, kind, fields)
+        event = make_event(kind, fields)
+        start = clock()
+        try:
+            window.loop_iteration([event])
+        except SystemExit:
+            report.exited = True
+        report.add(target, clock() - start)
+        if report.exited:
+            break
+    report.elapsed = time.perf_counter() - begin
+    report.digest = window_digest(window)
+    return report
+
+
+def write_session(path, moves=2000, undo_every=5, seed=0, map_size=16, interval=0.5):
+    """
+    write an input file of a session of moves clicks on random empty spots, an undo click after every
+    undo_every moves and a click on New Round when a round ends, the events are interval seconds apart
+    and go through the window like real ones
+    return the number of events
+    """
+    window = headless_window(seed, map_size)
+    from Gobang_main import pygame
+    rng = random.Random(seed)
+
+    def center(range_x, range_y):
+        return (range_x[0] + range_x[1]) // 2, (range_y[0] + range_y[1]) // 2
+
+    undo = center(window.button_undo_x, window.button_undo_y)
+    new = center(window.new_x, window.new_y)
+
+    def click(pos):
+        window.loop_iteration([pygame.event.Event(pygame.MOUSEBUTTONUP, pos=pos, button=1)])
+
+    with InputRecorder(path, window, seed) as recorder:
+        recorder.clock = lambda: recorder.count * interval
+        window.recorder = recorder
+        window.start_round()
+        played = 0
+        while played < moves:
+            spots = [(x, y) for x in range(window.map_size) for y in range(window.map_size)
+                     if window.board.get(x, y) == 0]
+            if window.get_current_status() >= 3 or not spots:
+                click(new)
+                continue
+            x, y = rng.choice(spots)
+            click((window.width + x * window.unit, window.width + y * window.unit))
+            played += 1
+            if undo_every and played % undo_every == 0:
+                click(undo)
+        window.recorder = None
+        return recorder.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='replay the recorded input of a GoBang window headless')
+    parser.add_argument('path', help='input file (.gbi), written by python Gobang_main.py --record')
+    parser.add_argument('--realtime', action='store_true', help='wait for the recorded time of each event')
+    parser.add_argument('--speed', type=float, default=1.0, help='speed of a realtime replay')
+    parser.add_argument('--check', action='store_true', help='replay twice and compare the end positions')
+    parser.add_argument('--block', type=int, default=1000, help='events of a block of the drift')
+    parser.add_argument('--json', default=None, help='save the report to this JSON file')
+    parser.add_argument('--make', type=int, default=None, help='first write a session of this many moves to path')
+    parser.add_argument('--undo-every', type=int, default=5, help='moves between two undo clicks of --make')
+    parser.add_argument('--size', type=int, default=16, help='board size of --make')
+    parser.add_argument('--seed', type=int, default=0, help='seed of --make')
+    args = parser.parse_args()
+
+    if args.make is not None:
+        count = write_session(args.path, args.make, args.undo_every, args.seed, args.size)
+        print(f'{args.path}: {count} events')
+    report = replay_input(args.path, args.realtime, args.speed, args.block)
+    print(report)
+    if args.check:
+        again = replay_input(args.path, block_size=args.block)
+        print(f'second replay digest {again.digest}: {"same" if again.digest == report.digest else "DIFFERENT"}')
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report.to_dict(), file, indent=1)
+
+
+if __name__ == '__main__':
+    main()
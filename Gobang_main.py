@@ -1,226 +1,64 @@
-import pygame
 import sys
 import random
-from pygame.locals import *
+import time
 
-class GoBang:
-    def __init__(self, map_size=16):
-        """
-        # map_size * map_size reresent a chessboard
-        # '# 0 : represent the empty
-        # 1 : represent the black chess
-        # -1 : represent the white chess
-        """
-        self.map_size = map_size
-        self.map = [[0 for y in range(0, map_size)] for x in range(0, map_size)]
-        # A historical record of each step,used for contrite chess.
-        # It is a list whose members are a tuple (chess piece type, map.x, map.y)
-        self.record_move = []
-
-        self.current_status = 0
-        self.winner = 0
-
-    def start_move(self):
-        """ 
-        start to move
-        no input
-        change the current_status to 1 which means start game and it is for black player's term  
-        """
-        self.current_status = 1
-
-    def get_last_move(self):
-        """
-        return the last step of move, which is a helper method for undo
-        """
-        return self.record_move[-1]
-
-    def get_winner(self):
-        """
-        return the winner from this class's field
-        """
-        return self.winner
-
-    def get_steps(self):
-        """
-        return the length of the record list, which means how many steps did the player move
-        """
-        return len(self.record_move)
-
-    def check_win(self):
-        """
-        The algorithm to judge the winning and losing: it only needs to judge whether the four lines 
-        related to the current spot (horizontal, vertical, left oblique, right oblique) form 5 links.
-
-        Add all the drops on the line (black ~ 1, white ~ -1) in turn. 
-        If the sum of the absolute values of the consecutive drops reaches 5, it can be judged as victory
-        """
-        temp = 0
-        last_step = self.record_move[-1]
-
-        #first case, there are five same chess on the vertical line
-        #Check vertical line, x is fixed
-        for y in range(0, self.map_size):
-            # It should be continuous, if not, temp will be 0
-            if y > 0 and self.map[last_step[1]][y] != self.map[last_step[1]][y - 1]:
-                temp = 0
-            temp += self.map[last_step[1]][y]
-            if abs(temp) >= 5:
-                return last_step[0]
-
-        # second case, there are five same chess on the horizontal line
-        # check the Horizontal line, y is fixed
-        temp = 0
-        for x in range(0, self.map_size):
-            if x > 0 and self.map[x][last_step[2]] != self.map[x - 1][last_step[2]]:
-                temp = 0
-            temp += self.map[x][last_step[2]]
-            if abs(temp) >= 5:
-                return last_step[0]
-
-        # Right oblique line, calculate the coordinates of the upper left vertex. And then both x and y increase to the bottom right corner.
-        temp = 0
-        min_dist = min(last_step[1], last_step[2])
-        top_point = [last_step[1] - min_dist, last_step[2] - min_dist]
-        for incr in range(0, self.map_size):
-            # it cannot go out of boundary
-            if top_point[0] + incr > self.map_size - 1 or top_point[1] + incr > self.map_size - 1:
-                break
-            if incr > 0 and self.map[top_point[0] + incr][top_point[1] + incr] \
-                != self.map[top_point[0] + incr - 1][top_point[1] + incr - 1]:
-                temp = 0
-            temp += self.map[top_point[0] + incr][top_point[1] + incr]
-            if abs(temp) >= 5:
-                return last_step[0]
-
-        # Left oblique line, calculate the coordinates of the upper right vertex. Then x decreases and y increases, reaching the bottom-left vertex.
-        temp = 0
-        min_dist = min(self.map_size - 1 - last_step[1], last_step[2])
-        top_point = [last_step[1] + min_dist, last_step[2] - min_dist]
-        for incr in range(0, self.map_size):
-            if top_point[0] - incr < 0  or top_point[1] + incr > self.map_size - 1:
-                break
-            if incr > 0 and self.map[top_point[0] - incr][top_point[1] + incr] \
-                    != self.map[top_point[0] - incr + 1][top_point[1] + incr - 1]:
-                temp = 0
-            temp += self.map[top_point[0] - incr][top_point[1] + incr]
-            if abs(temp) >= 5:
-                return last_step[0]
-
-        return 0
-
-    
-    def if_gameover(self):
-        """
-        Determine whether this bureau is over
-        return code C if all the steps is complete
-        return code code_win if one player win
-        return code code_run to countinue
-        """
-        if len(self.record_move) >= self.map_size ** 2:
-            return Errorcode().code_over
-        winner = self.check_win()
-        if winner != 0:
-            self.winner = winner
-            return Errorcode().code_win
-
-        return Errorcode().code_run
-
-    
-    def move(self, x, y):
-        """
-        input the cordinate of the chess
-        and record it in the map with white and black color
-        and determine if game is over, and return the code
-        """
-        if self.current_status != 1 and self.current_status != 2:
-            return Errorcode().code_status_error
-        if self.map_size <= x or x < 0 or self.map_size <= y or y < 0:
-            return Errorcode().code_wrong_range
-        if self.map[x][y] != 0:
-            return Errorcode().code_pos
-
-        t = 1 if self.current_status == 1 else -1
-        self.map[x][y] = t
-        self.record_move.append((t, x, y))
-
-        # Determine whether it is over
-        ret = self.if_gameover()
-        if self.is_finish(ret):
-            if ret == Errorcode().code_win:
-                self.__set_current_status(3)
-            else:
-                self.__set_current_status(4)
-            return ret
-
-        # change the current_state after each step
-        last_step = self.record_move[-1]
-        current_stat = 2 if last_step[0] == 1 else 1
-        self.__set_current_status(current_stat)
-        return Errorcode().code_run
-
-    def __set_current_status(self, current_stat):
-        """
-        input the currect status and change the field of this class to current status
-        """
-        self.current_status = current_stat
-
-    def is_finish(self, err_code):
-        """
-        get the error code and return a boolean by the game stat
-        """
-        if err_code == Errorcode().code_error or err_code == Errorcode().code_win:
-            return True
-        return False
-
-    def rollback(self):
-        """
-        this function is for rollback the laststep
-        it will determine if there is exist steps, if not will return error code
-        then the function will use pop method to delete the latest steps from the move records
-        after remove will refresh the status of the game
-        """
-        if len(self.record_move) == 0:
-            return Errorcode().code_error
-        step = self.record_move.pop()
-        self.map[step[1]][step[2]] = 0
-        # refresh the current status
-        if step[0] == 1:  
-            # If the current one is Black, then the state switches to waiting for Black to move
-            self.current_status = 1
-        elif step[0] == -1:
-            self.current_status = 2
-        else:
-            return Errorcode().code_error
-
-        return Errorcode().code_run
+from Gobang_assets import ASSETS
+from Gobang_core import BitBoard, Errorcode, GoBang, ListBoard
+from Gobang_history import History
+from Gobang_players import Human, MoveWorker, legal_move
 
+# pygame is only imported when a GameGoBang window is built, see load_pygame
+pygame = None
+# the event type of the moves of the computer players, made by load_pygame
+COMPUTER_MOVE = None
 
-    def get_current_status(self):
-        """
-        Get the current current_state
-        0 ~ No opening
-        1 ~ Wait for Black to move
-        2 ~ Wait for White to move
-        3 ~ End (one side wins)
-        4 ~ End (the board is full)
-        """
-        return self.current_status
 
-    def get_record_move(self):
-        """
-        return the record in this class
-        """
-        return self.record_move
+def load_pygame():
+    """
+    import pygame the first time a window is needed and keep it in the module field
+    so importing this file for the GoBang rules does not need pygame or a display
+    """
+    global pygame, COMPUTER_MOVE
+    if pygame is None:
+        import pygame as module
+        pygame = module
+        COMPUTER_MOVE = pygame.event.custom_type()
+    return pygame
 
 
 class GameGoBang(GoBang):
-
-    def __init__(self, map_size=16, map_unit=50):
-
+    # the most display updates in a second
+    FPS = 60
+    # the board side in pixels that map_unit=None fits the board into, and the smallest unit it uses
+    BOARD_PIXELS = 750
+    MIN_UNIT = 16
+    # the window is never lower than this, so the panel buttons fit on small boards
+    MIN_HEIGHT = 760
+    # the InputRecorder of Gobang_input which logs the mouse and key events, None when nothing is recorded
+    recorder = None
+
+    def __init__(self, map_size=16, map_unit=50, rule='freestyle', players=None):
+        """
+        map_unit is the pixels between two lines, None picks the unit which fits the board in BOARD_PIXELS
+        rule is the rule name, see Gobang_rules
+        players is (black, white), each one a Human or a Computer of Gobang_players, two humans by default
+        """
+        load_pygame()
         # The parent class is initialized
-        super(GameGoBang, self).__init__(map_size=map_size)
+        super(GameGoBang, self).__init__(map_size=map_size, rule=rule)
+        # undo, redo and the variations of this round
+        self.history = History(self)
+
+        # the ticket of the search of the computer and when it started, None when no computer thinks
+        self.thinking = None
+        self.thinking_since = 0.0
+        # the worker process of the computer players is kept by a new round with the same players
+        if getattr(self, 'players', None) is not players or players is None:
+            self.set_players(players or (Human(), Human()))
 
         self.SIZE = map_size
+        if map_unit is None:
+            map_unit = max(self.MIN_UNIT, min(50, self.BOARD_PIXELS // max(1, map_size - 1)))
         self.unit = map_unit
         self.TITLE = 'GoBang'
         self.panel_size = 285  # the width for the right panel
@@ -239,7 +77,7 @@ class GameGoBang(GoBang):
 
         # Calculating the window size
         self.WINDOW_WIDTH = self.width * 2  + self.panel_size + (self.SIZE - 1) * self.unit
-        self.WINDOW_HEIGHT = self.width * 2  + (self.SIZE - 1) * self.unit
+        self.WINDOW_HEIGHT = max(self.MIN_HEIGHT, self.width * 2  + (self.SIZE - 1) * self.unit)
 
 
         # Initializing the Game
@@ -249,55 +87,96 @@ class GameGoBang(GoBang):
     def chess_borad_draw(self):
         """
         this function is using to draw the chess board
+        the background, the lines and the numbers are drawn once on self.board_surface by board_surface_draw,
+        so drawing the chess board is only one blit
+        """
+        self.screen.blit(self.board_surface, (0, 0))
+
+    def board_surface_draw(self):
+        """
+        return a surface of the whole window with the background and the chess board
         the chess board is drawing by the unit number of col and row with number
         """
+        surface = pygame.Surface((self.WINDOW_WIDTH, self.WINDOW_HEIGHT)).convert()
+        surface.blit(self.background, (0, 0))
         pos_start = [self.width, self.width]
 
-        s_font = pygame.font.SysFont('arial', 16)
+        s_font = ASSETS.font('arial', 16)
         # draw the row
         for item in range(0, self.SIZE):
-            pygame.draw.line(self.screen, Color().BLACK,[pos_start[0], pos_start[1] + item * self.unit],
+            pygame.draw.line(surface, Color().BLACK,[pos_start[0], pos_start[1] + item * self.unit],
             [pos_start[0] + (self.SIZE - 1) * self.unit,pos_start[1] + item * self.unit], 1)
             s_surface = s_font.render(f'{item + 1}', True, Color().BLACK)
-            self.screen.blit(s_surface, [pos_start[0] - 30, pos_start[1] + item * self.unit - 10])
+            surface.blit(s_surface, [pos_start[0] - 30, pos_start[1] + item * self.unit - 10])
 
         # draw the col
         for item in range(0, self.SIZE):
-            pygame.draw.line(self.screen, Color().BLACK,[pos_start[0] + item * self.unit, pos_start[1]],
+            pygame.draw.line(surface, Color().BLACK,[pos_start[0] + item * self.unit, pos_start[1]],
                              [pos_start[0] + item * self.unit, pos_start[1] + (self.SIZE - 1) * self.unit],1)
             s_surface = s_font.render(f'{item + 1}', True, Color().BLACK)
-            self.screen.blit(s_surface, [pos_start[0] + item * self.unit - 5, pos_start[1] - 30])
+            surface.blit(s_surface, [pos_start[0] + item * self.unit - 5, pos_start[1] - 30])
+        return surface
 
     # Draw a chess
     def chess_draw(self):
         """
         this fucntion is using to draw the chess with the current chess pos
-        the pygame is refresh in very fast speed and it will draw all the thing ceaseless
-        so we need to iterate the list of chess to draw each of them
+        we need to iterate the list of chess to draw each of them
         the chess color will switch with it's parameter
         """
         chess_position = self.get_record_move()
         for item in chess_position:
-            x = self.width + item[1] * self.unit
-            y = self.width + item[2] * self.unit
-            t_color = Color().BLACK if item[0] == 1 else Color().WHITE
-            pygame.draw.circle(self.screen, t_color, [
-                               x, y], int(self.unit / 2.5))
+            self.stone_draw(item[0], item[1], item[2])
+
+    def stone_draw(self, piece, s_x, s_y):
+        """
+        draw one chess of the piece type on the spot (s_x, s_y) and return the rectangle which was changed
+        """
+        x = self.width + s_x * self.unit
+        y = self.width + s_y * self.unit
+        t_color = Color().BLACK if piece == 1 else Color().WHITE
+        return pygame.draw.circle(self.screen, t_color, [x, y], int(self.unit / 2.5))
+
+    def spot_draw(self, s_x, s_y):
+        """
+        draw the spot (s_x, s_y) again as it is on the board: the chess board from the cached surface,
+        then the chess if there is one, and mark it as changed
+        """
+        radius = int(self.unit / 2.5) + 1
+        area = pygame.Rect(self.width + s_x * self.unit - radius, self.width + s_y * self.unit - radius,
+                           radius * 2 + 1, radius * 2 + 1)
+        self.screen.blit(self.board_surface, area, area)
+        piece = self.board.get(s_x, s_y)
+        if piece != 0:
+            self.stone_draw(piece, s_x, s_y)
+        self.dirty.append(area)
+
+    def history_draw(self):
+        """
+        draw the spots which changed since the last draw, after a move, undo, redo or seek of the history,
+        and the panel
+        """
+        for s_x, s_y in self.history.take_changes():
+            self.spot_draw(s_x, s_y)
+        self.panel_draw()
 
     # redraw all the window
     def __redraw_all(self):
         """
         reset all the display thing in this class
         draw the chess board and draw the background, panel
+        all the static parts come from the cached surfaces, the whole window is updated at the next frame
         """
-        # refresh the background
-        self.screen.blit(pygame.image.load(self.picture), (0, 0))
-        # draw the chess board
+        # draw the background and the chess board
         self.chess_borad_draw()
         # draw the chess
         self.chess_draw()
         # draw the panel
+        self.screen.blit(self.panel_surface, (self.panel_left, 0))
         self.panel_draw()
+        self.dirty = [self.screen.get_rect()]
+        # every spot is drawn already
+        self.history.take_changes()
 
     def game_window(self):
         """
@@ -305,36 +184,102 @@ class GameGoBang(GoBang):
         it will set the window title and size
         it will get the picture of the picture class
         it will draw the chess board and right panel
-        """
-        # Initialize pygame
-        pygame.init()
-        # Sets the size of the window in pixels
-        self.screen = pygame.display.set_mode(
-            (self.WINDOW_WIDTH, self.WINDOW_HEIGHT))
-        # Setting the Window Title
-        pygame.display.set_caption(self.TITLE)
-        # Setting the Background Color
-        # self.screen.fill(WHITE)
-
-        background = pygame.image.load(self.picture)
-        self.screen.blit(background, (0, 0))
-
-        # Loading sound files
-        self.sound_black = pygame.mixer.Sound(Bgm("p1").get_voice())
-        self.sound_white = pygame.mixer.Sound(Bgm("p2").get_voice())
-        self.sound_win = pygame.mixer.Sound(Bgm("win").get_voice())
-        self.sound_error = pygame.mixer.Sound(Bgm("error").get_voice())
-        self.sound_start = pygame.mixer.Sound(Bgm("newgame").get_voice())
-
-        # Draw a checkerboard
-        self.chess_borad_draw()
-
-        # Draw the current_status panel on the right
-        self.panel_draw()
+        the picture, the chess board and the buttons are drawn once on surfaces which are reused by every redraw
+        all of them come from the asset cache of the process, so a new round does not load or draw them again
+        """
+        # Initialize pygame and set the size of the window in pixels, only the first time or for a new size
+        self.screen = ASSETS.display((self.WINDOW_WIDTH, self.WINDOW_HEIGHT), self.TITLE)
+
+        # the picture is decoded once and converted to the pixel format of the window
+        self.background = ASSETS.image(self.picture)
+        if self.background.get_height() < self.WINDOW_HEIGHT:
+            # a big board with a big unit, the picture is stretched to cover the whole board
+            self.background = ASSETS.image(self.picture, max(self.WINDOW_WIDTH, self.WINDOW_HEIGHT))
+        self.board_surface = ASSETS.surface(('board', self.picture, self.SIZE, self.unit, self.WINDOW_WIDTH,
+                                             self.WINDOW_HEIGHT), self.board_surface_draw)
+        self.panel_font = ASSETS.font('simhei', 20)
+        # the rendered texts of the panel, the state texts and the steps counts are rendered once each
+        self.panel_texts = ASSETS.surface(('panel texts', 'simhei', 20), dict)
+        self.panel_layout()
+        self.panel_surface = ASSETS.surface(('panel', self.PANEL_X[0], self.PANEL_Y[0], self.WINDOW_WIDTH,
+                                             self.WINDOW_HEIGHT), self.panel_surface_draw)
+        # the rectangles of the window which changed since the last display update
+        self.dirty = []
+        self.clock = pygame.time.Clock()
+
+        # Loading sound files, the ones which are not played at every move are decoded in the background
+        self.sound_black = ASSETS.sound(Bgm("p1").get_voice())
+        self.sound_white = ASSETS.sound(Bgm("p2").get_voice())
+        self.sound_win = ASSETS.sound(Bgm("win").get_voice(), lazy=True)
+        self.sound_error = ASSETS.sound(Bgm("error").get_voice(), lazy=True)
+        self.sound_start = ASSETS.sound(Bgm("newgame").get_voice(), lazy=True)
+
+        # Draw a checkerboard and the current_status panel on the right
+        self.__redraw_all()
+
+    # the size of the buttons of the panel and the place of their text
+    BUTTON_WIDTH = 150
+    BUTTON_HEIGHT = 50
+    BUTTON_TEXT = (35, 15)
+
+    def panel_layout(self):
+        """
+        compute the place of the panel and the ranges of the buttons, they are saved for button_press
+        """
+        self.panel_left = self.PANEL_X[0] + 30
+        # refresh the game button
+        offset_x = self.PANEL_X[0] + 50
+        offset_y = self.PANEL_Y[0] + 400
+        button_height = self.BUTTON_HEIGHT
+        button_width = self.BUTTON_WIDTH
+        button_gap = 20
+        self.new_x = [offset_x, offset_x + button_width]
+        self.new_y = [offset_y, offset_y + button_height]
+        # exit the game bhutton
+        self.button_exit_x = [offset_x, offset_x + button_width]
+        self.button_exit_y = [offset_y + button_height + button_gap,
+                                      offset_y + button_height + button_gap + button_height]
+        # undo
+        self.button_undo_x = [offset_x, offset_x + button_width]
+        self.button_undo_y = [offset_y + (button_height + button_gap) * 2,
+                               offset_y + (button_height + button_gap) * 2 + button_height]
+        # redo
+        self.button_redo_x = [offset_x, offset_x + button_width]
+        self.button_redo_y = [offset_y + (button_height + button_gap) * 3,
+                               offset_y + (button_height + button_gap) * 3 + button_height]
+
+    def panel_surface_draw(self):
+        """
+        return the surface of the static part of the right panel: the white area and the exit, undo, redo, refresh game button
+        the buttons are drawn at the ranges of panel_layout
+        """
+        surface = pygame.Surface((self.WINDOW_WIDTH - self.panel_left, self.WINDOW_HEIGHT)).convert()
+        # The panel area is covered with a white rectangle
+        surface.fill(Color().WHITE)
+        button_text_x, button_text_y = self.BUTTON_TEXT
+        for name, left, top in (('New Round', self.new_x[0], self.new_y[0]),
+                                ('EXIT', self.button_exit_x[0], self.button_exit_y[0]),
+                                ('Undo', self.button_undo_x[0], self.button_undo_y[0]),
+                                ('Redo', self.button_redo_x[0], self.button_redo_y[0])):
+            pygame.draw.rect(surface, Color().BLACK,
+                             [left - self.panel_left, top, self.BUTTON_WIDTH, self.BUTTON_HEIGHT])
+            self.button = self.panel_font.render(name, False, Color().WHITE)
+            surface.blit(self.button, [left - self.panel_left + button_text_x, top + button_text_y])
+        return surface
+
+    def panel_text(self, text):
+        """
+        return the rendered surface of a text of the panel
+        """
+        surface = self.panel_texts.get(text)
+        if surface is None:
+            surface = self.panel_font.render(text, False, Color().BLACK)
+            self.panel_texts[text] = surface
+        return surface
 
     def panel_draw(self):
         """
-        This function is used to draw all the button and information of this game
+        This function is used to draw all the information of this game
         the function will read the current_status and show the current current_state in the right up corner
         There are 6 condition:
         'Wait to start'
@@ -345,15 +290,8 @@ class GameGoBang(GoBang):
         'White player wins!'
 
         dispaly the steps count 
-        dispaly the exit, undo, refresh game button
+        the buttons are on the cached panel surface, only the two text areas are drawn again and updated
         """
-        # The panel area is redrawn and covered with a white rectangle
-        pygame.draw.rect(self.screen, Color().WHITE,
-                         [self.PANEL_X[0] + 30, 0,
-                          1000, 1000])
-
-        self.panel_font = pygame.font.SysFont('simhei', 20)
-
         # current_status of game
         current_stat = self.get_current_status()
         if current_stat == 0:
@@ -372,55 +310,36 @@ class GameGoBang(GoBang):
                 current_stat_str = 'White player wins!'
         else:
             current_stat_str = ''
-        self.surface_current_stat = self.panel_font.render(current_stat_str, False, Color().BLACK)
-        self.screen.blit(self.surface_current_stat, [
-                         self.PANEL_X[0] + 50, self.PANEL_Y[0] + 50])
+        self.surface_current_stat = self.panel_text(current_stat_str)
+        self.panel_text_draw(self.surface_current_stat, self.PANEL_Y[0] + 50)
 
         # steps record
         steps = self.get_steps()
-        self.surface_steps = self.panel_font.render(
-            f'Steps: {steps}', False, Color().BLACK)
-        self.screen.blit(self.surface_steps, [
-                         self.PANEL_X[0] + 50, self.PANEL_Y[0] + 150])
+        self.surface_steps = self.panel_text(f'Steps: {steps}')
+        self.panel_text_draw(self.surface_steps, self.PANEL_Y[0] + 150)
 
-        # refresh the game button
-        offset_x = self.PANEL_X[0] + 50
-        offset_y = self.PANEL_Y[0] + 400
-        button_height = 50
-        button_width = 150
-        button_gap = 20
-        button_text_x = 35
-        button_text_y = 15
-        self.new_x = [offset_x, offset_x + button_width]
-        self.new_y = [offset_y, offset_y + button_height]
-        pygame.draw.rect(self.screen, Color().BLACK,
-                         [offset_x, offset_y,
-                          button_width, button_height])
-        self.button = self.panel_font.render(f'New Round', False, Color().WHITE)
-        self.screen.blit(
-            self.button, [offset_x + button_text_x, offset_y + button_text_y])
+        # the thinking line is cleared when the computer does not think, thinking_draw writes it
+        if self.thinking is None:
+            self.panel_text_draw(self.panel_text(''), self.PANEL_Y[0] + 100)
 
-        # exit the game bhutton
-        self.button_exit_x = [offset_x, offset_x + button_width]
-        self.button_exit_y = [offset_y + button_height + button_gap,
-                                      offset_y + button_height + button_gap + button_height]
-        pygame.draw.rect(self.screen, Color().BLACK,
-                         [offset_x, offset_y + button_height + button_gap,
-                          button_width, button_height])
-        self.button = self.panel_font.render(f'EXIT', False, Color().WHITE)
-        self.screen.blit(self.button,
-                         [offset_x + button_text_x, offset_y + button_height + button_gap + button_text_y])
+    def thinking_draw(self):
+        """
+        show how long the computer is thinking, under the state of the game
+        the text changes every frame, so it is not kept in the panel texts
+        """
+        elapsed = time.perf_counter() - self.thinking_since
+        name = self.players[self.get_current_status() - 1].name
+        self.panel_text_draw(self.panel_font.render(f'{name} thinking {elapsed:.1f} s', False, Color().BLACK),
+                             self.PANEL_Y[0] + 100)
 
-        # undo
-        self.button_undo_x = [offset_x, offset_x + button_width]
-        self.button_undo_y = [offset_y + (button_height + button_gap) * 2,
-                               offset_y + (button_height + button_gap) * 2 + button_height]
-        pygame.draw.rect(self.screen, Color().BLACK,
-                         [offset_x, offset_y + (button_height + button_gap) * 2,
-                          button_width, button_height])
-        self.button = self.panel_font.render(f'Undo', False, Color().WHITE)
-        self.screen.blit(self.button,
-                         [offset_x + button_text_x, offset_y + (button_height + button_gap) * 2 + button_text_y])
+    def panel_text_draw(self, surface, top):
+        """
+        cover the text line at top with the cached panel, draw the text and mark the line as changed
+        """
+        area = pygame.Rect(self.PANEL_X[0] + 50, top, self.WINDOW_WIDTH - self.PANEL_X[0] - 50, 30)
+        self.screen.blit(self.panel_surface, area, area.move(-self.panel_left, 0))
+        self.screen.blit(surface, area)
+        self.dirty.append(area)
 
     def done_move(self, pos):
         """
@@ -437,62 +356,144 @@ class GameGoBang(GoBang):
             self.sound_error.play()
             return Errorcode().code_error
 
+        # it is the turn of a computer player, even when it is not searching
+        status = self.get_current_status()
+        if self.thinking is not None or (status in (1, 2) and self.players[status - 1].is_computer):
+            self.sound_error.play()
+            return Errorcode().code_error
+        # 
+        s_x = round((pos[0] - self.width) / self.unit)
+        s_y = round((pos[1] - self.width) / self.unit)
+        return self.spot_move(s_x, s_y)
+
+    def spot_move(self, s_x, s_y):
+        """
+        play the spot (s_x, s_y) for the player to move with its sound, draw it and let the computer play next
+        """
         # Play drop sound effects
         if self.get_current_status() == 1:
             self.sound_black.play()
         else:
             self.sound_white.play()
-        # 
-        s_x = round((pos[0] - self.width) / self.unit)
-        s_y = round((pos[1] - self.width) / self.unit)
-        x = self.width + self.unit * s_x
-        y = self.width + self.unit * s_y
-        
         ret = self.move(s_x, s_y)
         if ret < 0:
             self.sound_error.play()
             return Errorcode().code_error
-        # draw
-        last_move = self.get_last_move()
-        #this if statement will return white and black by it's parameter
-        t_color = Color().BLACK if last_move[0] == 1 else Color().WHITE
-        pygame.draw.circle(self.screen, t_color, [x, y], int(self.unit / 2.5))
-
-        self.panel_draw()
+        # draw, only the rectangle of the new chess is updated
+        self.history_draw()
         if self.get_current_status() >= 3:
             self.sound_win.play()
+        self.computer_turn()
         return Errorcode().code_run
 
+    def set_players(self, players):
+        """
+        players is (black, white), each one a Human or a Computer of Gobang_players
+        the computers get a new worker process, it starts with their first search
+        """
+        self.cancel_thinking()
+        if getattr(self, 'worker', None) is not None:
+            self.worker.close()
+        self.players = players
+        self.worker = None
+        if any(player.is_computer for player in players):
+            self.worker = MoveWorker(self.computer_moved)
+            for slot, player in enumerate(players):
+                if player.is_computer:
+                    self.worker.set_policy(slot, player.policy)
+
+    def computer_turn(self):
+        """
+        start the search of the computer if it is its turn, the move comes back as a COMPUTER_MOVE event
+        """
+        status = self.get_current_status()
+        if self.thinking is not None or status not in (1, 2):
+            return
+        slot = status - 1
+        if self.players[slot].is_computer:
+            self.thinking = self.worker.think(slot, self)
+            self.thinking_since = time.perf_counter()
+            self.panel_draw()
+
+    def computer_moved(self, ticket, move, elapsed):
+        """
+        called from the reader thread of the worker, the move is posted to the main loop
+        """
+        pygame.event.post(pygame.event.Event(COMPUTER_MOVE, ticket=ticket, move=move, elapsed=elapsed))
+
+    def cancel_thinking(self):
+        """
+        stop the search of the computer, the position it searched changed
+        """
+        if self.thinking is not None:
+            self.thinking = None
+            self.worker.cancel()
+            self.panel_draw()
+
     def undo_chess(self):
         """
-        undo function of chessboard, if the programe is still run, we will do the 
-        redraw all function
+        undo function of chessboard, if the programe is still run, we will draw
+        the spot of the chess which was taken back
         """
-        if self.rollback() == Errorcode().code_run:
-            self.__redraw_all()
+        self.cancel_thinking()
+        # against a computer, the moves are taken back until a move of a human is taken back
+        only_computers = all(player.is_computer for player in self.players)
+        changed = False
+        while self.history.undo() == Errorcode().code_run:
+            changed = True
+            if only_computers or not self.players[self.get_current_status() - 1].is_computer:
+                break
+        if changed:
+            self.history_draw()
+        self.computer_turn()
+
+    def redo_chess(self):
+        """
+        redo function of chessboard, play again the last chess which was taken back
+        """
+        self.cancel_thinking()
+        if self.history.redo() == Errorcode().code_run:
+            self.history_draw()
+            if self.get_current_status() >= 3:
+                self.sound_win.play()
+        self.computer_turn()
+
+    def seek_chess(self, number):
+        """
+        go to the position after number steps of the current line of the history
+        """
+        self.cancel_thinking()
+        if self.history.seek(number) == Errorcode().code_run:
+            self.history_draw()
+        self.computer_turn()
 
     def refresh_game(self):
         """
-        start a new game will the refresh game sound, and do the start function
+        start a new game will the refresh game sound, the main loop of start goes on with it
+        the new game keeps the board size, the unit, the rule and the players of this one
         """
-        self.__init__()
+        self.cancel_thinking()
+        self.__init__(self.map_size, self.unit, self.rule.name, self.players)
         self.sound_start.play()
-        self.start()
+        self.start_round()
 
     def button_press(self, pos):
         """
         this function will get the position of the mouse and determine if the mouse in the range of the button
-        we have three button and each button regarding to one function which is refreseh game,exit and undo
+        we have four button and each button regarding to one function which is refreseh game,exit, undo and redo
         """
         # determine if press the button
         if self.new_x[0] < pos[0] < self.new_x[1] and self.new_y[0] < pos[1] < self.new_y[1]:
             self.refresh_game()
-            return code_run
+            return Errorcode().code_run
         elif self.button_exit_x[0] < pos[0] < self.button_exit_x[1] and self.button_exit_y[0] < pos[1] < self.button_exit_y[1]:
             sys.exit()
         elif self.button_undo_x[0] < pos[0] < self.button_undo_x[1] and self.button_undo_y[0] < pos[1] < self.button_undo_y[1]:
             self.undo_chess()
             return Errorcode().code_run
+        elif self.button_redo_x[0] < pos[0] < self.button_redo_x[1] and self.button_redo_y[0] < pos[1] < self.button_redo_y[1]:
+            self.redo_chess()
+            return Errorcode().code_run
         else:
             return Errorcode().code_error
 
@@ -502,26 +503,92 @@ class GameGoBang(GoBang):
         run this fucntion will run the whole programe
         it will draw and dispaly the game
         """
+        self.start_round()
+        # the mouse motion is not used, it would only wake up the loop
+        pygame.event.set_blocked(pygame.MOUSEMOTION)
+        # main loop of the programe
+        try:
+            while True:
+                # sleep until an event comes, then handle all the waiting events before one display update
+                # while the computer thinks the loop wakes up every frame to show the time it took
+                timeout = 1000 // self.FPS if self.thinking is not None else 0
+                events = [pygame.event.wait(timeout)] + pygame.event.get()
+                self.loop_iteration(events)
+                # at most FPS display updates a second
+                self.clock.tick(self.FPS)
+        finally:
+            if self.recorder is not None:
+                self.recorder.close()
+
+    def start_round(self):
+        """
+        start the moves of a round, the computer plays first if it is black
+        """
         self.start_move()
         self.panel_draw()
-        # main loop of the programe
-        while True:
-            # this is all the event in the game
-            for event in pygame.event.get():
-                # Check whether the event is an exit event
-                if event.type == QUIT:
-                    # exit pygame
-                    pygame.quit()
-                    # Exit the system
-                    sys.exit()
+        self.computer_turn()
 
-                if event.type == MOUSEBUTTONUP:
-                    if self.button_press(event.pos) < 0:
-                        # Non-button events handle moves
-                        self.done_move(event.pos)
+    def loop_iteration(self, events):
+        """
+        one iteration of the main loop: handle the events, then update the changed rectangles on the screen
+        """
+        # the events are recorded before they are handled, the Exit button ends the process
+        if self.recorder is not None:
+            self.recorder.record(events)
+        for event in events:
+            self.handle_event(event)
+        if self.thinking is not None:
+            self.thinking_draw()
+        self.display_update()
 
-            # update and display on the screen
-            pygame.display.update()
+    def handle_event(self, event):
+        """
+        handle one pygame event of the main loop
+        """
+        # Check whether the event is an exit event
+        if event.type == pygame.QUIT:
+            # exit pygame
+            pygame.quit()
+            # Exit the system
+            sys.exit()
+
+        if event.type == pygame.MOUSEBUTTONUP:
+            if self.button_press(event.pos) < 0:
+                # Non-button events handle moves
+                self.done_move(event.pos)
+
+        # the arrow keys walk the history, home and end go to the first and the last step of the line
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_LEFT:
+                self.undo_chess()
+            elif event.key == pygame.K_RIGHT:
+                self.redo_chess()
+            elif event.key == pygame.K_HOME:
+                self.seek_chess(0)
+            elif event.key == pygame.K_END:
+                self.seek_chess(self.history.get_steps())
+
+        # the move of a computer, the searches which were cancelled are ignored
+        # without a move (the worker process ended) the first legal spot is played for the computer,
+        # the next search starts a new worker
+        if event.type == COMPUTER_MOVE and event.ticket == self.thinking:
+            self.thinking = None
+            move = event.move if event.move is not None else legal_move(self, None)
+            if move is not None:
+                self.spot_move(move[0], move[1])
+            self.panel_draw()
+
+        # the window was covered or restored, all of it has to be shown again
+        if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            self.dirty = [self.screen.get_rect()]
+
+    def display_update(self):
+        """
+        show the dirty rectangles on the screen, nothing is sent when nothing changed
+        """
+        if self.dirty:
+            pygame.display.update(self.dirty)
+            self.dirty = []
 
 
 class Button:
@@ -537,16 +604,6 @@ class Button:
     def get_y(self):
         return self.pos_y
 
-class Errorcode:
-    def __init__(self) -> None:
-        self.code_pos = -4
-        self.code_wrong_range = -3
-        self.code_status_error = -2
-        self.code_error = -1
-        self.code_run = 0
-        self.code_over = 1
-        self.code_win = 2
-
 class Color:
     def __init__(self):
         self.BLACK = (0, 0, 0)
@@ -593,6 +650,35 @@ class Bgm:
             return "newgame.mp3"
 
 
-if __name__ == '__main__':
-    inst1 = GameGoBang(map_unit=50)
+def main():
+    import argparse
+    from Gobang_players import make_player
+    from Gobang_rules import RULES
+    parser = argparse.ArgumentParser(description='play GoBang in a window')
+    parser.add_argument('--size', type=int, default=16, help='lines of the board')
+    parser.add_argument('--unit', type=int, default=None, help='pixels between two lines, fitted to the board by default')
+    parser.add_argument('--rule', choices=sorted(RULES), default='freestyle')
+    parser.add_argument('--black', default='human', help='human, random, greedy or ai')
+    parser.add_argument('--white', default='human', help='human, random, greedy or ai')
+    parser.add_argument('--time', type=float, default=1.0, help='seconds per move of the ai player')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the background pictures')
+    parser.add_argument('--record', default=None, help='log the mouse and key events to this file, see Gobang_input')
+    args = parser.parse_args()
+    players = (make_player(args.black, args.time), make_player(args.white, args.time))
+    if args.record and any(player.is_computer for player in players):
+        # the moves of a computer come when its search ends, a replay could not put them at the same place
+        parser.error('--record needs two human players')
+    seed = args.seed
+    if seed is None and args.record:
+        seed = random.randrange(1 << 32)
+    if seed is not None:
+        random.seed(seed)
+    inst1 = GameGoBang(args.size, args.unit, args.rule, players)
+    if args.record:
+        from Gobang_input import InputRecorder
+        inst1.recorder = InputRecorder(args.record, inst1, seed)
     inst1.start()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""
+Player slots of the game window: each color is played by a human who clicks or by a computer policy.
+
+A computer policy thinks in a worker process, so the window keeps drawing while it searches.
+MoveWorker sends the position to the process and calls on_result(ticket, move, elapsed) from a reader thread
+when the move comes back, the window turns it into a pygame event. A search which is not needed any more
+(undo, New Round) is cancelled: its ticket is forgotten and the process is ended, a new one starts with the
+next search. The policies stay in the process between the moves, so they keep what they learned,
+and a policy which can ponder thinks on the time of the human.
+It does not import pygame.
+"""
+import multiprocessing
+import signal
+import threading
+import time
+import traceback
+
+from Gobang_core import Errorcode, GoBang
+
+
+class Human:
+    """
+    a player who clicks on the board
+    """
+    is_computer = False
+
+    def __init__(self, name='human'):
+        self.name = name
+
+
+class Computer:
+    """
+    a player which is a move policy, policy(game) returns the (x, y) to move, see Gobang_tournament
+    the policy must be picklable because it is sent to the worker process
+    """
+    is_computer = True
+
+    def __init__(self, policy, name='computer'):
+        self.policy = policy
+        self.name = name
+
+
+def make_player(name, time_budget=1.0):
+    """
+    return a player by name: human, or one of the policies of Gobang_tournament.make_player (random, greedy, ai)
+    time_budget is the seconds of the ai for one move
+    """
+    if name == 'human':
+        return Human()
+    from Gobang_tournament import make_player as make_policy
+    name, policy = make_policy(name, time_budget)
+    return Computer(policy, name)
+
+
+def legal_move(game, move):
+    """
+    return move if it can be played in the game, else the first spot which can be played
+    so a policy which does not know the rule of the game (a renju forbidden move) never blocks it
+    """
+    if move is not None and game.copy().move(move[0], move[1]) >= Errorcode.code_run:
+        return move
+    for x in range(game.map_size):
+        for y in range(game.map_size):
+            if game.board.get(x, y) == 0 and game.copy().move(x, y) >= Errorcode.code_run:
+                return (x, y)
+    return None
+
+
+def worker_main(connection, parent=None):
+    """
+    the loop of the worker process:
+    ('policy', slot, policy) keeps the policy of a slot
+    ('think', ticket, slot, map_size, backend, rule, moves) answers (ticket, move, elapsed),
+    a policy which raises is reported on stderr and the first legal spot is played instead
+    after the answer a policy with a ponder(game, stop) method (AlphaBetaAI) thinks on the position after its move
+    until the next message comes
+    parent is the end of the pipe of the window, it is closed so the worker ends when the window does
+    """
+    # a worker forked from the window has the signal handlers of SDL, which would ignore terminate
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if parent is not None:
+        parent.close()
+    policies = {}
+    while True:
+        try:
+            message = connection.recv()
+        except (EOFError, OSError):
+            return
+        if message[0] == 'policy':
+            policies[message[1]] = message[2]
+            continue
+        _, ticket, slot, map_size, backend, rule, moves = message
+        game = GoBang(map_size, backend, rule)
+        game.load_moves(moves)
+        begin = time.perf_counter()
+        policy = policies[slot]
+        try:
+            move = policy(game)
+            failed = False
+        except Exception:
+            traceback.print_exc()
+            move = None
+            failed = True
+        move = legal_move(game, move)
+        connection.send((ticket, move, time.perf_counter() - begin))
+        if failed or move is None or not hasattr(policy, 'ponder'):
+            continue
+        if game.move(move[0], move[1]) == Errorcode.code_run:
+            try:
+                policy.ponder(game, connection.poll)
+            except Exception:
+                traceback.print_exc()
+
+
+class MoveWorker:
+    """
+    a worker process for the computer players, one search at a time
+    """
+
+    def __init__(self, on_result):
+        """
+        on_result(ticket, move, elapsed) is called from the reader thread for the searches which were not cancelled,
+        move is None when the process ended during the search, the next search starts a new one
+        """
+        self.on_result = on_result
+        self.policies = {}
+        self.process = None
+        self.connection = None
+        self.reader = None
+        self.ticket = 0
+        # the ticket of the running search, None when the worker waits
+        self.busy = None
+        # set by the reader thread when the process ended, is_alive can be late
+        self.ended = False
+
+    def set_policy(self, slot, policy):
+        """
+        give the policy of a slot to the worker, it is sent again when the process starts again
+        """
+        self.policies[slot] = policy
+        if self.process is not None:
+            try:
+                self.connection.send(('policy', slot, policy))
+            except OSError:
+                # the process ended, the next search starts a new one with all the policies
+                pass
+
+    def think(self, slot, game):
+        """
+        start the search of the policy of slot on the position of game, return its ticket
+        """
+        if self.process is None or self.ended or not self.process.is_alive():
+            self.__stop()
+            self.__start()
+        self.ticket += 1
+        self.busy = self.ticket
+        self.connection.send(('think', self.ticket, slot, game.map_size, game.backend, game.rule.name,
+                              [(x, y) for _, x, y in game.get_record_move()]))
+        return self.ticket
+
+    def cancel(self):
+        """
+        forget the running search, its process is ended so the next search does not wait for it
+        """
+        if self.busy is None:
+            return
+        self.busy = None
+        self.__stop()
+
+    def close(self):
+        self.busy = None
+        self.__stop()
+
+    def __start(self):
+        connection, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=worker_main, args=(child, connection),
+                                               name='gobang-move-worker', daemon=True)
+        self.process.start()
+        child.close()
+        self.connection = connection
+        self.ended = False
+        for slot, policy in self.policies.items():
+            connection.send(('policy', slot, policy))
+        self.reader = threading.Thread(target=self.__read, args=(connection,), name='gobang-move-reader',
+                                       daemon=True)
+        self.reader.start()
+
+    def __read(self, connection):
+        while True:
+            try:
+                ticket, move, elapsed = connection.recv()
+            except (EOFError, OSError):
+                # the process ended, a search which was not cancelled gets no move so the window goes on
+                if connection is self.connection:
+                    self.ended = True
+                ticket = self.busy
+                if ticket is not None:
+                    self.busy = None
+                    self.on_result(ticket, None, 0.0)
+                return
+            if ticket != self.busy:
+                continue
+            self.busy = None
+            self.on_result(ticket, move, elapsed)
+
+    def __stop(self):
+        if self.process is None:
+            return
+        self.process.terminate()
+        self.process.join()
+        self.reader.join(1.0)
+        self.connection.close()
+        self.process = None
+        self.connection = None
+        self.reader = None
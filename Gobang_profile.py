@@ -0,0 +1,351 @@
+"""
+Instrumentation of the hot paths of the rules and of the window.
+
+enable() wraps the methods in HOOKS with a timer which counts the calls and keeps a latency histogram,
+disable() puts the original methods back. While the hooks are disabled the classes are not changed at all,
+so they cost nothing.
+
+    import Gobang_profile
+    Gobang_profile.enable()
+    ...
+    print(Gobang_profile.report())
+
+Run this file to profile a scripted game in a headless window (SDL dummy drivers):
+    python Gobang_profile.py --mode hooks      the hook statistics
+    python Gobang_profile.py --mode cprofile   a cProfile session, --out saves it for pstats
+    python Gobang_profile.py --mode sample     a sampling session of the main thread
+"""
+import argparse
+import functools
+import importlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+# the hooks: name -> (module, class, method)
+HOOKS = {
+    'move': ('Gobang_core', 'GoBang', 'move'),
+    'check_win': ('Gobang_core', 'GoBang', 'check_win'),
+    'rollback': ('Gobang_core', 'GoBang', 'rollback'),
+    'done_move': ('Gobang_main', 'GameGoBang', 'done_move'),
+    'panel_draw': ('Gobang_main', 'GameGoBang', 'panel_draw'),
+    'redraw_all': ('Gobang_main', 'GameGoBang', '_GameGoBang__redraw_all'),
+    'loop_iteration': ('Gobang_main', 'GameGoBang', 'loop_iteration'),
+}
+# the histograms have one bucket for each power of 2 nanoseconds
+BUCKETS = 48
+
+
+class Histogram:
+    """
+    call count and latency histogram of one hook, bucket n counts the calls of 2 ** (n - 1) to 2 ** n nanoseconds
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0
+        self.longest = 0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, nanoseconds):
+        self.calls += 1
+        self.total += nanoseconds
+        if nanoseconds > self.longest:
+            self.longest = nanoseconds
+        self.buckets[min(nanoseconds.bit_length(), BUCKETS - 1)] += 1
+
+    def percentile(self, part):
+        """
+        return the upper bound in nanoseconds of the bucket where part (0 to 1) of the calls are reached
+        """
+        if not self.calls:
+            return 0
+        limit = part * self.calls
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= limit:
+                return min(1 << bucket, self.longest)
+        return self.longest
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'total_ms': self.total / 1e6,
+            'mean_us': self.total / self.calls / 1e3 if self.calls else 0.0,
+            'p50_us': self.percentile(0.5) / 1e3,
+            'p90_us': self.percentile(0.9) / 1e3,
+            'p99_us': self.percentile(0.99) / 1e3,
+            'max_us': self.longest / 1e3,
+        }
+
+
+class Instruments:
+    """
+    the set of hooks of the process, see enable, disable and stats
+    """
+
+    def __init__(self):
+        self.histograms = {name: Histogram() for name in HOOKS}
+        # (class, attribute) -> the original method, only while the hooks are enabled
+        self.originals = {}
+        self.dumper = None
+        self.stop = threading.Event()
+
+    def enable(self, names=None):
+        """
+        wrap the methods of the hooks in names, all of them by default
+        """
+        for name in names or HOOKS:
+            module, class_name, attribute = HOOKS[name]
+            cls = getattr(importlib.import_module(module), class_name)
+            if (cls, attribute) in self.originals:
+                continue
+            original = cls.__dict__[attribute]
+            self.originals[(cls, attribute)] = original
+            setattr(cls, attribute, self.__wrap(original, self.histograms[name]))
+
+    @staticmethod
+    def __wrap(method, histogram):
+        clock = time.perf_counter_ns
+        add = histogram.add
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            begin = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                add(clock() - begin)
+        return timed
+
+    def disable(self):
+        """
+        put the original methods back, the statistics are kept
+        """
+        for (cls, attribute), original in self.originals.items():
+            setattr(cls, attribute, original)
+        self.originals = {}
+
+    def is_enabled(self):
+        return bool(self.originals)
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.__init__()
+
+    def stats(self):
+        """
+        return {hook name: {'calls', 'total_ms', 'mean_us', 'p50_us', 'p90_us', 'p99_us', 'max_us'}}
+        for the hooks which were called
+        """
+        return {name: histogram.to_dict() for name, histogram in self.histograms.items() if histogram.calls}
+
+    def dump(self, path):
+        """
+        write the statistics to a JSON file, the file is replaced at once so a reader never sees half of it
+        """
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'time': time.time(), 'stats': self.stats()}, file, indent=1)
+        os.replace(temporary, path)
+
+    def start_dump(self, path, interval=10.0):
+        """
+        dump the statistics to path every interval seconds in a background thread until stop_dump
+        """
+        self.stop_dump()
+        self.stop.clear()
+
+        def run():
+            while not self.stop.wait(interval):
+                self.dump(path)
+            self.dump(path)
+
+        self.dumper = threading.Thread(target=run, name='gobang-stats-dump', daemon=True)
+        self.dumper.start()
+
+    def stop_dump(self):
+        if self.dumper is not None:
+            self.stop.set()
+            self.dumper.join()
+            self.dumper = None
+
+
+# the instruments of the process, the functions below use them
+INSTRUMENTS = Instruments()
+
+
+def enable(names=None):
+    INSTRUMENTS.enable(names)
+
+
+def disable():
+    INSTRUMENTS.disable()
+
+
+def reset():
+    INSTRUMENTS.reset()
+
+
+def stats():
+    return INSTRUMENTS.stats()
+
+
+def start_dump(path, interval=10.0):
+    INSTRUMENTS.start_dump(path, interval)
+
+
+def stop_dump():
+    INSTRUMENTS.stop_dump()
+
+
+def report(values=None):
+    """
+    return the statistics as a text table
+    """
+    values = stats() if values is None else values
+    lines = [f'{"hook":16s} {"calls":>9s} {"total ms":>10s} {"mean us":>9s} {"p50 us":>9s} '
+             f'{"p99 us":>9s} {"max us":>10s}']
+    for name, value in values.items():
+        lines.append(f'{name:16s} {value["calls"]:9d} {value["total_ms"]:10.2f} {value["mean_us"]:9.2f} '
+                     f'{value["p50_us"]:9.2f} {value["p99_us"]:9.2f} {value["max_us"]:10.2f}')
+    return '\n'.join(lines)
+
+
+class Sampler:
+    """
+    a sampling profiler: a thread looks at the stack of the profiled thread every interval seconds
+    and counts the functions it finds on top (self) and anywhere in the stack (total)
+    """
+
+    def __init__(self, interval=0.001, thread_id=None):
+        self.interval = interval
+        self.thread_id = threading.get_ident() if thread_id is None else thread_id
+        self.own = {}
+        self.total = {}
+        self.samples = 0
+        self.stop = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.stop.clear()
+        self.thread = threading.Thread(target=self.__run, name='gobang-sampler', daemon=True)
+        self.thread.start()
+
+    def __run(self):
+        while not self.stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            top = True
+            seen = set()
+            while frame is not None:
+                code = frame.f_code
+                key = f'{os.path.basename(code.co_filename)}:{code.co_firstlineno}({code.co_name})'
+                if top:
+                    self.own[key] = self.own.get(key, 0) + 1
+                    top = False
+                if key not in seen:
+                    seen.add(key)
+                    self.total[key] = self.total.get(key, 0) + 1
+                frame = frame.f_back
+
+    def finish(self):
+        self.stop.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def report(self, limit=20):
+        lines = [f'{self.samples} samples every {self.interval * 1000:.1f} ms',
+                 f'{"self %":>7s} {"total %":>7s}  function']
+        for key, count in sorted(self.own.items(), key=lambda item: -item[1])[:limit]:
+            lines.append(f'{count / max(1, self.samples) * 100:7.1f} '
+                         f'{self.total.get(key, 0) / max(1, self.samples) * 100:7.1f}  {key}')
+        return '\n'.join(lines)
+
+
+def scripted_game(window, rounds=20, undo_every=7, seed=0):
+    """
+    play rounds games in the window with clicks on random spots and an undo click every undo_every moves,
+    every click goes through the main loop iteration like a real one
+    return the number of clicks
+    """
+    from Gobang_main import pygame
+    rng = random.Random(seed)
+    undo = ((window.button_undo_x[0] + window.button_undo_x[1]) // 2,
+            (window.button_undo_y[0] + window.button_undo_y[1]) // 2)
+    clicks = 0
+    for _ in range(rounds):
+        window.clear()
+        # the spots of the last round are drawn again with the first click, see GameGoBang.history_draw
+        window.start_move()
+        spots = [(x, y) for x in range(window.map_size) for y in range(window.map_size)]
+        rng.shuffle(spots)
+        for step, (x, y) in enumerate(spots):
+            pos = (window.width + x * window.unit, window.width + y * window.unit)
+            events = [pygame.event.Event(pygame.MOUSEBUTTONUP, pos=pos, button=1)]
+            if undo_every and step % undo_every == undo_every - 1:
+                events.append(pygame.event.Event(pygame.MOUSEBUTTONUP, pos=undo, button=1))
+                events.append(pygame.event.Event(pygame.MOUSEBUTTONUP, pos=pos, button=1))
+            window.loop_iteration(events)
+            clicks += len(events)
+            if window.get_current_status() >= 3:
+                break
+    return clicks
+
+
+def headless_window(seed=0, map_size=16, map_unit=50, rule='freestyle'):
+    """
+    return a GameGoBang window on the SDL dummy drivers, the background is chosen with the seed
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+    from Gobang_main import GameGoBang
+    random.seed(seed)
+    return GameGoBang(map_size, map_unit, rule)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='profile a scripted GoBang game in a headless window')
+    parser.add_argument('--mode', choices=('hooks', 'cprofile', 'sample'), default='hooks')
+    parser.add_argument('--rounds', type=int, default=20, help='games of the script')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None, help='the cProfile data file, or the JSON file of the hook statistics')
+    parser.add_argument('--interval', type=float, default=1.0, help='milliseconds between two samples')
+    args = parser.parse_args()
+
+    window = headless_window(args.seed)
+    begin = time.perf_counter()
+    if args.mode == 'hooks':
+        enable()
+        clicks = scripted_game(window, args.rounds, seed=args.seed)
+        disable()
+        print(report())
+        if args.out:
+            INSTRUMENTS.dump(args.out)
+    elif args.mode == 'cprofile':
+        import cProfile
+        import pstats
+        profile = cProfile.Profile()
+        clicks = profile.runcall(scripted_game, window, args.rounds, seed=args.seed)
+        if args.out:
+            profile.dump_stats(args.out)
+        pstats.Stats(profile).sort_stats('tottime').print_stats(20)
+    else:
+        sampler = Sampler(args.interval / 1000)
+        sampler.start()
+        clicks = scripted_game(window, args.rounds, seed=args.seed)
+        sampler.finish()
+        print(sampler.report())
+    elapsed = time.perf_counter() - begin
+    print(f'{clicks} clicks in {elapsed:.2f} s, {clicks / elapsed:.0f} clicks/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""
+Compact binary file format for GoBang game records.
+
+A file starts with the 4 bytes MAGIC, then the games one after another. Each game is
+    length    2 bytes, little endian, the number of bytes after it
+    map_size  1 byte
+    winner    1 byte, 0 none, 1 black, 2 white
+    flags     1 byte, WIDE_MOVES is set when each move takes 2 bytes, RULE_BYTE when the rule byte follows
+    rule      1 byte, only with RULE_BYTE: the code of the rule in RULE_CODES, the games without it are freestyle
+    moves     one byte x * 16 + y for each move on boards up to 16, two bytes x, y on bigger boards
+The color of a move follows from its order, black moves first.
+"""
+import mmap
+import os
+import struct
+from array import array
+
+from Gobang_core import GoBang
+
+MAGIC = b'GBR1'
+RECORD_SUFFIX = '.gbr'
+# the length prefix and the header of a game
+LENGTH = struct.Struct('<H')
+HEADER = struct.Struct('<BBB')
+WIDE_MOVES = 1
+RULE_BYTE = 2
+# the rules as they are saved
+RULE_CODES = {'freestyle': 0, 'exact': 1, 'renju': 2, 'caro': 3}
+RULE_NAMES = {code: name for name, code in RULE_CODES.items()}
+# the index file of RecordIndex: magic, then the size and the modification time in nanoseconds of the record file
+INDEX_MAGIC = b'GBX2'
+INDEX_HEADER = struct.Struct('<QQ')
+# the winner as it is saved: 0 none, 1 black, 2 white
+WINNER_CODES = {0: 0, 1: 1, -1: 2}
+WINNERS = {0: 0, 1: 1, 2: -1}
+
+
+class GameRecord:
+    def __init__(self, moves, winner=0, map_size=16, rule='freestyle'):
+        """
+        moves: the list of (x, y), black first
+        winner: 1 black, -1 white, 0 none
+        rule: the name of the rule of the game, one of RULE_CODES
+        """
+        self.moves = moves
+        self.winner = winner
+        self.map_size = map_size
+        self.rule = rule
+
+    @classmethod
+    def from_game(cls, game):
+        """
+        return the record of a GoBang game
+        """
+        return cls([(x, y) for _, x, y in game.get_record_move()], game.get_winner(), game.map_size, game.rule.name)
+
+    def get_record_move(self):
+        """
+        return the moves in the format of GoBang.record_move, a list of (chess piece type, x, y)
+        """
+        return [(1 if index % 2 == 0 else -1, x, y) for index, (x, y) in enumerate(self.moves)]
+
+    def to_game(self, backend='list', game=None):
+        """
+        return a GoBang game at the end of the record, built without checking the moves
+        an existing game can be passed to reuse its board
+        """
+        if game is None:
+            game = GoBang(self.map_size, backend, self.rule)
+        game.load_moves(self.moves, self.winner)
+        return game
+
+    def __eq__(self, other):
+        return (isinstance(other, GameRecord) and self.moves == other.moves
+                and self.winner == other.winner and self.map_size == other.map_size and self.rule == other.rule)
+
+    def __repr__(self):
+        return (f'GameRecord(steps={len(self.moves)}, winner={self.winner}, map_size={self.map_size}, '
+                f'rule={self.rule})')
+
+
+def encode(record):
+    """
+    return the bytes of one game, the length prefix included
+    """
+    if record.map_size <= 16:
+        flags = 0
+        moves = bytes(x * 16 + y for x, y in record.moves)
+    else:
+        flags = WIDE_MOVES
+        moves = bytes(value for x, y in record.moves for value in (x, y))
+    rule = b''
+    if record.rule != 'freestyle':
+        flags |= RULE_BYTE
+        rule = bytes((RULE_CODES[record.rule],))
+    body = HEADER.pack(record.map_size, WINNER_CODES[record.winner], flags) + rule + moves
+    return LENGTH.pack(len(body)) + body
+
+
+def decode(body):
+    """
+    return the GameRecord of the bytes of one game, the length prefix excluded
+    """
+    map_size, winner, flags = HEADER.unpack_from(body, 0)
+    rule = 'freestyle'
+    start = HEADER.size
+    if flags & RULE_BYTE:
+        rule = RULE_NAMES[body[start]]
+        start += 1
+    data = body[start:]
+    if flags & WIDE_MOVES:
+        moves = [(data[index], data[index + 1]) for index in range(0, len(data), 2)]
+    else:
+        moves = [(value >> 4, value & 15) for value in data]
+    return GameRecord(moves, WINNERS[winner], map_size, rule)
+
+
+class RecordWriter:
+    """
+    write games to a record file one by one, use it with the with statement
+    """
+
+    def __init__(self, path, append=False):
+        exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, 'ab' if exists else 'wb')
+        if not exists:
+            self.file.write(MAGIC)
+        self.count = 0
+
+    def write(self, game):
+        """
+        write a GoBang game or a GameRecord
+        """
+        record = game if isinstance(game, GameRecord) else GameRecord.from_game(game)
+        self.file.write(encode(record))
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_records(path, buffer_size=1 << 16):
+    """
+    yield the GameRecord of each game of a record file, the file is read in blocks of buffer_size
+    so the memory does not depend on the size of the file
+    """
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not a GoBang record file')
+        buffer = b''
+        while True:
+            block = file.read(buffer_size)
+            buffer += block
+            start = 0
+            while len(buffer) - start >= LENGTH.size:
+                (length,) = LENGTH.unpack_from(buffer, start)
+                end = start + LENGTH.size + length
+                if end > len(buffer):
+                    break
+                yield decode(buffer[start + LENGTH.size:end])
+                start = end
+            buffer = buffer[start:]
+            if not block:
+                if buffer:
+                    raise ValueError(f'{path} ends in the middle of a game')
+                return
+
+
+def write_records(path, games):
+    """
+    write all the games (GoBang objects or GameRecord) to a new record file, return the number of games
+    """
+    with RecordWriter(path) as writer:
+        for game in games:
+            writer.write(game)
+        return writer.count
+
+
+class RecordIndex:
+    """
+    random access to the games of a record file by game number
+    the file is memory mapped and the offset of each game is kept in an array,
+    the offsets are saved next to the file (path + '.idx') and reused while the size and the modification time
+    of the file do not change
+    """
+
+    def __init__(self, path, save=True):
+        self.path = path
+        self.file = open(path, 'rb')
+        status = os.fstat(self.file.fileno())
+        size = status.st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f'{path} is not a GoBang record file')
+        stamp = (size, status.st_mtime_ns)
+        self.offsets = self.__load_offsets(stamp) if save else None
+        if self.offsets is None:
+            self.offsets = self.__scan()
+            if save:
+                self.__save_offsets(stamp)
+
+    def __scan(self):
+        """
+        jump from one length prefix to the next and return the offsets of the games
+        """
+        offsets = array('Q')
+        position = len(MAGIC)
+        size = len(self.map)
+        while position + LENGTH.size <= size:
+            offsets.append(position)
+            (length,) = LENGTH.unpack_from(self.map, position)
+            position += LENGTH.size + length
+        if position != size:
+            raise ValueError(f'{self.path} ends in the middle of a game')
+        return offsets
+
+    def __index_path(self):
+        return self.path + '.idx'
+
+    def __load_offsets(self, stamp):
+        """
+        return the saved offsets if they belong to the file as it is now, else None
+        the index file starts with INDEX_MAGIC and the (size, modification time) stamp of the record file
+        """
+        try:
+            with open(self.__index_path(), 'rb') as file:
+                data = file.read()
+        except OSError:
+            return None
+        start = len(INDEX_MAGIC) + INDEX_HEADER.size
+        if len(data) < start or data[:len(INDEX_MAGIC)] != INDEX_MAGIC \
+                or INDEX_HEADER.unpack_from(data, len(INDEX_MAGIC)) != stamp:
+            return None
+        offsets = array('Q')
+        offsets.frombytes(data[start:])
+        return offsets
+
+    def __save_offsets(self, stamp):
+        try:
+            with open(self.__index_path(), 'wb') as file:
+                file.write(INDEX_MAGIC + INDEX_HEADER.pack(*stamp))
+                file.write(self.offsets.tobytes())
+        except OSError:
+            pass
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, number):
+        """
+        return the GameRecord of game number, negative numbers count from the end
+        """
+        offset = self.offsets[number]
+        (length,) = LENGTH.unpack_from(self.map, offset)
+        start = offset + LENGTH.size
+        return decode(self.map[start:start + length])
+
+    def __iter__(self):
+        for number in range(len(self)):
+            yield self[number]
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
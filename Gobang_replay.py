@@ -0,0 +1,174 @@
+"""
+Batch replay and validation of archived game records.
+Every move of every record goes through GoBang.move with the rule of the record, so illegal moves are found
+and the winner is computed again. A chunk of records is replayed on one GoBang object for each board size
+and rule, GoBang.clear takes the chess of a game away before the next one.
+python benchmark.py replay compares it with a new GoBang per game on each backend.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from Gobang_core import Errorcode, GoBang
+from Gobang_record import read_records
+
+
+class ReplayStats:
+    def __init__(self, number, steps, winner, recorded_winner, error_step=None, error_code=Errorcode.code_run):
+        """
+        number: the number of the game in the stream
+        steps: the number of moves which were played
+        winner: the winner computed by the replay, 1 black, -1 white, 0 none
+        recorded_winner: the winner saved in the record
+        error_step: the index of the first illegal move, None if all the moves are legal
+        error_code: the Errorcode returned by GoBang.move for the illegal move
+        """
+        self.number = number
+        self.steps = steps
+        self.winner = winner
+        self.recorded_winner = recorded_winner
+        self.error_step = error_step
+        self.error_code = error_code
+
+    def is_valid(self):
+        """
+        True if every move is legal and the saved winner is right
+        """
+        return self.error_step is None and self.winner == self.recorded_winner
+
+    def __repr__(self):
+        return (f'ReplayStats(number={self.number}, steps={self.steps}, winner={self.winner}, '
+                f'recorded_winner={self.recorded_winner}, error_step={self.error_step})')
+
+
+def replay_game(number, record, backend='bitboard', game=None):
+    """
+    replay one GameRecord and return its ReplayStats
+    game is a GoBang of the board size and the rule of the record to reuse, it is cleared first,
+    None builds a new one
+    a move after the end of the game is illegal as well (GoBang.move returns code_status_error)
+    """
+    if game is None:
+        game = GoBang(record.map_size, backend, record.rule)
+    else:
+        game.clear()
+    game.start_move()
+    move = game.move
+    run = Errorcode.code_run
+    for step, (x, y) in enumerate(record.moves):
+        code = move(x, y)
+        if code < run:
+            return ReplayStats(number, step, game.get_winner(), record.winner, step, code)
+    return ReplayStats(number, len(record.moves), game.get_winner(), record.winner)
+
+
+def replay_chunk(chunk, backend='bitboard'):
+    """
+    replay a list of (number, GameRecord), return the list of ReplayStats
+    the games of the same board size and rule are replayed on one GoBang object
+    """
+    games = {}
+    results = []
+    for number, record in chunk:
+        key = (record.map_size, record.rule)
+        game = games.get(key)
+        if game is None:
+            game = games[key] = GoBang(record.map_size, backend, record.rule)
+        results.append(replay_game(number, record, backend, game))
+    return results
+
+
+def chunks(records, chunk_size):
+    """
+    group the records into lists of (number, GameRecord) of chunk_size
+    """
+    chunk = []
+    for number, record in enumerate(records):
+        chunk.append((number, record))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def replay_records(records, chunk_size=1000, workers=None, backend='bitboard'):
+    """
+    replay a stream of GameRecord and yield a ReplayStats for each of them, in the order of the stream
+    the records are read one chunk at a time, workers > 1 replays the chunks on a process pool
+    """
+    if workers is None or workers <= 1:
+        for chunk in chunks(records, chunk_size):
+            for stats in replay_chunk(chunk, backend=backend):
+                yield stats
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for chunk in chunks(records, chunk_size):
+            pending.append(pool.submit(replay_chunk, chunk, backend=backend))
+            # keep a few chunks per worker in flight so the memory stays flat
+            if len(pending) >= workers * 2:
+                for stats in pending.pop(0).result():
+                    yield stats
+        for future in pending:
+            for stats in future.result():
+                yield stats
+
+
+def replay_file(path, chunk_size=1000, workers=None, backend='bitboard'):
+    """
+    replay all the games of a record file, see replay_records
+    """
+    return replay_records(read_records(path), chunk_size, workers, backend)
+
+
+class ReplaySummary:
+    """
+    totals of a replay: games, moves, invalid games and the wins of each color
+    """
+
+    def __init__(self):
+        self.games = 0
+        self.moves = 0
+        self.invalid = []
+        self.wins = {1: 0, -1: 0, 0: 0}
+        self.longest = 0
+
+    def add(self, stats):
+        self.games += 1
+        self.moves += stats.steps
+        self.wins[stats.winner] += 1
+        self.longest = max(self.longest, stats.steps)
+        if not stats.is_valid():
+            self.invalid.append(stats)
+
+    def __repr__(self):
+        average = self.moves / self.games if self.games else 0.0
+        return (f'{self.games} games, {self.moves} moves, {len(self.invalid)} invalid, '
+                f'black wins {self.wins[1]}, white wins {self.wins[-1]}, no winner {self.wins[0]}, '
+                f'average length {average:.1f}, longest {self.longest}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='replay and validate GoBang record files')
+    parser.add_argument('paths', nargs='+', help='record files (.gbr)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes, all cores by default')
+    parser.add_argument('--chunk', type=int, default=1000, help='games per chunk')
+    parser.add_argument('--backend', default='bitboard', choices=sorted(GoBang.BACKENDS))
+    args = parser.parse_args()
+
+    for path in args.paths:
+        summary = ReplaySummary()
+        begin = time.perf_counter()
+        for stats in replay_file(path, args.chunk, args.workers, args.backend):
+            summary.add(stats)
+        elapsed = time.perf_counter() - begin
+        print(f'{path}: {summary}')
+        print(f'  {elapsed:.2f} s, {summary.moves / elapsed:.0f} moves/s')
+        for stats in summary.invalid[:10]:
+            print(f'  invalid: {stats}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""
+Rule variants of GoBang.
+
+A rule tells if a move wins and if a move is forbidden:
+    freestyle  5 or more links win (the original rule)
+    exact      exactly 5 links win, 6 or more (an overline) do not
+    renju      black wins with exactly 5 links and may not play an overline, a double four or a double three,
+               white wins with 5 or more links
+    caro       exactly 5 links win, but not when both ends of the 5 links are blocked by the other color
+
+The checks only look at the four lines through the move, 5 spots to each side. The spots of these lines
+come from a table which is built once for each board size (line_table), and the result of each line
+pattern is computed once and kept (line_pattern), so a check costs the same on every board size.
+The double three of renju is found on each line without looking if the move which makes the three
+a straight four would be forbidden itself, like most GoBang programs do.
+"""
+
+# the four lines through a spot: vertical, horizontal, right oblique, left oblique
+# in the order of the steps of BitBoard.shifts
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+# spots of a line on each side of the move
+REACH = 5
+CENTER = REACH
+# the values of the spots of a line, seen by the color of the move
+EMPTY, OWN, OTHER, WALL = 0, 1, 2, 3
+
+
+def line_table(map_size):
+    """
+    return the line table of a board size: table[x * map_size + y] is a tuple of 4 lines (DIRECTIONS),
+    each one the 11 spots (x, y) from -REACH to REACH along the direction, None for the spots off the board
+    """
+    table = LINE_TABLES.get(map_size)
+    if table is None:
+        table = []
+        for x in range(map_size):
+            for y in range(map_size):
+                lines = []
+                for dx, dy in DIRECTIONS:
+                    line = []
+                    for step in range(-REACH, REACH + 1):
+                        nx, ny = x + dx * step, y + dy * step
+                        line.append((nx, ny) if 0 <= nx < map_size and 0 <= ny < map_size else None)
+                    lines.append(tuple(line))
+                table.append(tuple(lines))
+        LINE_TABLES[map_size] = table
+    return table
+
+
+# the line tables of each board size, built by line_table the first time the size is used
+LINE_TABLES = {}
+
+
+def run_length(values):
+    """
+    return (left, right): the own chess connected to the center on each side
+    """
+    left = 0
+    while left < REACH and values[CENTER - left - 1] == OWN:
+        left += 1
+    right = 0
+    while right < REACH and values[CENTER + right + 1] == OWN:
+        right += 1
+    return left, right
+
+
+def five_spots(values):
+    """
+    return the empty spots of the line which would make exactly 5 links with the center
+    """
+    spots = []
+    for spot in range(CENTER - 4, CENTER + 5):
+        if values[spot] != EMPTY:
+            continue
+        values[spot] = OWN
+        left, right = run_length(values)
+        values[spot] = EMPTY
+        if left + right + 1 == 5:
+            spots.append(spot)
+    return spots
+
+
+def count_fours(spots):
+    """
+    return the number of fours of the five spots of one line, the two spots of a straight four are one four
+    """
+    if len(spots) == 2 and spots[1] - spots[0] == 5:
+        return 1
+    return len(spots)
+
+
+def has_open_three(values):
+    """
+    True if one more chess on the line can make a straight four with the center: 4 links with both ends
+    which make exactly 5 links
+    """
+    for spot in range(CENTER - 4, CENTER + 5):
+        if values[spot] != EMPTY:
+            continue
+        values[spot] = OWN
+        spots = five_spots(values)
+        values[spot] = EMPTY
+        if len(spots) == 2 and spots[1] - spots[0] == 5:
+            return True
+    return False
+
+
+class LinePattern:
+    """
+    what one line means for the color of the chess on its center
+    """
+    __slots__ = ('five', 'exact_five', 'overline', 'blocked_five', 'fours', 'open_three')
+
+    def __init__(self, values):
+        left, right = run_length(values)
+        links = left + right + 1
+        self.five = links >= 5
+        self.exact_five = links == 5
+        self.overline = links >= 6
+        # both ends of exactly 5 links are the other color
+        self.blocked_five = (self.exact_five and values[CENTER - left - 1] == OTHER
+                             and values[CENTER + right + 1] == OTHER)
+        self.fours = 0
+        self.open_three = False
+        if not self.five:
+            self.fours = count_fours(five_spots(values))
+            if not self.fours:
+                self.open_three = has_open_three(values)
+
+
+def line_pattern(code):
+    """
+    return the LinePattern of a line code (see Rule.line_codes), it is computed once for each code
+    """
+    pattern = LINE_PATTERNS.get(code)
+    if pattern is None:
+        values = []
+        value = code
+        for _ in range(REACH * 2 + 1):
+            values.append(value & 3)
+            value >>= 2
+        values.reverse()
+        pattern = LinePattern(values)
+        LINE_PATTERNS[code] = pattern
+    return pattern
+
+
+# LinePattern of each line code which was seen
+LINE_PATTERNS = {}
+
+
+class Rule:
+    """
+    the base of the rules, a rule object belongs to one board size
+    """
+    name = ''
+    # True if some moves can be forbidden, move only calls is_forbidden for these rules
+    has_forbidden = False
+
+    def __init__(self, map_size=16):
+        self.map_size = map_size
+        self.lines = line_table(map_size)
+
+    def line_codes(self, board, x, y, piece):
+        """
+        return the codes of the four lines through (x, y), 2 bits for each spot (EMPTY, OWN, OTHER, WALL)
+        seen by piece, the first spot of the line in the highest bits
+        the center always counts as a chess of piece, so it can be asked before the move
+        the board reads the spots, ListBoard from its lists and BitBoard from its bits
+        """
+        return board.line_codes(x, y, piece, self.lines[x * self.map_size + y])
+
+    def patterns(self, board, x, y, piece):
+        return [line_pattern(code) for code in self.line_codes(board, x, y, piece)]
+
+    def is_win(self, board, x, y, piece):
+        """
+        True if the chess piece on (x, y) wins
+        """
+        raise NotImplementedError
+
+    def is_forbidden(self, board, x, y, piece):
+        """
+        True if piece may not be played on the empty spot (x, y)
+        """
+        return False
+
+
+class FreeStyle(Rule):
+    name = 'freestyle'
+
+    def is_win(self, board, x, y, piece):
+        return board.has_five(x, y)
+
+
+class ExactFive(Rule):
+    name = 'exact'
+
+    def is_win(self, board, x, y, piece):
+        return any(pattern.exact_five for pattern in self.patterns(board, x, y, piece))
+
+
+class Caro(Rule):
+    name = 'caro'
+
+    def is_win(self, board, x, y, piece):
+        return any(pattern.exact_five and not pattern.blocked_five for pattern in self.patterns(board, x, y, piece))
+
+
+class Renju(Rule):
+    name = 'renju'
+    has_forbidden = True
+
+    def is_win(self, board, x, y, piece):
+        if piece == 1:
+            return any(pattern.exact_five for pattern in self.patterns(board, x, y, piece))
+        return board.has_five(x, y)
+
+    def is_forbidden(self, board, x, y, piece):
+        """
+        black may not play an overline, two fours or two open threes, unless the move makes exactly 5 links
+        """
+        if piece != 1:
+            return False
+        patterns = self.patterns(board, x, y, piece)
+        if any(pattern.exact_five for pattern in patterns):
+            return False
+        if any(pattern.overline for pattern in patterns):
+            return True
+        if sum(pattern.fours for pattern in patterns) >= 2:
+            return True
+        return sum(1 for pattern in patterns if pattern.open_three) >= 2
+
+
+# the rules which can be picked by name
+RULES = {rule.name: rule for rule in (FreeStyle, ExactFive, Renju, Caro)}
+# rule objects of each (name, board size), they have no state so the games share them
+RULE_OBJECTS = {}
+
+
+def get_rule(name, map_size):
+    """
+    return the rule object of a rule name and a board size
+    """
+    rule = RULE_OBJECTS.get((name, map_size))
+    if rule is None:
+        if name not in RULES:
+            raise ValueError(f'unknown rule {name}, the rules are {", ".join(RULES)}')
+        rule = RULES[name](map_size)
+        RULE_OBJECTS[(name, map_size)] = rule
+    return rule
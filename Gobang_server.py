@@ -0,0 +1,502 @@
+"""
+Network game server: many GoBang games in one process, played over TCP with one JSON object per line.
+
+A client sends requests with an "op" and an optional "id", the reply has the same "id":
+    {"op": "new", "size": 16}                          -> {"ok": true, "game": 1, "seat": "black"}
+    {"op": "join", "game": 1}                          -> {"ok": true, "game": 1, "moves": [[x, y], ...], "status": 1,
+                                                           "seat": "white"}
+    {"op": "leave", "game": 1}                         -> {"ok": true}
+    {"op": "move", "game": 1, "x": 7, "y": 7}          -> {"ok": true, "code": 0, "status": 2, "winner": 0, "steps": 1}
+    {"op": "undo", "game": 1}                          -> {"ok": true, "code": 0, "status": 1, "winner": 0, "steps": 0}
+    {"op": "state", "game": 1}                         -> the same as join, without joining
+    {"op": "stats"}                                    -> the counters of the server
+A game has two seats, black and white. The client which makes a game sits on "seat" (black by default),
+a client which joins takes the free seat, or only watches when both are taken or with "watch": true.
+A client plays only the moves of its seat in its turn, and undoes only the last move when it is its own.
+A seat is free again when its client leaves the game or goes away.
+The moves are checked by GoBang.move, the clients which joined a game get an event line for each change:
+    {"event": "move", "game": 1, "piece": 1, "x": 7, "y": 7, "status": 2, "winner": 0}
+    {"event": "undo", "game": 1, "x": 7, "y": 7, "status": 1}
+
+The games use the bitboard backend, a few Python ints per game. A game which nobody used for idle_timeout
+seconds is evicted: a finished game is removed (and written to the archive record file if there is one),
+an unfinished game is packed into its binary record of Gobang_record and built again at the next request.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import time
+
+from Gobang_core import Errorcode, GoBang
+from Gobang_record import LENGTH, GameRecord, RecordWriter, decode, encode
+
+# a client whose unsent data grows over this is too slow and is disconnected
+WRITE_LIMIT = 1 << 20
+# the seats of a game: name -> chess piece type
+SEATS = {'black': 1, 'white': -1}
+SEAT_NAMES = {piece: name for name, piece in SEATS.items()}
+
+
+class GameRoom:
+    """
+    one game of the server, the clients which joined it, the client on each seat and the time it was used
+    game is None while the game is packed
+    """
+    __slots__ = ('game', 'packed', 'clients', 'seats', 'last_used')
+
+    def __init__(self, game):
+        self.game = game
+        self.packed = None
+        self.clients = set()
+        # chess piece type -> the client which plays it, None while the seat is free
+        self.seats = {1: None, -1: None}
+        self.last_used = time.monotonic()
+
+    def sit(self, client, piece=None):
+        """
+        put the client on the seat of piece, or on the first free seat when piece is None
+        return the piece of its seat, None if the seat is taken
+        """
+        for seat in (piece,) if piece is not None else (1, -1):
+            if self.seats[seat] is None or self.seats[seat] is client:
+                self.seats[seat] = client
+                return seat
+        return None
+
+    def stand(self, client):
+        """
+        free the seats of the client
+        """
+        for seat, holder in self.seats.items():
+            if holder is client:
+                self.seats[seat] = None
+
+
+class ServerStats:
+    """
+    the counters of a GameServer
+    """
+
+    def __init__(self):
+        self.games = 0
+        self.moves = 0
+        self.requests = 0
+        self.errors = 0
+        self.packed = 0
+        self.unpacked = 0
+        self.removed = 0
+        self.clients = 0
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+class GameServer:
+
+    def __init__(self, host='127.0.0.1', port=8765, idle_timeout=300.0, sweep_every=10.0,
+                 backend='bitboard', archive=None):
+        """
+        idle_timeout: seconds without a request before a game is evicted
+        sweep_every: seconds between two searches for idle games
+        archive: the path of a record file (.gbr) for the finished games which are evicted, None to forget them
+        """
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.sweep_every = sweep_every
+        self.backend = backend
+        self.archive = RecordWriter(archive, append=True) if archive else None
+        self.rooms = {}
+        self.next_game = 1
+        self.stats = ServerStats()
+        self.server = None
+        self.sweeper = None
+        self.handlers = {
+            'new': self.__new,
+            'join': self.__join,
+            'leave': self.__leave,
+            'move': self.__move,
+            'undo': self.__undo,
+            'state': self.__state,
+            'stats': self.__stats,
+        }
+
+    async def start(self):
+        """
+        listen on host and port and start the sweep of the idle games
+        """
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.sweeper = asyncio.get_running_loop().create_task(self.sweep())
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        if self.sweeper is not None:
+            self.sweeper.cancel()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.archive is not None:
+            self.archive.close()
+
+    async def handle_client(self, reader, writer):
+        """
+        read the request lines of one client until it goes away, and write a reply line for each of them
+        """
+        self.stats.clients += 1
+        joined = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = self.handle_line(line, writer, joined)
+                writer.write(reply)
+                if writer.transport.get_write_buffer_size() > WRITE_LIMIT:
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # ValueError: a line longer than the limit of the stream
+            pass
+        finally:
+            self.stats.clients -= 1
+            for game_id in joined:
+                room = self.rooms.get(game_id)
+                if room is not None:
+                    room.clients.discard(writer)
+                    room.stand(writer)
+            writer.close()
+
+    def handle_line(self, line, writer, joined):
+        """
+        return the reply line of one request line
+        """
+        self.stats.requests += 1
+        message = None
+        try:
+            message = json.loads(line)
+            handler = self.handlers.get(message.get('op'))
+            if handler is None:
+                reply = {'ok': False, 'error': f'unknown op {message.get("op")}'}
+            else:
+                reply = handler(message, writer, joined)
+        except (ValueError, TypeError, AttributeError, KeyError) as error:
+            reply = {'ok': False, 'error': f'bad request: {error}'}
+        if not reply['ok']:
+            self.stats.errors += 1
+        if isinstance(message, dict) and 'id' in message:
+            reply['id'] = message['id']
+        return (json.dumps(reply, separators=(',', ':')) + '\n').encode()
+
+    def room(self, game_id):
+        """
+        return the GameRoom of the game id with its game built again if it was packed, None if there is no such game
+        """
+        room = self.rooms.get(game_id)
+        if room is None:
+            return None
+        room.last_used = time.monotonic()
+        if room.game is None:
+            record = decode(room.packed[LENGTH.size:])
+            room.game = record.to_game(self.backend)
+            room.packed = None
+            self.stats.unpacked += 1
+        return room
+
+    def broadcast(self, room, event, sender):
+        """
+        send an event line to the clients of the room, except the sender which gets the reply
+        """
+        line = (json.dumps(event, separators=(',', ':')) + '\n').encode()
+        for client in list(room.clients):
+            if client is sender:
+                continue
+            if client.is_closing() or client.transport.get_write_buffer_size() > WRITE_LIMIT:
+                room.clients.discard(client)
+                client.close()
+                continue
+            client.write(line)
+
+    def __new(self, message, writer, joined):
+        size = int(message.get('size', 16))
+        if not 5 <= size <= 64:
+            return {'ok': False, 'error': 'size must be between 5 and 64'}
+        seat = message.get('seat', 'black')
+        if seat not in SEATS:
+            return {'ok': False, 'error': 'seat must be black or white'}
+        game = GoBang(size, self.backend)
+        game.start_move()
+        game_id = self.next_game
+        self.next_game += 1
+        room = GameRoom(game)
+        room.clients.add(writer)
+        room.sit(writer, SEATS[seat])
+        self.rooms[game_id] = room
+        joined.add(game_id)
+        self.stats.games += 1
+        return {'ok': True, 'game': game_id, 'seat': seat}
+
+    def __join(self, message, writer, joined):
+        reply = self.__state(message, writer, joined)
+        if reply['ok']:
+            room = self.rooms[message['game']]
+            room.clients.add(writer)
+            joined.add(message['game'])
+            seat = None if message.get('watch') else room.sit(writer)
+            reply['seat'] = SEAT_NAMES.get(seat)
+        return reply
+
+    def __leave(self, message, writer, joined):
+        room = self.rooms.get(message['game'])
+        if room is not None:
+            room.clients.discard(writer)
+            room.stand(writer)
+        joined.discard(message['game'])
+        return {'ok': True}
+
+    def __state(self, message, writer, joined):
+        room = self.room(message['game'])
+        if room is None:
+            return {'ok': False, 'error': 'no such game'}
+        game = room.game
+        return {'ok': True, 'game': message['game'], 'size': game.map_size,
+                'moves': [[x, y] for _, x, y in game.get_record_move()],
+                'status': game.get_current_status(), 'winner': game.get_winner()}
+
+    def __move(self, message, writer, joined):
+        room = self.room(message['game'])
+        if room is None:
+            return {'ok': False, 'error': 'no such game'}
+        game = room.game
+        x, y = int(message['x']), int(message['y'])
+        status = game.get_current_status()
+        if status in (1, 2) and room.seats[1 if status == 1 else -1] is not writer:
+            return {'ok': False, 'error': 'not your turn', 'status': status}
+        code = game.move(x, y)
+        status = game.get_current_status()
+        winner = game.get_winner()
+        if code >= Errorcode.code_run:
+            self.stats.moves += 1
+            self.broadcast(room, {'event': 'move', 'game': message['game'], 'piece': game.get_last_move()[0],
+                                  'x': x, 'y': y, 'status': status, 'winner': winner}, writer)
+        return {'ok': code >= Errorcode.code_run, 'code': code, 'status': status, 'winner': winner,
+                'steps': game.get_steps()}
+
+    def __undo(self, message, writer, joined):
+        room = self.room(message['game'])
+        if room is None:
+            return {'ok': False, 'error': 'no such game'}
+        game = room.game
+        last = game.get_last_move() if game.get_steps() else None
+        if last is not None and room.seats[last[0]] is not writer:
+            return {'ok': False, 'error': 'only the player of the last move can undo it',
+                    'status': game.get_current_status()}
+        code = game.rollback()
+        status = game.get_current_status()
+        if code == Errorcode.code_run:
+            self.broadcast(room, {'event': 'undo', 'game': message['game'], 'x': last[1], 'y': last[2],
+                                  'status': status}, writer)
+        return {'ok': code == Errorcode.code_run, 'code': code, 'status': status, 'winner': game.get_winner(),
+                'steps': game.get_steps()}
+
+    def __stats(self, message, writer, joined):
+        stats = self.stats.to_dict()
+        stats['rooms'] = len(self.rooms)
+        return {'ok': True, 'stats': stats}
+
+    def evict(self, now=None):
+        """
+        pack or remove the games which were not used for idle_timeout seconds, return the number of them
+        """
+        now = time.monotonic() if now is None else now
+        count = 0
+        for game_id, room in list(self.rooms.items()):
+            if room.game is None or now - room.last_used < self.idle_timeout:
+                continue
+            count += 1
+            game = room.game
+            if game.get_current_status() >= 3:
+                if self.archive is not None:
+                    self.archive.write(game)
+                del self.rooms[game_id]
+                self.stats.removed += 1
+            else:
+                room.packed = encode(GameRecord.from_game(game))
+                room.game = None
+                self.stats.packed += 1
+        return count
+
+    async def sweep(self):
+        while True:
+            await asyncio.sleep(self.sweep_every)
+            self.evict()
+
+
+class GameClient:
+    """
+    a client of GameServer, request sends one request and waits for its reply
+    the event lines of the games it joined are counted and kept in events until they are read
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.next_id = 0
+        self.pending = {}
+        self.events = []
+        self.event_count = 0
+        self.task = asyncio.get_running_loop().create_task(self.__read())
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=8765):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, **message):
+        """
+        send the request and return the reply as a dict
+        """
+        self.next_id += 1
+        message['id'] = self.next_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending[self.next_id] = future
+        self.writer.write((json.dumps(message, separators=(',', ':')) + '\n').encode())
+        return await future
+
+    async def __read(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if 'id' in message:
+                    # a reply to no request of this client is ignored
+                    future = self.pending.pop(message['id'], None)
+                    if future is not None and not future.done():
+                        future.set_result(message)
+                else:
+                    self.event_count += 1
+                    self.events.append(message)
+                    # only the latest events are kept
+                    if len(self.events) > 1000:
+                        del self.events[:500]
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError('the server closed the connection'))
+
+    async def close(self):
+        self.writer.close()
+        self.task.cancel()
+
+
+async def play_pair(host, port, games, seed, latencies, map_size=16):
+    """
+    two clients play games games against each other with random moves, black makes each game and white joins it,
+    so every move is also an event for the other client; the seconds of every move request go to latencies
+    return the number of events white and black got
+    """
+    rng = random.Random(seed)
+    black = await GameClient.connect(host, port)
+    white = await GameClient.connect(host, port)
+    spots = [(x, y) for x in range(map_size) for y in range(map_size)]
+    try:
+        for _ in range(games):
+            game_id = (await black.request(op='new', size=map_size))['game']
+            await white.request(op='join', game=game_id)
+            rng.shuffle(spots)
+            for step, (x, y) in enumerate(spots):
+                client = black if step % 2 == 0 else white
+                begin = time.perf_counter()
+                reply = await client.request(op='move', game=game_id, x=x, y=y)
+                latencies.append(time.perf_counter() - begin)
+                if not reply['ok'] or reply['status'] >= 3:
+                    break
+            await white.request(op='leave', game=game_id)
+            await black.request(op='leave', game=game_id)
+        return black.event_count + white.event_count
+    finally:
+        await black.close()
+        await white.close()
+
+
+def percentile(values, part):
+    """
+    return the value under which part (0 to 1) of the sorted values are
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(part * len(values)))]
+
+
+async def load_test(host, port, pairs=50, games=10, seed=0):
+    """
+    run pairs of clients at the same time against a server and return (moves, seconds, sorted latencies, events)
+    """
+    latencies = []
+    begin = time.perf_counter()
+    events = await asyncio.gather(*(play_pair(host, port, games, seed + index, latencies)
+                                    for index in range(pairs)))
+    elapsed = time.perf_counter() - begin
+    latencies.sort()
+    return len(latencies), elapsed, latencies, sum(events)
+
+
+def serve(host, port, idle_timeout, archive=None, ready=None):
+    """
+    run a GameServer until the process is stopped, ready is set once it listens
+    """
+    async def run():
+        server = GameServer(host, port, idle_timeout, archive=archive)
+        await server.start()
+        if ready is not None:
+            ready.set()
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GoBang game server and its load test')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--idle', type=float, default=300.0, help='seconds before an idle game is evicted')
+    parser.add_argument('--archive', default=None, help='record file (.gbr) for the evicted finished games')
+    parser.add_argument('--load', type=int, default=0, metavar='PAIRS',
+                        help='run the load test with PAIRS pairs of clients instead of serving')
+    parser.add_argument('--games', type=int, default=10, help='games of each pair of the load test')
+    parser.add_argument('--local', action='store_true', help='start a loopback server for the load test')
+    args = parser.parse_args()
+
+    if not args.load:
+        serve(args.host, args.port, args.idle, args.archive)
+        return
+    process = None
+    if args.local:
+        ready = multiprocessing.Event()
+        process = multiprocessing.Process(target=serve, args=(args.host, args.port, args.idle, None, ready),
+                                          daemon=True)
+        process.start()
+        ready.wait()
+    try:
+        moves, elapsed, latencies, events = asyncio.run(load_test(args.host, args.port, args.load, args.games))
+    finally:
+        if process is not None:
+            process.terminate()
+    print(f'{args.load * 2} clients, {args.load * args.games} games, {moves} moves, {events} events in {elapsed:.2f} s')
+    print(f'{moves / elapsed:.0f} moves/s, latency p50 {percentile(latencies, 0.5) * 1000:.2f} ms, '
+          f'p99 {percentile(latencies, 0.99) * 1000:.2f} ms, max {latencies[-1] * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+"""
+Headless tournament runner: plays GoBang games between move policies on a process pool.
+A policy is a picklable callable, policy(game) returns the (x, y) to move.
+If it has a seed(value) method, it is called before each game so every game can be replayed from its seed.
+AlphaBetaAI drops its tables there, so a game does not depend on the games its worker played before,
+but a search with a time budget still depends on the speed of the machine.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from Gobang_core import Errorcode, GoBang
+from Gobang_record import RECORD_SUFFIX, GameRecord, RecordWriter
+from Gobang_rules import RULES
+
+
+class RandomPolicy:
+    """
+    play a random empty spot next to the chess on the board
+    """
+
+    def __init__(self, seed=None, radius=1):
+        self.rng = random.Random(seed)
+        self.radius = radius
+
+    def seed(self, value):
+        self.rng.seed(value)
+
+    def __call__(self, game):
+        size = game.map_size
+        board = game.board
+        spots = set()
+        for _, x, y in game.get_record_move():
+            for nx in range(max(0, x - self.radius), min(size, x + self.radius + 1)):
+                for ny in range(max(0, y - self.radius), min(size, y + self.radius + 1)):
+                    if board.get(nx, ny) == 0:
+                        spots.add((nx, ny))
+        if not spots:
+            spots = [(x, y) for x in range(size) for y in range(size) if board.get(x, y) == 0]
+        return self.rng.choice(sorted(spots)) if spots else None
+
+
+class GreedyPolicy(RandomPolicy):
+    """
+    win at once if it can, block the 5 links of the other player, else play like RandomPolicy
+    """
+
+    def __call__(self, game):
+        piece = 1 if game.get_current_status() == 1 else -1
+        size = game.map_size
+        board = game.board
+        candidates = set()
+        for _, x, y in game.get_record_move():
+            for nx in range(max(0, x - 1), min(size, x + 2)):
+                for ny in range(max(0, y - 1), min(size, y + 2)):
+                    if board.get(nx, ny) == 0:
+                        candidates.add((nx, ny))
+        for color in (piece, -piece):
+            for x, y in sorted(candidates):
+                board.set(x, y, color)
+                five = board.has_five(x, y)
+                board.set(x, y, 0)
+                if five:
+                    return (x, y)
+        return super(GreedyPolicy, self).__call__(game)
+
+
+class GameResult:
+    def __init__(self, game_id, black, white, seed, winner, steps, moves, move_times, illegal=False,
+                 map_size=16, rule='freestyle'):
+        """
+        game_id: the number of the game in the tournament
+        black, white: the names of the players
+        seed: the seed of the game
+        winner: 1 black, -1 white, 0 draw
+        steps: get_steps of the game at the end
+        moves: the list of (x, y)
+        move_times: seconds each policy call took
+        illegal: True if the loser returned an illegal move
+        map_size, rule: the board size and the rule of the game
+        """
+        self.game_id = game_id
+        self.black = black
+        self.white = white
+        self.seed = seed
+        self.winner = winner
+        self.steps = steps
+        self.moves = moves
+        self.move_times = move_times
+        self.illegal = illegal
+        self.map_size = map_size
+        self.rule = rule
+
+    def to_record(self):
+        """
+        return the compact record of the game, a dict which can be written as one JSON line
+        moves is a hex string with one byte x * 16 + y per move on boards up to 16, two bytes x, y on bigger
+        boards like Gobang_record, the color follows from the order
+        """
+        if self.map_size <= 16:
+            moves = bytes(x * 16 + y for x, y in self.moves)
+        else:
+            moves = bytes(value for x, y in self.moves for value in (x, y))
+        return {
+            'id': self.game_id,
+            'black': self.black,
+            'white': self.white,
+            'seed': self.seed,
+            'winner': self.winner,
+            'steps': self.steps,
+            'illegal': self.illegal,
+            'map_size': self.map_size,
+            'rule': self.rule,
+            'moves': moves.hex(),
+            'time': round(sum(self.move_times), 6),
+            'max_time': round(max(self.move_times, default=0.0), 6),
+        }
+
+
+def play_one(game_id, black, white, seed, map_size=16, max_steps=None, rule='freestyle'):
+    """
+    play one game, black and white are (name, policy), return a GameResult
+    """
+    random.seed(seed)
+    for _, policy in (black, white):
+        if hasattr(policy, 'seed'):
+            policy.seed(seed)
+    game = GoBang(map_size, rule=rule)
+    game.start_move()
+    moves = []
+    move_times = []
+    illegal = False
+    while game.get_current_status() in (1, 2):
+        if max_steps is not None and game.get_steps() >= max_steps:
+            break
+        piece = 1 if game.get_current_status() == 1 else -1
+        policy = black[1] if piece == 1 else white[1]
+        begin = time.perf_counter()
+        move = policy(game)
+        move_times.append(time.perf_counter() - begin)
+        if move is None:
+            break
+        if game.move(move[0], move[1]) < Errorcode.code_run:
+            # an illegal move loses the game
+            illegal = True
+            game.winner = -piece
+            break
+        moves.append((move[0], move[1]))
+    return GameResult(game_id, black[0], white[0], seed, game.get_winner(), game.get_steps(),
+                      moves, move_times, illegal, map_size, rule)
+
+
+def pairings(players, games, seed=0):
+    """
+    yield (game id, black, white, seed) for a round robin: every two players play games games,
+    changing colors after each game
+    """
+    game_id = 0
+    for first in range(len(players)):
+        for second in range(first + 1, len(players)):
+            for number in range(games):
+                if number % 2 == 0:
+                    black, white = players[first], players[second]
+                else:
+                    black, white = players[second], players[first]
+                yield game_id, black, white, seed + game_id
+                game_id += 1
+
+
+def run_tournament(players, games, workers=None, seed=0, map_size=16, max_steps=None, rule='freestyle'):
+    """
+    play the round robin of the players on a process pool and yield every GameResult as soon as it ends
+    players is a list of (name, policy), workers is the number of processes (all cores by default)
+    only a few games per worker are submitted at a time, so the memory does not grow with the number of games
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = pairings(players, games, seed)
+    if workers == 1:
+        for game_id, black, white, game_seed in tasks:
+            yield play_one(game_id, black, white, game_seed, map_size, max_steps, rule)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        running = set()
+        for game_id, black, white, game_seed in tasks:
+            running.add(pool.submit(play_one, game_id, black, white, game_seed, map_size, max_steps, rule))
+            if len(running) >= workers * 4:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in running:
+            yield future.result()
+
+
+def write_results(results, path):
+    """
+    write each result while the tournament goes on, yield the results again
+    a path ending with RECORD_SUFFIX gets the binary game records of Gobang_record,
+    any other path gets one JSON line per game
+    """
+    if path.endswith(RECORD_SUFFIX):
+        with RecordWriter(path) as writer:
+            for result in results:
+                writer.write(GameRecord(result.moves, result.winner, result.map_size, result.rule))
+                yield result
+        return
+    with open(path, 'w') as out:
+        for result in results:
+            out.write(json.dumps(result.to_record(), separators=(',', ':')) + '\n')
+            yield result
+
+
+def summary(results):
+    """
+    return (scores, count, seconds of all moves) from a stream of results, they are counted one by one
+    scores maps the name of a player to [wins, losses, draws]
+    """
+    scores = {}
+    moves_time = 0.0
+    count = 0
+    for result in results:
+        count += 1
+        for name in (result.black, result.white):
+            scores.setdefault(name, [0, 0, 0])
+        if result.winner == 0:
+            scores[result.black][2] += 1
+            scores[result.white][2] += 1
+        else:
+            winner, loser = (result.black, result.white) if result.winner == 1 else (result.white, result.black)
+            scores[winner][0] += 1
+            scores[loser][1] += 1
+        moves_time += sum(result.move_times)
+    return scores, count, moves_time
+
+
+def make_player(name, time_budget):
+    """
+    return (name, policy) of a built-in player: random, greedy or ai
+    """
+    if name == 'random':
+        return name, RandomPolicy()
+    if name == 'greedy':
+        return name, GreedyPolicy()
+    if name == 'ai':
+        from Gobang_ai import AlphaBetaAI
+        return name, AlphaBetaAI(time_budget=time_budget)
+    raise ValueError(f'unknown player {name}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='play a GoBang tournament between move policies')
+    parser.add_argument('players', nargs='*', default=['random', 'greedy'], help='random, greedy or ai')
+    parser.add_argument('--games', type=int, default=100, help='games between every two players')
+    parser.add_argument('--workers', type=int, default=None, help='processes, all cores by default')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--size', type=int, default=16, help='board size')
+    parser.add_argument('--rule', choices=sorted(RULES), default='freestyle')
+    parser.add_argument('--time', type=float, default=0.1, help='seconds per move of the ai player')
+    parser.add_argument('--out', default=None, help='file for the records of the games, binary for a .gbr file, else JSON lines')
+    parser.add_argument('--book', default=None, help='opening book file (.gbk) which every player uses first')
+    args = parser.parse_args()
+
+    players = [make_player(name, args.time) for name in args.players]
+    # the same policy may play against itself
+    players = [(f'{name}{index}', policy) for index, (name, policy) in enumerate(players)]
+    if args.book:
+        from Gobang_book import BookPolicy
+        players = [(name, BookPolicy(args.book, policy)) for name, policy in players]
+    begin = time.perf_counter()
+    results = run_tournament(players, args.games, args.workers, args.seed, args.size, rule=args.rule)
+    if args.out:
+        results = write_results(results, args.out)
+    scores, count, moves_time = summary(results)
+    elapsed = time.perf_counter() - begin
+    for name, (wins, losses, draws) in scores.items():
+        print(f'{name:12s} wins {wins:6d} losses {losses:6d} draws {draws:6d}')
+    print(f'{count} games in {elapsed:.2f} s, {count / elapsed:.1f} games/s, '
+          f'{moves_time / max(1, count):.4f} s of moves per game')
+
+
+if __name__ == '__main__':
+    main()
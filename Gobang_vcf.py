@@ -0,0 +1,435 @@
+"""
+Threat-space solver for forced wins.
+VCF (victory by continuous fours): the attacker only plays fours, the defender must block each of them.
+VCT (victory by continuous threats): the attacker may also play open threes.
+Only threat moves of the attacker and defence moves of the defender are searched,
+with proof-number search over the positions reached by GoBang.move and GoBang.rollback.
+The threats are the ones of the freestyle rule (5 or more links win), the games of other rules are refused.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from Gobang_core import GoBang
+
+# value of a spot outside the board in the line windows
+WALL = 3
+INFINITY = 1 << 30
+# the four lines through a spot: vertical, horizontal, right oblique, left oblique
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (-1, 1))
+
+# the rules whose threats are the ones of spot_threats
+RULES = ('freestyle',)
+
+# results of a solve
+WIN = 'win'
+NO_WIN = 'no win'
+UNKNOWN = 'unknown'
+
+
+def line_values(grid, map_size, x, y, dx, dy, piece):
+    """
+    return the 11 spots of the line (dx, dy) centered on (x, y) with piece put on (x, y)
+    spots outside the board are WALL
+    """
+    values = []
+    for offset in range(-5, 6):
+        cur_x = x + dx * offset
+        cur_y = y + dy * offset
+        if offset == 0:
+            values.append(piece)
+        elif 0 <= cur_x < map_size and 0 <= cur_y < map_size:
+            values.append(grid[cur_x][cur_y])
+        else:
+            values.append(WALL)
+    return values
+
+
+def spot_threats(grid, map_size, x, y, piece):
+    """
+    return (five, fives, threes) for putting piece on the empty spot (x, y)
+    five: True if it makes 5 links
+    fives: the set of empty spots which would make 5 links after it, two of them can not both be blocked
+    threes: the number of open threes it makes, an open three is a window of 6 spots with both ends empty
+        and 3 chess in the 4 inner spots
+    """
+    five = False
+    fives = set()
+    threes = 0
+    for dx, dy in DIRECTIONS:
+        values = line_values(grid, map_size, x, y, dx, dy, piece)
+        for start in range(1, 6):
+            window = values[start:start + 5]
+            count = window.count(piece)
+            if count == 5:
+                five = True
+            elif count == 4 and window.count(0) == 1:
+                offset = start + window.index(0) - 5
+                fives.add((x + dx * offset, y + dy * offset))
+        for start in range(1, 5):
+            if values[start] == 0 and values[start + 5] == 0:
+                inner = values[start + 1:start + 5]
+                if inner.count(piece) == 3 and inner.count(0) == 1:
+                    threes += 1
+                    break
+    return five, fives, threes
+
+
+def near_spots(grid, map_size, stones, radius):
+    """
+    return the empty spots within radius of the stones, in a fixed order
+    """
+    spots = {}
+    for _, x, y in stones:
+        for nx in range(max(0, x - radius), min(map_size, x + radius + 1)):
+            for ny in range(max(0, y - radius), min(map_size, y + radius + 1)):
+                if grid[nx][ny] == 0:
+                    spots[(nx, ny)] = True
+    return list(spots)
+
+
+def five_spots(grid, map_size, stones, piece):
+    """
+    return the empty spots where piece would make 5 links, they are always next to a chess of piece
+    """
+    own = [stone for stone in stones if stone[0] == piece]
+    return [spot for spot in near_spots(grid, map_size, own, 1)
+            if spot_threats(grid, map_size, spot[0], spot[1], piece)[0]]
+
+
+class PNNode:
+    """
+    a node of the proof-number search tree
+    the OR nodes are the attacker to move, the AND nodes are the defender to move
+    """
+    __slots__ = ('move', 'parent', 'children', 'proof', 'disproof', 'is_or')
+
+    def __init__(self, move, parent, is_or):
+        self.move = move
+        self.parent = parent
+        self.children = None
+        self.proof = 1
+        self.disproof = 1
+        self.is_or = is_or
+
+
+class ThreatResult:
+    def __init__(self, result, sequence, nodes, elapsed):
+        """
+        result: WIN, NO_WIN or UNKNOWN (a limit was reached)
+        sequence: the moves of the proved line, attacker and defender one after another,
+            it stops where the attacker can make 5 links or an open four at once
+        nodes: the number of nodes created
+        elapsed: seconds of the solve
+        """
+        self.result = result
+        self.sequence = sequence
+        self.nodes = nodes
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return (f'ThreatResult(result={self.result!r}, sequence={self.sequence}, nodes={self.nodes}, '
+                f'elapsed={self.elapsed:.3f})')
+
+
+class ThreatSolver:
+
+    def __init__(self, mode='vcf', max_nodes=200000, time_limit=5.0, max_depth=40, table_size=1 << 20):
+        """
+        mode: 'vcf' only fours for the attacker, 'vct' fours and open threes
+        max_nodes: the biggest number of nodes created by one solve, it bounds the memory
+        time_limit: seconds for one solve
+        max_depth: the longest sequence in steps, deeper positions are counted as not won
+        table_size: the biggest number of solved positions kept in the node table
+        """
+        if mode not in ('vcf', 'vct'):
+            raise ValueError(f'unknown mode {mode}')
+        self.mode = mode
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.table_size = table_size
+        # (hash, attacker) -> True if proved, False if disproved at once, it is kept between the solves
+        # disproofs which come from the depth limit are not kept, they depend on the way to the position
+        self.table = {}
+        self.nodes = 0
+
+    def solve(self, game):
+        """
+        look for a forced win of the player to move in the game, the game is not changed
+        return a ThreatResult, raise ValueError for a game whose rule is not in RULES
+        """
+        if game.rule.name not in RULES:
+            raise ValueError(f'the threat solver only knows the {", ".join(RULES)} rule, '
+                             f'not {game.rule.name}')
+        begin = time.perf_counter()
+        deadline = begin + self.time_limit
+        game = game.copy()
+        if game.get_current_status() not in (1, 2):
+            return ThreatResult(NO_WIN, [], 0, 0.0)
+        if len(self.table) > self.table_size:
+            self.table.clear()
+        attacker = 1 if game.get_current_status() == 1 else -1
+        root_steps = game.get_steps()
+        root = PNNode(None, None, True)
+        self.nodes = 1
+        self.__expand(game, root, attacker, root_steps)
+        self.__update(root)
+        while root.proof != 0 and root.disproof != 0:
+            if self.nodes >= self.max_nodes or time.perf_counter() > deadline:
+                break
+            node = root
+            # go down to the most proving node
+            while node.children:
+                child = self.__most_proving(node)
+                if game.move(child.move[0], child.move[1]) < 0:
+                    # the move was refused and the board did not change: it is no threat and no defence
+                    self.__set(child, child.is_or)
+                    break
+                node = child
+            else:
+                self.__expand(game, node, attacker, root_steps)
+            # go back up and update the proof and disproof numbers
+            while node is not None:
+                self.__update(node)
+                if node.proof == 0:
+                    # a proved win does not depend on the way to the position
+                    self.table[(game.hash, attacker)] = True
+                if node.parent is not None:
+                    game.rollback()
+                node = node.parent
+
+        elapsed = time.perf_counter() - begin
+        if root.proof == 0:
+            return ThreatResult(WIN, self.__proof_line(root), self.nodes, elapsed)
+        if root.disproof == 0:
+            return ThreatResult(NO_WIN, [], self.nodes, elapsed)
+        return ThreatResult(UNKNOWN, [], self.nodes, elapsed)
+
+    def __most_proving(self, node):
+        """
+        the child which decides the number of the node: the smallest proof of an OR node,
+        the smallest disproof of an AND node
+        """
+        if node.is_or:
+            return min(node.children, key=lambda child: child.proof)
+        return min(node.children, key=lambda child: child.disproof)
+
+    def __update(self, node):
+        """
+        compute the proof and disproof numbers of an expanded node from its children
+        """
+        if node.children is None:
+            return
+        if not node.children:
+            # solved when it was expanded
+            return
+        if node.is_or:
+            node.proof = min(child.proof for child in node.children)
+            node.disproof = min(INFINITY, sum(child.disproof for child in node.children))
+        else:
+            node.proof = min(INFINITY, sum(child.proof for child in node.children))
+            node.disproof = min(child.disproof for child in node.children)
+        # a solved subtree is not needed any more, only the proved line is kept
+        if node.proof == 0:
+            if node.is_or:
+                node.children = [child for child in node.children if child.proof == 0][:1]
+        elif node.disproof == 0:
+            node.children = []
+
+    def __set(self, node, proved):
+        """
+        mark a node as solved
+        """
+        node.children = []
+        if proved:
+            node.proof = 0
+            node.disproof = INFINITY
+        else:
+            node.proof = INFINITY
+            node.disproof = 0
+
+    def __expand(self, game, node, attacker, root_steps):
+        """
+        generate the children of a node with the threat moves or the defence moves of its position
+        positions which are decided at once are marked as solved
+        """
+        key = (game.hash, attacker)
+        known = self.table.get(key)
+        if known is not None:
+            self.__set(node, known)
+            return
+        if game.get_steps() - root_steps >= self.max_depth:
+            self.__set(node, False)
+            return
+        moves = self.__attacks(game, attacker) if node.is_or else self.__defences(game, attacker)
+        if moves is True or moves is False:
+            self.__set(node, moves)
+            self.table[key] = moves
+            return
+        if not moves:
+            # the attacker has no threat left, the defender has nothing to block
+            self.__set(node, not node.is_or)
+            self.table[key] = not node.is_or
+            return
+        node.children = []
+        for move, proof in moves:
+            child = PNNode(move, node, not node.is_or)
+            if proof == 0:
+                self.__set(child, True)
+            elif node.is_or:
+                child.proof = proof
+            else:
+                # look one step further: the attacker may win at once or have no threat after this defence
+                if game.move(move[0], move[1]) < 0:
+                    continue
+                attacks = self.__attacks(game, attacker)
+                game.rollback()
+                if attacks is True or (attacks and attacks[0][1] == 0):
+                    self.__set(child, True)
+                elif not attacks:
+                    self.__set(child, False)
+                else:
+                    child.disproof = len(attacks)
+            node.children.append(child)
+        self.nodes += len(node.children)
+        if not node.children:
+            # none of the defences can be played
+            self.__set(node, True)
+
+    def __attacks(self, game, attacker):
+        """
+        return the threat moves of the attacker as a list of (move, first proof number),
+        True if it wins at once, False if it has lost
+        """
+        grid = game.map
+        map_size = game.map_size
+        stones = game.get_record_move()
+        if five_spots(grid, map_size, stones, attacker):
+            return True
+        blocks = five_spots(grid, map_size, stones, -attacker)
+        if len(blocks) >= 2:
+            return False
+        spots = blocks if blocks else near_spots(grid, map_size, [s for s in stones if s[0] == attacker], 2)
+        moves = []
+        for x, y in spots:
+            _, fives, threes = spot_threats(grid, map_size, x, y, attacker)
+            if self.mode != 'vct':
+                threes = 0
+            if fives or threes:
+                moves.append((len(fives), threes, (x, y)))
+        # bigger threats first: two fives can not both be blocked, so it is already won (proof number 0),
+        # a four leaves one defence, so its proof number starts at 1, an open three (vct) at 3
+        # the threes only order the moves, a four with threes is still searched: the block can make a four
+        moves.sort(key=lambda item: (-item[0], -item[1]))
+        return [(move, 0 if fours >= 2 else 1 if fours else 3) for fours, _, move in moves]
+
+    def __defences(self, game, attacker):
+        """
+        return the defence moves against the last threat as a list of (move, first proof number),
+        True if the attacker has won, False if the defender wins
+        """
+        grid = game.map
+        map_size = game.map_size
+        stones = game.get_record_move()
+        defender = -attacker
+        if five_spots(grid, map_size, stones, defender):
+            return False
+        fives = five_spots(grid, map_size, stones, attacker)
+        if len(fives) >= 2:
+            return True
+        if fives:
+            return [(spot, 1) for spot in fives]
+        # an open three: block any spot of the windows around it, or play a four of its own
+        _, x, y = stones[-1]
+        moves = {}
+        for dx, dy in DIRECTIONS:
+            values = line_values(grid, map_size, x, y, dx, dy, attacker)
+            for start in range(1, 6):
+                window = values[start:start + 5]
+                if window.count(attacker) >= 3 and window.count(0) + window.count(attacker) == 5:
+                    for index in range(start, start + 5):
+                        if values[index] == 0:
+                            moves[(x + dx * (index - 5), y + dy * (index - 5))] = True
+        own = [stone for stone in stones if stone[0] == defender]
+        for spot in near_spots(grid, map_size, own, 2):
+            if spot not in moves and spot_threats(grid, map_size, spot[0], spot[1], defender)[1]:
+                moves[spot] = True
+        return [(spot, 1) for spot in moves]
+
+    def __proof_line(self, root):
+        """
+        follow the proved children from the root: the winning move of OR nodes, the hardest defence of AND nodes
+        """
+        line = []
+        node = root
+        while node.children:
+            if node.is_or:
+                node = next(child for child in node.children if child.proof == 0)
+            else:
+                node = max(node.children, key=lambda child: len(self.__subtree_line(child)))
+            line.append(node.move)
+        return line
+
+    def __subtree_line(self, node):
+        """
+        the proved line below a node, used to pick the longest defence
+        """
+        line = []
+        while node.children:
+            node = next((child for child in node.children if child.proof == 0), node.children[0])
+            line.append(node.move)
+        return line
+
+
+def replay_record(record, map_size=16, rule='freestyle'):
+    """
+    return a started GoBang object after the moves of a record, a list of (piece, x, y)
+    raise ValueError if the rule refuses a move
+    """
+    game = GoBang(map_size, rule=rule)
+    game.start_move()
+    for step, (_, x, y) in enumerate(record):
+        code = game.move(x, y)
+        if code < 0:
+            raise ValueError(f'move {step} ({x}, {y}) of the record is refused, code {code}')
+    return game
+
+
+def tag_record(record, mode='vcf', min_steps=5, map_size=16, max_nodes=20000, time_limit=1.0, rule='freestyle'):
+    """
+    solve every position of a record from min_steps on for the player to move
+    return a list of (steps, result, sequence) of the positions with a forced win
+    raise ValueError for a rule the solver does not know, see RULES
+    """
+    if rule not in RULES:
+        raise ValueError(f'the threat solver only knows the {", ".join(RULES)} rule, not {rule}')
+    solver = ThreatSolver(mode, max_nodes=max_nodes, time_limit=time_limit)
+    game = GoBang(map_size, rule=rule)
+    game.start_move()
+    tags = []
+    for steps, (_, x, y) in enumerate(record):
+        if steps >= min_steps and game.get_current_status() in (1, 2):
+            result = solver.solve(game)
+            if result.result == WIN:
+                tags.append((steps, result.result, result.sequence))
+        if game.move(x, y) < 0 or game.get_current_status() not in (1, 2):
+            break
+    return tags
+
+
+def tag_records(records, mode='vcf', min_steps=5, map_size=16, max_nodes=20000, time_limit=1.0, workers=None,
+                rule='freestyle'):
+    """
+    tag the forced wins of many records, yield (record index, tags) in the order of the records
+    workers > 1 spreads the records over a process pool
+    """
+    if workers is None or workers <= 1:
+        for index, record in enumerate(records):
+            yield index, tag_record(record, mode, min_steps, map_size, max_nodes, time_limit, rule)
+        return
+    task = partial(tag_record, mode=mode, min_steps=min_steps, map_size=map_size,
+                   max_nodes=max_nodes, time_limit=time_limit, rule=rule)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for index, tags in enumerate(pool.map(task, records, chunksize=4)):
+            yield index, tags
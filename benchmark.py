@@ -0,0 +1,1311 @@
+"""
+Benchmarks of the rules, the engines, the window and the files of GoBang.
+Run them all or some of them by name, the window ones use the SDL dummy drivers so no display is needed:
+    python benchmark.py                         all the benchmarks
+    python benchmark.py engine render clicks    some of them
+    python benchmark.py --json results.json     also save the measures
+    python benchmark.py --compare old.json      and compare them with the measures of another version
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from Gobang_core import GoBang
+
+# the measures of the benchmarks which ran, see measure
+RESULTS = {}
+
+
+def measure(name, value, unit, higher_is_better=True):
+    """
+    keep one measure for the JSON output, name is 'benchmark.metric'
+    """
+    RESULTS[name] = {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+
+
+def random_game(seed, map_size=16, backend='list'):
+    """
+    play a random game until one player wins or the board is full
+    return the GoBang object at the end of the game
+    """
+    rng = random.Random(seed)
+    game = GoBang(map_size, backend)
+    game.start_move()
+    spots = [(x, y) for x in range(map_size) for y in range(map_size)]
+    rng.shuffle(spots)
+    for x, y in spots:
+        game.move(x, y)
+        if game.get_current_status() >= 3:
+            break
+    return game
+
+
+def dense_position(seed, map_size=16):
+    """
+    fill the board randomly but never let a color form 5 links, it is the worst case for the win check
+    because almost every line is full of chess and there are many 4 links
+    the spots where both colors would win are left empty
+    return the GoBang object, its record holds every chess on the board
+    """
+    rng = random.Random(seed)
+    game = GoBang(map_size)
+    spots = [(x, y) for x in range(map_size) for y in range(map_size)]
+    rng.shuffle(spots)
+    for x, y in spots:
+        for piece in rng.sample((1, -1), 2):
+            game.map[x][y] = piece
+            game.record_move.append((piece, x, y))
+            if game.check_win() == 0:
+                break
+            game.record_move.pop()
+            game.map[x][y] = 0
+    return game
+
+
+def replay_random_game(game, check):
+    """
+    replay a finished random game step by step and run the check after each step
+    """
+    record = game.record_move
+    results = []
+    for x in range(game.map_size):
+        for y in range(game.map_size):
+            game.map[x][y] = 0
+    for step in range(len(record)):
+        piece, x, y = record[step]
+        game.map[x][y] = piece
+        game.record_move = record[:step + 1]
+        results.append(check(game))
+    game.record_move = record
+    return results
+
+
+def bench_check_win(seed=2140, count=20, repeat=3):
+    """
+    compare check_win with the original full scan check_win_scan
+    on random games (checked after every step) and dense adversarial positions (checked on every spot)
+    the results must be exactly the same
+    """
+    random_games = [random_game(seed + i) for i in range(count)]
+    dense_games = [dense_position(seed + i) for i in range(count)]
+
+    def run(check):
+        results = []
+        for game in random_games:
+            results.extend(replay_random_game(game, check))
+        for game in dense_games:
+            record = game.record_move
+            for x in range(game.map_size):
+                for y in range(game.map_size):
+                    placed = game.map[x][y]
+                    pieces = (placed,) if placed != 0 else (1, -1)
+                    for piece in pieces:
+                        game.map[x][y] = piece
+                        game.record_move = [(piece, x, y)]
+                        results.append(check(game))
+                    game.map[x][y] = placed
+            game.record_move = record
+        return results
+
+    checks = {'check_win_scan': GoBang.check_win_scan, 'check_win': GoBang.check_win}
+    expect = run(GoBang.check_win_scan)
+    print(f'check_win: {len(expect)} positions, {sum(1 for r in expect if r != 0)} of them are winning')
+    for name, check in checks.items():
+        best = None
+        for _ in range(repeat):
+            begin = time.perf_counter()
+            results = run(check)
+            cost = time.perf_counter() - begin
+            best = cost if best is None else min(best, cost)
+        if results != expect:
+            raise AssertionError(f'{name} does not match check_win_scan')
+        print(f'  {name:16s} {best * 1000:9.2f} ms  {len(expect) / best:12.0f} checks/s')
+        measure(f'check_win.{name}', len(expect) / best, 'checks/s')
+
+
+def bench_backends(seed=2140, count=200, repeat=3):
+    """
+    play the same random games with every board backend and compare move + check_win, rollback, copy and key
+    the records, winners and the final boards must be the same for all the backends
+    """
+    expect = None
+    for backend in GoBang.BACKENDS:
+        best = None
+        for _ in range(repeat):
+            begin = time.perf_counter()
+            games = [random_game(seed + i, backend=backend) for i in range(count)]
+            cost = time.perf_counter() - begin
+            best = cost if best is None else min(best, cost)
+        result = [(game.get_record_move(), game.get_winner(), [list(row) for row in game.map]) for game in games]
+        if expect is None:
+            expect = result
+        elif result != expect:
+            raise AssertionError(f'backend {backend} does not match the list backend')
+        moves = sum(game.get_steps() for game in games)
+
+        begin = time.perf_counter()
+        copies = [game.copy() for game in games for _ in range(10)]
+        copy_cost = time.perf_counter() - begin
+        begin = time.perf_counter()
+        keys = set(game.key() for game in copies)
+        key_cost = time.perf_counter() - begin
+        begin = time.perf_counter()
+        for game in copies:
+            while game.rollback() == 0:
+                pass
+        rollback_cost = time.perf_counter() - begin
+        print(f'backend {backend}: {count} games, {moves} moves, {len(keys)} positions')
+        print(f'  move+check_win {moves / best:12.0f} moves/s')
+        print(f'  copy           {len(copies) / copy_cost:12.0f} copies/s')
+        print(f'  key            {len(copies) / key_cost:12.0f} keys/s')
+        print(f'  rollback       {moves * 10 / rollback_cost:12.0f} rollbacks/s')
+        measure(f'backends.{backend}.move', moves / best, 'moves/s')
+        measure(f'backends.{backend}.copy', len(copies) / copy_cost, 'copies/s')
+        measure(f'backends.{backend}.rollback', moves * 10 / rollback_cost, 'rollbacks/s')
+
+
+# the snippets run in a new python process, each of them prints the seconds of its steps
+STARTUP_SNIPPETS = {
+    'import Gobang_core + GoBang()': (
+        'import time\n'
+        'begin = time.perf_counter()\n'
+        'import Gobang_core\n'
+        'loaded = time.perf_counter()\n'
+        'Gobang_core.GoBang()\n'
+        'built = time.perf_counter()\n'
+        'print(loaded - begin, built - loaded)\n'
+    ),
+    'import Gobang_main + GoBang()': (
+        'import sys, time\n'
+        'begin = time.perf_counter()\n'
+        'import Gobang_main\n'
+        'loaded = time.perf_counter()\n'
+        'Gobang_main.GoBang()\n'
+        'built = time.perf_counter()\n'
+        'assert "pygame" not in sys.modules\n'
+        'print(loaded - begin, built - loaded)\n'
+    ),
+    'import Gobang_main + GameGoBang()': (
+        'import time\n'
+        'begin = time.perf_counter()\n'
+        'import Gobang_main\n'
+        'loaded = time.perf_counter()\n'
+        'Gobang_main.GameGoBang()\n'
+        'built = time.perf_counter()\n'
+        'print(loaded - begin, built - loaded)\n'
+    ),
+}
+
+
+def bench_startup(repeat=5):
+    """
+    measure the import and construction cost of the headless rules and of the pygame window
+    each sample runs in a new python process, so the import cache does not hide the cost
+    the window uses the SDL dummy drivers, so it also works without a display
+    """
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', SDL_AUDIODRIVER='dummy', PYGAME_HIDE_SUPPORT_PROMPT='1')
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name, snippet in STARTUP_SNIPPETS.items():
+        samples = []
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, '-W', 'ignore', '-c', snippet], cwd=here, env=env,
+                                    capture_output=True, text=True)
+            if output.returncode != 0:
+                print(f'{name}: failed\n{output.stderr}')
+                break
+            samples.append([float(value) for value in output.stdout.split()])
+        else:
+            load = min(sample[0] for sample in samples)
+            build = min(sample[1] for sample in samples)
+            print(f'{name:34s} import {load * 1000:8.2f} ms  construct {build * 1000:8.2f} ms')
+            measure(f'startup.{name}.import', load * 1000, 'ms', False)
+            measure(f'startup.{name}.construct', build * 1000, 'ms', False)
+
+
+# opening moves of the positions used by the AI benchmarks
+AI_POSITIONS = [
+    [(7, 7), (8, 8), (7, 8), (9, 9), (7, 9)],
+    [(7, 7), (8, 7), (8, 8), (9, 9), (6, 6), (5, 5), (9, 7), (10, 6)],
+    [(8, 8), (8, 9), (9, 9), (7, 7), (10, 10), (11, 11), (9, 8), (9, 10), (10, 8), (11, 8)],
+]
+
+
+def position(moves, map_size=16, backend='list'):
+    """
+    return a started GoBang object after the list of (x, y) moves
+    """
+    game = GoBang(map_size, backend)
+    game.start_move()
+    for x, y in moves:
+        game.move(x, y)
+    return game
+
+
+def bench_ai(time_budget=1.0):
+    """
+    search the AI benchmark positions with the time budget and report depth and nodes per second
+    the nodes per second tells how many AI games at the same time one machine can serve
+    """
+    from Gobang_ai import AlphaBetaAI
+
+    nodes = 0
+    elapsed = 0.0
+    for moves in AI_POSITIONS:
+        result = AlphaBetaAI(time_budget=time_budget).search(position(moves))
+        nodes += result.nodes
+        elapsed += result.elapsed
+        print(f'ai {len(moves):2d} steps: move {result.move} score {result.score:9d} depth {result.depth:2d} '
+              f'nodes {result.nodes:7d} {result.get_nps():9.0f} nodes/s')
+    print(f'ai total: {nodes / elapsed:9.0f} nodes/s')
+    measure('ai.nodes', nodes / elapsed, 'nodes/s')
+
+
+def bench_ponder(seed=2140, moves=8, time_budget=0.5, table_size=1 << 12):
+    """
+    the ai plays black against an ai which does not ponder, black ponders for the time white thinks
+    report the ponder hit rate, the seconds saved by the hits, the depths of the searches,
+    the transposition table hit rate and its size, which must stay below table_size
+    """
+    from Gobang_ai import AlphaBetaAI
+
+    game = position(AI_POSITIONS[0][:4])
+    black = AlphaBetaAI(time_budget=time_budget, table_size=table_size)
+    white = AlphaBetaAI(time_budget=time_budget)
+    depths = []
+    largest = 0
+    for _ in range(moves):
+        if game.get_current_status() != 1:
+            break
+        result = black.search(game)
+        depths.append(result.depth)
+        print(f'ponder: move {result.move} depth {result.depth:2d} table hits {result.get_hit_rate() * 100:5.1f} %  '
+              f'{"ponder hit, saved " + format(result.saved, ".2f") + " s" if result.ponder_hit else ""}')
+        if game.move(result.move[0], result.move[1]) != 0:
+            break
+        # black ponders while white thinks
+        deadline = time.perf_counter() + time_budget
+        black.ponder(game, lambda: time.perf_counter() > deadline)
+        largest = max(largest, black.get_stats()['table_entries'])
+        reply = white(game)
+        if game.move(reply[0], reply[1]) != 0:
+            break
+    stats = black.get_stats()
+    print(f'ponder: {stats["ponder_hits"]} hits in {stats["ponders"]} ponders '
+          f'({stats["ponder_hit_rate"] * 100:.0f} %), {stats["saved"]:.2f} s saved, '
+          f'{stats["saved"] / max(1, stats["searches"]):.2f} s a move')
+    print(f'ponder: table hit rate {stats["table_hit_rate"] * 100:.1f} %, {stats["generations"]} generations, '
+          f'at most {largest} entries of {table_size}, mean depth {sum(depths) / len(depths):.1f}')
+    measure('ponder.hit_rate', stats['ponder_hit_rate'], 'ratio')
+    measure('ponder.saved', stats['saved'] / max(1, stats['searches']), 's')
+    measure('ponder.table_hit_rate', stats['table_hit_rate'], 'ratio')
+
+
+def bench_analysis(seed=2140, count=12, steps=16, depth=2, multi_pv=3):
+    """
+    analyse the first steps positions of random games with multi_pv best moves to a fixed depth,
+    with one process and with all the cores, then again with the cache of the first run
+    every game is there twice, so half of the positions are found in the cache in the first run already
+    """
+    from Gobang_analysis import Analyser, analyse_games
+
+    games = []
+    for i in range(count):
+        moves = [(x, y) for _, x, y in random_game(seed + i).get_record_move()[:steps]]
+        games += [(moves, 0, 16), (moves, 0, 16)]
+    positions = sum(len(moves) for moves, _, _ in games)
+    cores = os.cpu_count() or 1
+    for workers in sorted({1, cores}):
+        analyser = Analyser(multi_pv, depth)
+        for run in ('cold', 'warm'):
+            analyser.cache.hits = analyser.cache.misses = 0
+            begin = time.perf_counter()
+            for _ in analyse_games(games, analyser, workers=workers):
+                pass
+            cost = time.perf_counter() - begin
+            cache = analyser.cache
+            print(f'analysis {run}: {positions} positions, {workers:2d} workers {positions / cost:9.1f} positions/s  '
+                  f'cache {len(cache)} entries, hit rate {cache.hits / (cache.hits + cache.misses):.0%}')
+            measure(f'analysis.{run}.workers_{workers}', positions / cost, 'positions/s')
+
+
+def bench_eval(seed=2140, count=50, repeat=3):
+    """
+    check PatternEvaluator against the full scan evaluation over random move sequences with rollbacks,
+    then compare the evaluations per second of both (the incremental one includes its updates)
+    """
+    from Gobang_eval import PatternEvaluator, evaluate
+
+    # every sequence is a list of ('move', x, y) and ('rollback',) steps
+    sequences = []
+    for i in range(count):
+        rng = random.Random(seed + i)
+        game = random_game(seed + i)
+        steps = []
+        for _, x, y in game.get_record_move():
+            steps.append(('move', x, y))
+            if rng.random() < 0.2:
+                steps.append(('rollback',))
+                steps.append(('move', x, y))
+        sequences.append(steps)
+
+    def run(make_score):
+        results = []
+        for steps in sequences:
+            game = GoBang()
+            game.start_move()
+            score = make_score(game)
+            for step in steps:
+                if step[0] == 'move':
+                    game.move(step[1], step[2])
+                else:
+                    game.rollback()
+                results.append(score(game))
+        return results
+
+    evaluations = sum(len(steps) for steps in sequences)
+    checks = {
+        'full scan': lambda game: evaluate,
+        'incremental': lambda game: PatternEvaluator(game).evaluate,
+    }
+    expect = None
+    for name, make_score in checks.items():
+        best = None
+        for _ in range(repeat):
+            begin = time.perf_counter()
+            results = run(make_score)
+            cost = time.perf_counter() - begin
+            best = cost if best is None else min(best, cost)
+        if expect is None:
+            expect = results
+        elif results != expect:
+            raise AssertionError(f'{name} evaluation does not match the full scan')
+        print(f'eval {name:12s} {evaluations / best:12.0f} evaluations/s')
+        measure(f'eval.{name}', evaluations / best, 'evaluations/s')
+
+
+def interleave(black, white):
+    """
+    return the moves of a game from the chess of both players, black first
+    """
+    moves = []
+    for index, spot in enumerate(black):
+        moves.append(spot)
+        if index < len(white):
+            moves.append(white[index])
+    return moves
+
+
+# (name, moves, expected vcf result, expected vct result) of the threat solver puzzles
+THREAT_PUZZLES = [
+    ('double four', interleave([(7, 5), (7, 6), (7, 7), (8, 8), (9, 8), (10, 8)],
+                               [(7, 4), (11, 8), (0, 0), (0, 15), (15, 0), (15, 15)]), 'win', 'win'),
+    ('double three', interleave([(7, 6), (7, 7), (9, 8), (10, 8)],
+                                [(0, 0), (0, 15), (15, 0), (15, 15)]), 'no win', 'win'),
+    ('oblique double three', interleave([(6, 6), (7, 7), (9, 8), (10, 8), (4, 10)],
+                                        [(0, 0), (0, 15), (15, 0), (15, 15), (14, 14)]), 'no win', 'win'),
+    ('white vcf in 3', [(7, 7), (6, 9), (9, 6), (7, 9), (8, 9), (6, 8), (8, 7), (8, 10), (5, 7), (6, 7), (6, 6),
+                        (8, 8), (7, 5)], 'win', 'win'),
+    ('black vcf in 13', [(7, 7), (8, 9), (6, 6), (10, 5), (8, 8), (9, 9), (7, 9), (10, 9), (7, 8), (7, 6), (6, 10),
+                         (9, 7), (9, 8), (11, 9), (12, 9), (10, 8)], 'win', None),
+    ('opening', [(7, 7), (8, 8), (7, 8)], 'no win', None),
+    ('counter four', interleave([(7, 4), (7, 5), (7, 6), (5, 7), (6, 7), (8, 8), (9, 9)],
+                                [(7, 3), (7, 9), (7, 10), (7, 11), (0, 0), (2, 0), (14, 14)]), 'no win', None),
+]
+
+
+def bench_threats(ai_budget=5.0):
+    """
+    solve the threat puzzles with the VCF and VCT solvers and compare with the plain alpha-beta AI
+    a puzzle with None as the expected VCT result is only checked with VCF
+    """
+    from Gobang_ai import WIN_BOUND, AlphaBetaAI
+    from Gobang_vcf import ThreatSolver
+
+    for name, moves, expect_vcf, expect_vct in THREAT_PUZZLES:
+        line = f'{name:22s}'
+        for mode, expect in (('vcf', expect_vcf), ('vct', expect_vct)):
+            if expect is None:
+                continue
+            result = ThreatSolver(mode).solve(position(moves))
+            if result.result != expect:
+                raise AssertionError(f'{mode} of {name} is {result.result}, expected {expect}')
+            line += f'  {mode} {result.result:6s} {result.elapsed * 1000:8.1f} ms {result.nodes:6d} nodes'
+        if expect_vcf == 'win' or expect_vct == 'win':
+            search = AlphaBetaAI(time_budget=ai_budget).search(position(moves))
+            found = 'win' if search.score >= WIN_BOUND else 'no win'
+            line += f'  alpha-beta {found:6s} {search.elapsed * 1000:8.1f} ms depth {search.depth}'
+        print(line)
+
+
+def bench_tournament(games=200):
+    """
+    play the same random against greedy tournament with 1, 2, 4 ... processes up to the number of cores
+    and report games per second, the results must not depend on the number of processes
+    """
+    from Gobang_tournament import GreedyPolicy, RandomPolicy, run_tournament
+
+    players = [('random', RandomPolicy()), ('greedy', GreedyPolicy())]
+    cores = os.cpu_count() or 1
+    workers = 1
+    expect = None
+    base = None
+    while True:
+        begin = time.perf_counter()
+        results = sorted((result.game_id, result.winner, result.moves)
+                         for result in run_tournament(players, games, workers))
+        rate = games / (time.perf_counter() - begin)
+        if expect is None:
+            expect, base = results, rate
+        elif results != expect:
+            raise AssertionError(f'tournament with {workers} workers does not match 1 worker')
+        print(f'tournament {workers:3d} workers {rate:9.1f} games/s  speedup {rate / base:5.2f}')
+        measure(f'tournament.workers_{workers}', rate, 'games/s')
+        if workers >= cores:
+            break
+        workers = min(cores, workers * 2)
+
+
+def bench_records(seed=2140, count=2000, path='bench_records.gbr'):
+    """
+    write random games to a record file, then read them back as a stream, by game number through the index,
+    and rebuild GoBang objects from them with load_moves and with a replay through move
+    """
+    from Gobang_record import GameRecord, RecordIndex, read_records, write_records
+
+    games = [random_game(seed + i) for i in range(count)]
+    records = [GameRecord.from_game(game) for game in games]
+    moves = sum(len(record.moves) for record in records)
+    try:
+        begin = time.perf_counter()
+        write_records(path, records)
+        write_cost = time.perf_counter() - begin
+        size = os.path.getsize(path)
+
+        begin = time.perf_counter()
+        read = list(read_records(path))
+        read_cost = time.perf_counter() - begin
+        if read != records:
+            raise AssertionError('read_records does not match the written games')
+
+        begin = time.perf_counter()
+        with RecordIndex(path, save=False) as index:
+            index_cost = time.perf_counter() - begin
+            order = list(range(count))
+            random.Random(seed).shuffle(order)
+            begin = time.perf_counter()
+            for number in order:
+                if index[number] != records[number]:
+                    raise AssertionError(f'game {number} of the index does not match')
+            lookup_cost = time.perf_counter() - begin
+
+        begin = time.perf_counter()
+        loaded = [record.to_game() for record in read]
+        load_cost = time.perf_counter() - begin
+        begin = time.perf_counter()
+        for record in read:
+            game = GoBang()
+            game.start_move()
+            for x, y in record.moves:
+                game.move(x, y)
+        replay_cost = time.perf_counter() - begin
+        for game, original in zip(loaded, games):
+            if game.key() != original.key() or game.hash != original.hash or game.map != original.map:
+                raise AssertionError('load_moves does not rebuild the game')
+    finally:
+        for name in (path, path + '.idx'):
+            if os.path.exists(name):
+                os.remove(name)
+    print(f'records: {count} games, {moves} moves, {size} bytes, {size / count:.1f} bytes/game')
+    print(f'  write          {count / write_cost:12.0f} games/s')
+    print(f'  stream read    {count / read_cost:12.0f} games/s')
+    print(f'  build index    {index_cost * 1000:12.2f} ms')
+    print(f'  random access  {count / lookup_cost:12.0f} games/s')
+    print(f'  load_moves     {count / load_cost:12.0f} games/s')
+    print(f'  replay by move {count / replay_cost:12.0f} games/s')
+    measure('records.write', count / write_cost, 'games/s')
+    measure('records.read', count / read_cost, 'games/s')
+    measure('records.random_access', count / lookup_cost, 'games/s')
+
+
+def bench_replay(seed=2140, count=3000, path='bench_replay.gbr'):
+    """
+    replay a record file of random games with some broken ones: a plain loop with a new GoBang per game
+    against the batch replay, which reuses one GoBang per chunk, on each backend with one process
+    and with all the cores
+    the broken games must be found by every way
+    """
+    from Gobang_record import GameRecord, read_records, write_records
+    from Gobang_replay import ReplaySummary, replay_file
+
+    records = [GameRecord.from_game(random_game(seed + i)) for i in range(count)]
+    # a spot played twice, a wrong winner and a move after the end
+    records[10].moves.append(records[10].moves[0])
+    records[20].winner = -records[20].winner or 1
+    records[30].moves.append((15, 15) if (15, 15) not in records[30].moves else (0, 0))
+    broken = [10, 20, 30]
+    try:
+        write_records(path, records)
+        moves = sum(len(record.moves) for record in records)
+
+        print(f'replay: {count} games, {moves} moves')
+        cores = os.cpu_count() or 1
+        for backend in ('list', 'bitboard'):
+            begin = time.perf_counter()
+            naive = []
+            for number, record in enumerate(read_records(path)):
+                game = GoBang(record.map_size, backend)
+                game.start_move()
+                legal = all(game.move(x, y) >= 0 for x, y in record.moves)
+                if not legal or game.get_winner() != record.winner:
+                    naive.append(number)
+            naive_cost = time.perf_counter() - begin
+            if naive != broken:
+                raise AssertionError(f'the naive replay found {naive}')
+            print(f'  new GoBang per game, {backend:8s} {moves / naive_cost:12.0f} moves/s')
+            measure(f'replay.{backend}.naive', moves / naive_cost, 'moves/s')
+            for workers in sorted({1, cores}):
+                summary = ReplaySummary()
+                begin = time.perf_counter()
+                for stats in replay_file(path, workers=workers, backend=backend):
+                    summary.add(stats)
+                cost = time.perf_counter() - begin
+                if [stats.number for stats in summary.invalid] != broken:
+                    raise AssertionError(f'the batch replay with {workers} workers found {summary.invalid}')
+                print(f'  batch, {backend:8s} {workers:2d} workers {moves / cost:16.0f} moves/s')
+                name = f'replay.workers_{workers}' if backend == 'bitboard' else f'replay.{backend}.workers_{workers}'
+                measure(name, moves / cost, 'moves/s')
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def bench_dataset(seed=2140, counts=(500, 2000), directory='bench_dataset'):
+    """
+    export record files of random games as training samples on the 8 symmetries, with one process
+    and with all the cores, the memory peak of the main process must not grow with the number of games
+    """
+    import shutil
+    import tracemalloc
+    from Gobang_dataset import export_files
+    from Gobang_record import write_records
+
+    cores = os.cpu_count() or 1
+    try:
+        for count in counts:
+            path = f'{directory}-{count}.gbr'
+            write_records(path, (random_game(seed + i) for i in range(count)))
+            for workers in sorted({1, cores}):
+                tracemalloc.start()
+                begin = time.perf_counter()
+                games, samples = export_files([path], directory, shard_size=1 << 14, workers=workers)
+                cost = time.perf_counter() - begin
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                shutil.rmtree(directory)
+                print(f'dataset: {games:5d} games {samples:8d} samples, {workers:2d} workers '
+                      f'{samples / cost:10.0f} samples/s  memory peak {peak / 2 ** 20:6.1f} MB')
+                measure(f'dataset.{count}.workers_{workers}', samples / cost, 'samples/s')
+                measure(f'dataset.{count}.workers_{workers}.peak', peak / 2 ** 20, 'MB', False)
+            os.remove(path)
+    finally:
+        for count in counts:
+            if os.path.exists(f'{directory}-{count}.gbr'):
+                os.remove(f'{directory}-{count}.gbr')
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_batch(seed=2140, count=20000, repeat=3):
+    """
+    compare the NumPy batch check_win and winners of Gobang_batch with GoBang.check_win
+    on positions taken at random steps of random games
+    """
+    import numpy as np
+
+    import Gobang_batch
+
+    rng = random.Random(seed)
+    games = [random_game(seed + i) for i in range(200)]
+    positions = []
+    for _ in range(count):
+        game = rng.choice(games)
+        steps = rng.randint(1, game.get_steps())
+        position = GoBang()
+        position.load_moves([(x, y) for _, x, y in game.get_record_move()[:steps]])
+        positions.append(position)
+    boards = Gobang_batch.to_array(positions)
+    last_moves = np.array([position.get_last_move()[1:] for position in positions])
+
+    best = None
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        expect = [position.check_win() for position in positions]
+        cost = time.perf_counter() - begin
+        best = cost if best is None else min(best, cost)
+    print(f'batch: {count} positions, {sum(1 for value in expect if value)} of them are won')
+    print(f'  GoBang.check_win     {count / best:12.0f} positions/s')
+
+    for name, run in (('batch check_win', lambda: Gobang_batch.check_win(boards, last_moves)),
+                      ('batch winners', lambda: Gobang_batch.winners(boards)),
+                      ('winners + legal', lambda: Gobang_batch.analyse(boards)[0])):
+        best = None
+        for _ in range(repeat):
+            begin = time.perf_counter()
+            result = run()
+            cost = time.perf_counter() - begin
+            best = cost if best is None else min(best, cost)
+        if result.tolist() != expect:
+            raise AssertionError(f'{name} does not match GoBang.check_win')
+        print(f'  {name:20s} {count / best:12.0f} positions/s')
+        measure(f'batch.{name.replace(" ", "_")}', count / best, 'positions/s')
+
+
+def headless_window(seed=2140):
+    """
+    return a GameGoBang window on the SDL dummy drivers, the background is chosen with the seed
+    """
+    import warnings
+    warnings.filterwarnings('ignore', module='pygame')
+    import Gobang_profile
+    return Gobang_profile.headless_window(seed)
+
+
+def legacy_redraw(window, pygame):
+    """
+    the full redraw as it was before the cached surfaces:
+    decode the picture, make the fonts, draw the lines, numbers, chess and panel again and update the whole window
+    """
+    from Gobang_main import Color
+    window.screen.blit(pygame.image.load(window.picture), (0, 0))
+    s_font = pygame.font.SysFont('arial', 16)
+    for item in range(0, window.SIZE):
+        start = window.width + item * window.unit
+        end = window.width + (window.SIZE - 1) * window.unit
+        pygame.draw.line(window.screen, Color().BLACK, [window.width, start], [end, start], 1)
+        window.screen.blit(s_font.render(f'{item + 1}', True, Color().BLACK), [window.width - 30, start - 10])
+        pygame.draw.line(window.screen, Color().BLACK, [start, window.width], [start, end], 1)
+        window.screen.blit(s_font.render(f'{item + 1}', True, Color().BLACK), [start - 5, window.width - 30])
+    for piece, x, y in window.get_record_move():
+        window.stone_draw(piece, x, y)
+    legacy_panel(window, pygame)
+    pygame.display.update()
+
+
+def legacy_panel(window, pygame):
+    """
+    the panel as it was drawn before: a new font, the white area, the texts and the three buttons every time
+    """
+    from Gobang_main import Color
+    pygame.draw.rect(window.screen, Color().WHITE, [window.PANEL_X[0] + 30, 0, 1000, 1000])
+    font = pygame.font.SysFont('simhei', 20)
+    window.screen.blit(font.render('wait for black player..', False, Color().BLACK),
+                       [window.PANEL_X[0] + 50, window.PANEL_Y[0] + 50])
+    window.screen.blit(font.render(f'Steps: {window.get_steps()}', False, Color().BLACK),
+                       [window.PANEL_X[0] + 50, window.PANEL_Y[0] + 150])
+    for index, name in enumerate(('New Round', 'EXIT', 'Undo')):
+        top = window.PANEL_Y[0] + 400 + index * 70
+        pygame.draw.rect(window.screen, Color().BLACK, [window.PANEL_X[0] + 50, top, 150, 50])
+        window.screen.blit(font.render(name, False, Color().WHITE), [window.PANEL_X[0] + 85, top + 15])
+
+
+def bench_render(seed=2140, moves=100, idle=1.0):
+    """
+    compare the window drawing before and after the cached surfaces and dirty rectangles:
+    the full redraw (done by every undo), the frame of one move, and the CPU time of the main loop when nobody plays
+    it uses the SDL dummy drivers, so only the drawing and the copies are measured, not the display itself
+    """
+    window = headless_window(seed)
+    from Gobang_main import pygame
+    game = random_game(seed)
+    clicks = [(window.width + x * window.unit, window.width + y * window.unit)
+              for _, x, y in game.get_record_move()[:moves]]
+
+    def frames(draw, count):
+        begin = time.perf_counter()
+        for _ in range(count):
+            draw()
+        return (time.perf_counter() - begin) / count * 1000
+
+    window.start_move()
+    for pos in clicks:
+        window.done_move(pos)
+    window.display_update()
+    before = frames(lambda: legacy_redraw(window, pygame), 20)
+    after = frames(lambda: (window._GameGoBang__redraw_all(), window.display_update()), 20)
+    print(f'render: full redraw with {window.get_steps()} chess')
+    print(f'  before {before:8.3f} ms/frame   after {after:8.3f} ms/frame')
+    measure('render.full_redraw', after, 'ms', False)
+
+    def play(done_move):
+        window.clear()
+        window.start_move()
+        window._GameGoBang__redraw_all()
+        window.display_update()
+        begin = time.perf_counter()
+        for pos in clicks:
+            done_move(pos)
+        return (time.perf_counter() - begin) / len(clicks) * 1000
+
+    def legacy_move(pos):
+        s_x = round((pos[0] - window.width) / window.unit)
+        s_y = round((pos[1] - window.width) / window.unit)
+        window.move(s_x, s_y)
+        window.stone_draw(window.get_last_move()[0], s_x, s_y)
+        legacy_panel(window, pygame)
+        pygame.display.update()
+
+    def cached_move(pos):
+        window.done_move(pos)
+        window.display_update()
+
+    before = play(legacy_move)
+    after = play(cached_move)
+    print(f'render: one move')
+    print(f'  before {before:8.3f} ms/frame   after {after:8.3f} ms/frame')
+    measure('render.move', after, 'ms', False)
+
+    def idle_loop(step):
+        pygame.event.clear()
+        begin = time.perf_counter()
+        cpu = time.process_time()
+        loops = 0
+        while time.perf_counter() - begin < idle:
+            step()
+            loops += 1
+        return (time.process_time() - cpu) / (time.perf_counter() - begin) * 100, loops
+
+    def legacy_step():
+        pygame.event.get()
+        pygame.display.update()
+
+    def cached_step():
+        # the same as the main loop of GameGoBang.start, with a timeout so the measure ends
+        events = [pygame.event.wait(100)] + pygame.event.get()
+        window.loop_iteration(events)
+        window.clock.tick(window.FPS)
+
+    for name, step in (('before', legacy_step), ('after', cached_step)):
+        cpu, loops = idle_loop(step)
+        print(f'render: idle {name:6s} {cpu:6.1f} % of a core, {loops} loops in {idle:.1f} s')
+    measure('render.idle_cpu', cpu, '%', False)
+
+
+def bench_history(seed=2140, count=10, seeks=2000, map_size=30):
+    """
+    seek random steps of long random games with the snapshots of History and with walking only,
+    the positions must be the same; then compare the undo of the window (only the changed spot is drawn)
+    with the full redraw it used before
+    """
+    from Gobang_history import History
+
+    rng = random.Random(seed)
+    games = [random_game(seed + i, map_size) for i in range(count)]
+    targets = [(index, rng.randint(0, games[index].get_steps())) for index in
+               (rng.randrange(count) for _ in range(seeks))]
+    print(f'history: {count} games on {map_size}x{map_size}, '
+          f'{sum(game.get_steps() for game in games) / count:.0f} steps on average')
+    expect = None
+    for name, snapshot_every in (('walk', 1 << 30), ('snapshots', 32)):
+        histories = []
+        for game in games:
+            replay = GoBang(map_size)
+            replay.start_move()
+            history = History(replay, snapshot_every)
+            for _, x, y in game.get_record_move():
+                replay.move(x, y)
+            histories.append(history)
+        keys = []
+        begin = time.perf_counter()
+        for index, number in targets:
+            histories[index].seek(number)
+            keys.append(histories[index].game.hash)
+        cost = time.perf_counter() - begin
+        if expect is None:
+            expect = keys
+        status = 'same' if keys == expect else 'DIFFERENT'
+        print(f'  seek {name:10s} {cost / seeks * 1e6:9.1f} us/seek  {status}')
+        measure(f'history.seek_{name}', cost / seeks * 1e6, 'us', False)
+
+    window = headless_window(seed)
+    window.start_move()
+    game = random_game(seed)
+    for _, x, y in game.get_record_move()[:100]:
+        window.move(x, y)
+    window._GameGoBang__redraw_all()
+
+    def undo_redo(draw, count=50):
+        begin = time.perf_counter()
+        for _ in range(count):
+            window.history.undo()
+            draw()
+            window.display_update()
+            window.history.redo()
+            draw()
+            window.display_update()
+        return (time.perf_counter() - begin) / (count * 2) * 1000
+
+    before = undo_redo(window._GameGoBang__redraw_all)
+    after = undo_redo(window.history_draw)
+    print(f'history: undo/redo of the window with {window.get_steps()} chess')
+    print(f'  full redraw {before:8.3f} ms/step   changed spots {after:8.3f} ms/step')
+    measure('history.undo_redo', after, 'ms', False)
+
+
+def bench_server(pairs=20, games=5):
+    """
+    run the load test of Gobang_server: pairs of clients play random games on a loopback server
+    the server runs in the same event loop as the clients, so the numbers are a lower bound of a server on its own core
+    """
+    import asyncio
+
+    from Gobang_server import GameServer, load_test, percentile
+
+    async def run():
+        server = GameServer(port=0)
+        await server.start()
+        try:
+            return await load_test(server.host, server.port, pairs, games)
+        finally:
+            await server.close()
+
+    moves, elapsed, latencies, events = asyncio.run(run())
+    print(f'server: {pairs * 2} clients, {pairs * games} games, {moves} moves, {events} events')
+    print(f'  {moves / elapsed:9.0f} moves/s   p50 {percentile(latencies, 0.5) * 1000:6.2f} ms   '
+          f'p99 {percentile(latencies, 0.99) * 1000:6.2f} ms')
+    measure('server.moves', moves / elapsed, 'moves/s')
+    measure('server.p99', percentile(latencies, 0.99) * 1000, 'ms', False)
+
+
+def bench_book(seed=2140, games=2000, lookups=20000):
+    """
+    build an opening book from tournament games, in small runs and in one run (the files must be the same),
+    then measure the lookups of positions from the games and of their symmetries
+    """
+    import tempfile
+
+    from Gobang_book import OpeningBook, build_book, symmetric_spot
+    from Gobang_record import read_records
+    from Gobang_tournament import GreedyPolicy, RandomPolicy, run_tournament, write_results
+
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'games.gbr')
+        players = [('random', RandomPolicy()), ('greedy', GreedyPolicy())]
+        for _ in write_results(run_tournament(players, games, workers=1, seed=seed), path):
+            pass
+        outputs = []
+        for name, run_entries in (('small runs', 4096), ('one run', 1 << 22)):
+            out = os.path.join(directory, f'{len(outputs)}.gbk')
+            begin = time.perf_counter()
+            total = build_book([path], out, max_plies=12, min_games=1, run_entries=run_entries)
+            cost = time.perf_counter() - begin
+            with open(out, 'rb') as file:
+                outputs.append(file.read())
+            print(f'book: build {name:10s} {total} entries, {os.path.getsize(out)} bytes, '
+                  f'{games * 12 / cost:9.0f} moves/s')
+        print(f'  the books are {"the same" if outputs[0] == outputs[1] else "DIFFERENT"}')
+
+        records = list(read_records(path))
+        positions = []
+        for _ in range(lookups):
+            moves = rng.choice(records).moves[:rng.randint(1, 10)]
+            symmetry = rng.randrange(8)
+            positions.append([(1 if index % 2 == 0 else -1,) + symmetric_spot(x, y, 16, symmetry)
+                              for index, (x, y) in enumerate(moves)])
+        with OpeningBook(out) as book:
+            begin = time.perf_counter()
+            found = sum(1 for record in positions if book.lookup_moves(record))
+            cost = time.perf_counter() - begin
+        print(f'  lookup {lookups / cost:9.0f} positions/s, {found} of {lookups} found')
+    measure('book.lookup', lookups / cost, 'positions/s')
+
+
+def bench_hooks(seed=2140, count=200, repeat=3):
+    """
+    replay random games with move + check_win + rollback: without hooks, with the hooks enabled,
+    and after they are disabled again, which must cost the same as without hooks
+    """
+    import Gobang_profile
+
+    games = [random_game(seed + i) for i in range(count)]
+    moves = [[(x, y) for _, x, y in game.get_record_move()] for game in games]
+    total = sum(len(line) for line in moves)
+
+    def run():
+        best = None
+        for _ in range(repeat):
+            game = GoBang()
+            begin = time.perf_counter()
+            for line in moves:
+                game.start_move()
+                for x, y in line:
+                    game.move(x, y)
+                while game.rollback() == 0:
+                    pass
+            cost = time.perf_counter() - begin
+            best = cost if best is None else min(best, cost)
+        return best
+
+    # the first run warms up the caches
+    run()
+    before = run()
+    Gobang_profile.enable()
+    enabled = run()
+    Gobang_profile.disable()
+    after = run()
+    print(f'hooks: {total} moves and rollbacks')
+    for name, cost in (('no hooks', before), ('enabled', enabled), ('disabled', after)):
+        print(f'  {name:10s} {total / cost:10.0f} moves/s  {cost / before * 100 - 100:+6.1f} %')
+    print(Gobang_profile.report())
+
+
+def bench_engine(seed=2140, count=100, repeat=5):
+    """
+    move + check_win throughput of both backends on random games, on long games of a 30x30 board
+    and on full 16x16 boards without 5 links (every move is checked on crowded lines), then the cost of rollback
+    """
+    sets = {
+        'random': [random_game(seed + i) for i in range(count)],
+        'long': [random_game(seed + i, 30) for i in range(count // 5)],
+        'full': [dense_position(seed + i) for i in range(count // 5)],
+    }
+    for name, games in sets.items():
+        lines = [(game.map_size, [(x, y) for _, x, y in game.get_record_move()]) for game in games]
+        moves = sum(len(line) for _, line in lines)
+        for backend in GoBang.BACKENDS:
+            best_move = best_rollback = None
+            # the first round warms up the caches and is not counted
+            for round_number in range(repeat + 1):
+                played = [GoBang(size, backend) for size, _ in lines]
+                begin = time.perf_counter()
+                for game, (_, line) in zip(played, lines):
+                    game.start_move()
+                    for x, y in line:
+                        game.move(x, y)
+                move_cost = time.perf_counter() - begin
+                begin = time.perf_counter()
+                for game in played:
+                    while game.rollback() == 0:
+                        pass
+                rollback_cost = time.perf_counter() - begin
+                if round_number == 0:
+                    continue
+                best_move = move_cost if best_move is None else min(best_move, move_cost)
+                best_rollback = rollback_cost if best_rollback is None else min(best_rollback, rollback_cost)
+            print(f'engine {name:6s} {backend:8s} {len(games):4d} games {moves / len(games):6.1f} moves/game  '
+                  f'move+check_win {moves / best_move:10.0f} moves/s  rollback {best_rollback / moves * 1e6:6.2f} us')
+            measure(f'engine.{name}.{backend}.move', moves / best_move, 'moves/s')
+            measure(f'engine.{name}.{backend}.rollback', best_rollback / moves * 1e6, 'us', False)
+
+
+def rule_game(seed, map_size, rule):
+    """
+    play a random game with the rule on the 15x15 spots at the center of the board, so the lines around
+    the moves are as crowded on every board size, the forbidden moves are skipped
+    return the list of (x, y) moves
+    """
+    rng = random.Random(seed)
+    game = GoBang(map_size, rule=rule)
+    game.start_move()
+    low = (map_size - 15) // 2
+    spots = [(x, y) for x in range(low, low + 15) for y in range(low, low + 15)]
+    rng.shuffle(spots)
+    for x, y in spots:
+        game.move(x, y)
+        if game.get_current_status() >= 3:
+            break
+    return [(x, y) for _, x, y in game.get_record_move()]
+
+
+def bench_rules(seed=2140, count=40, repeat=3, sizes=(15, 19, 30, 60, 100)):
+    """
+    move + win check (+ forbidden check for renju) of every rule and backend on growing board sizes,
+    the games are played on the center of the board so only the board size changes
+    the cost per move must stay flat, the last column is the cost compared with the smallest board
+    """
+    from Gobang_rules import RULES
+
+    for rule in RULES:
+        for backend in GoBang.BACKENDS:
+            first = None
+            for size in sizes:
+                lines = [rule_game(seed + i, size, rule) for i in range(count)]
+                moves = sum(len(line) for line in lines)
+                best = None
+                # the first round warms up the caches and is not counted
+                for round_number in range(repeat + 1):
+                    played = [GoBang(size, backend, rule) for _ in lines]
+                    begin = time.perf_counter()
+                    for game, line in zip(played, lines):
+                        game.start_move()
+                        for x, y in line:
+                            game.move(x, y)
+                    cost = time.perf_counter() - begin
+                    if round_number:
+                        best = cost if best is None else min(best, cost)
+                per_move = best / moves * 1e6
+                first = per_move if first is None else first
+                print(f'rules {rule:9s} {backend:8s} {size:3d}x{size:<3d} {per_move:6.2f} us/move  '
+                      f'{per_move / first:5.2f}x')
+                measure(f'rules.{rule}.{backend}.{size}', per_move, 'us', False)
+
+
+def rss_megabytes():
+    """
+    return the resident memory of this process in MB, the peak of it where /proc is missing
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_window(seed=2140, repeat=5, rounds=500):
+    """
+    the cost of building a GameGoBang window in a process where pygame is loaded already (a new round),
+    and of what the asset cache saves: the picture, the five sounds, the window itself
+    then many New Rounds: their cost and the memory of the process, which must not grow
+    """
+    from Gobang_main import Bgm, GameGoBang
+
+    window = headless_window(seed)
+    from Gobang_main import pygame
+
+    def best(run):
+        costs = []
+        for _ in range(repeat):
+            begin = time.perf_counter()
+            run()
+            costs.append(time.perf_counter() - begin)
+        return min(costs) * 1000
+
+    parts = {
+        'picture': lambda: pygame.image.load(window.picture).convert(),
+        'sounds': lambda: [pygame.mixer.Sound(Bgm(name).get_voice()) for name in ('p1', 'p2', 'win', 'error', 'newgame')],
+        'set_mode': lambda: pygame.display.set_mode((window.WINDOW_WIDTH, window.WINDOW_HEIGHT)),
+        'GameGoBang': GameGoBang,
+    }
+    for name, run in parts.items():
+        cost = best(run)
+        print(f'window {name:12s} {cost:9.3f} ms{"  (without the asset cache)" if name != "GameGoBang" else ""}')
+        measure(f'window.{name}', cost, 'ms', False)
+
+    # New Round as the button does it, with a few moves in each round
+    rng = random.Random(seed)
+    window.refresh_game()
+    before = rss_megabytes()
+    costs = []
+    for number in range(rounds):
+        for _ in range(5):
+            window.move(rng.randrange(window.map_size), rng.randrange(window.map_size))
+        begin = time.perf_counter()
+        window.refresh_game()
+        costs.append(time.perf_counter() - begin)
+        if number == rounds // 10:
+            # the first rounds fill the cache with the other pictures
+            before = rss_megabytes()
+    after = rss_megabytes()
+    costs.sort()
+    print(f'window new round  p50 {costs[len(costs) // 2] * 1000:7.3f} ms  max {costs[-1] * 1000:7.3f} ms, '
+          f'memory {before:.1f} MB -> {after:.1f} MB after {rounds} rounds')
+    measure('window.new_round', costs[len(costs) // 2] * 1000, 'ms', False)
+    measure('window.round_memory', after - before, 'MB', False)
+
+
+def bench_clicks(seed=2140, rounds=20):
+    """
+    replay a scripted click stream (moves and undos) through the main loop iteration of a headless window
+    and report the clicks per second and the latency of done_move and of each loop iteration
+    """
+    import Gobang_profile
+
+    window = headless_window(seed)
+    Gobang_profile.reset()
+    Gobang_profile.enable(['done_move', 'loop_iteration'])
+    try:
+        begin = time.perf_counter()
+        clicks = Gobang_profile.scripted_game(window, rounds, seed=seed)
+        elapsed = time.perf_counter() - begin
+    finally:
+        Gobang_profile.disable()
+    stats = Gobang_profile.stats()
+    print(f'clicks: {clicks} clicks in {rounds} games, {clicks / elapsed:9.0f} clicks/s')
+    measure('clicks.rate', clicks / elapsed, 'clicks/s')
+    for name, value in stats.items():
+        print(f'  {name:16s} p50 {value["p50_us"]:9.1f} us  p99 {value["p99_us"]:9.1f} us  max {value["max_us"]:9.1f} us')
+        measure(f'clicks.{name}.p99', value['p99_us'], 'us', False)
+    Gobang_profile.reset()
+
+
+def bench_players(seed=2140, moves=6, time_budget=0.5):
+    """
+    a human against the ai in a headless window: the frames of the main loop while the ai thinks in its worker
+    process must stay at the frame rate, and an undo during the search must cancel it at once
+    """
+    from Gobang_players import make_player
+
+    window = headless_window(seed)
+    from Gobang_main import pygame
+    window.set_players((make_player('human'), make_player('ai', time_budget)))
+    window.start_move()
+    rng = random.Random(seed)
+    frames = []
+    cancels = []
+    for step in range(moves):
+        spots = [(x, y) for x in range(5, 11) for y in range(5, 11) if window.board.get(x, y) == 0]
+        x, y = rng.choice(spots)
+        click = pygame.event.Event(pygame.MOUSEBUTTONUP, pos=(window.width + x * window.unit,
+                                                              window.width + y * window.unit), button=1)
+        window.loop_iteration([click])
+        if step % 2:
+            # take the move back while the ai thinks, then play it again
+            begin = time.perf_counter()
+            window.undo_chess()
+            cancels.append(time.perf_counter() - begin)
+            window.loop_iteration([click])
+        last = time.perf_counter()
+        while window.thinking is not None:
+            window.loop_iteration([pygame.event.wait(1000 // window.FPS)] + pygame.event.get())
+            window.clock.tick(window.FPS)
+            now = time.perf_counter()
+            frames.append(now - last)
+            last = now
+        if window.get_current_status() >= 3:
+            break
+    window.set_players(window.players[:1] * 2)
+    frames.sort()
+    p50 = frames[len(frames) // 2] * 1000
+    p99 = frames[min(len(frames) - 1, len(frames) * 99 // 100)] * 1000
+    print(f'players: {len(frames)} frames while the ai thought, frame p50 {p50:6.1f} ms  p99 {p99:6.1f} ms  '
+          f'max {frames[-1] * 1000:6.1f} ms (the frame rate is {window.FPS}/s)')
+    print(f'players: cancel on undo {sum(cancels) / len(cancels) * 1000:6.1f} ms mean  '
+          f'{max(cancels) * 1000:6.1f} ms max')
+    measure('players.frame.p99', p99, 'ms', False)
+    measure('players.cancel', max(cancels) * 1000, 'ms', False)
+
+
+def bench_input(seed=2140, moves=5000, undo_every=5, path='bench_input.gbi'):
+    """
+    replay a recorded session of moves clicks and an undo every undo_every moves in a headless window,
+    twice: the handling time of each event, its drift from the first block of events to the last one,
+    and the two replays must end on the same position
+    """
+    headless_window(seed)
+    from Gobang_input import replay_input, write_session
+
+    try:
+        events = write_session(path, moves, undo_every, seed)
+        size = os.path.getsize(path)
+        reports = [replay_input(path) for _ in range(2)]
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+    report = reports[-1]
+    total = report.total.to_dict()
+    print(f'input: {events} events in {size} bytes, {report.events / report.elapsed:8.0f} events/s  '
+          f'p99 {total["p99_us"]:7.1f} us  drift {report.get_drift():.2f}  '
+          f'deterministic {reports[0].digest == reports[1].digest}')
+    for name, histogram in report.histograms.items():
+        print(f'input {name:6s}: {histogram.calls:6d} events  mean {histogram.to_dict()["mean_us"]:8.1f} us')
+    measure('input.events', report.events / report.elapsed, 'events/s')
+    measure('input.p99', total['p99_us'], 'us', False)
+    measure('input.drift', report.get_drift(), 'x', False)
+
+
+BENCHMARKS = {
+    'engine': bench_engine,
+    'rules': bench_rules,
+    'check_win': bench_check_win,
+    'backends': bench_backends,
+    'startup': bench_startup,
+    'window': bench_window,
+    'eval': bench_eval,
+    'ai': bench_ai,
+    'ponder': bench_ponder,
+    'analysis': bench_analysis,
+    'threats': bench_threats,
+    'tournament': bench_tournament,
+    'records': bench_records,
+    'replay': bench_replay,
+    'batch': bench_batch,
+    'dataset': bench_dataset,
+    'render': bench_render,
+    'clicks': bench_clicks,
+    'players': bench_players,
+    'input': bench_input,
+    'history': bench_history,
+    'server': bench_server,
+    'book': bench_book,
+    'hooks': bench_hooks,
+}
+
+
+def compare(old, new, tolerance):
+    """
+    return the lines of the measures of new which are worse than in old by more than tolerance (0.1 is 10 %)
+    """
+    lines = []
+    for name, value in new.items():
+        before = old.get(name)
+        if before is None or not before['value']:
+            continue
+        change = value['value'] / before['value'] - 1
+        worse = -change if value['higher_is_better'] else change
+        if worse > tolerance:
+            lines.append(f'{name:40s} {before["value"]:12.3f} -> {value["value"]:12.3f} {value["unit"]}'
+                         f'  {worse * 100:5.1f} % worse')
+    return lines
+
+
+def git_commit():
+    try:
+        output = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        return output.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GoBang benchmarks')
+    parser.add_argument('names', nargs='*', help=f'the benchmarks to run, all by default: {" ".join(BENCHMARKS)}')
+    parser.add_argument('--json', default=None, help='save the measures to this JSON file')
+    parser.add_argument('--compare', default=None, help='a JSON file of an older run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='the change which is a regression, 0.1 is 10 %%')
+    args = parser.parse_args()
+
+    # the window benchmarks never need a display or a sound card
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+    for name in args.names or list(BENCHMARKS):
+        BENCHMARKS[name]()
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'results': RESULTS,
+            }, file, indent=1)
+    if args.compare:
+        with open(args.compare) as file:
+            old = json.load(file)['results']
+        regressions = compare(old, RESULTS, args.tolerance)
+        print(f'{len(regressions)} regressions against {args.compare}')
+        for line in regressions:
+            print(f'  {line}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+"""
+Shared data of the checks, run them with python -m pytest
+"""
+import pytest
+
+
+@pytest.fixture
+def renju_double_three():
+    """
+    the moves of a 15 x 15 game where black makes a double three at (7, 7), it is forbidden in renju
+    """
+    return [(7, 5), (0, 0), (7, 6), (0, 14), (5, 7), (14, 0), (6, 7), (14, 14)]
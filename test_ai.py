@@ -0,0 +1,22 @@
+"""
+Checks of the computer player, run them with python -m pytest
+"""
+from Gobang_ai import AlphaBetaAI
+from Gobang_core import GoBang
+
+
+def renju_position(backend, moves):
+    game = GoBang(15, backend, 'renju')
+    game.start_move()
+    for x, y in moves:
+        assert game.move(x, y) == 0
+    return game
+
+
+def test_renju_search_skips_forbidden_spots(renju_double_three):
+    for backend in GoBang.BACKENDS:
+        game = renju_position(backend, renju_double_three)
+        assert game.rule.is_forbidden(game.board, 7, 7, 1)
+        result = AlphaBetaAI(time_budget=0.3).search(game)
+        assert result.move is not None and result.move != (7, 7)
+        assert game.copy().move(result.move[0], result.move[1]) >= 0
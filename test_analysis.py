@@ -0,0 +1,25 @@
+"""
+Checks of the position analysis, run them with python -m pytest
+"""
+from Gobang_analysis import Analyser, analyse_games
+
+
+def test_renju_analysis_never_ranks_a_forbidden_move(renju_double_three):
+    analyser = Analyser(multi_pv=3, depth=2)
+    analysis = analyser.analyse_moves(renju_double_three, 15, 'renju')
+    assert analysis.moves and analysis.rank((7, 7)) is None
+
+    # the same position in a batch, as the last one of a game
+    game = (renju_double_three + [(7, 8)], 0, 15)
+    analyses = next(analyse_games([game], Analyser(multi_pv=3, depth=2), 'renju'))
+    assert len(analyses) == len(game[0])
+    assert analyses[-1][1].moves and analyses[-1][1].rank((7, 7)) is None
+
+
+def test_batch_matches_single_positions():
+    moves = [(7, 7), (8, 8), (7, 8), (8, 7), (7, 9), (7, 6)]
+    batch = next(analyse_games([(moves, 0, 15)], Analyser(multi_pv=2, depth=2)))
+    for step, (move, analysis) in enumerate(batch):
+        single = Analyser(multi_pv=2, depth=2).analyse_moves(moves[:step], 15)
+        assert move == moves[step]
+        assert [candidate.move for candidate in analysis.moves] == [candidate.move for candidate in single.moves]
@@ -0,0 +1,14 @@
+"""
+Checks of the asset cache, run them with python -m pytest
+"""
+import Gobang_assets
+from Gobang_assets import LazySound
+
+
+def test_missing_sound_is_silent(capsys):
+    Gobang_assets.load_pygame()
+    sound = LazySound('no-such-sound.wav')
+    assert sound.play() is None
+    assert sound.play() is None
+    # the error is reported the first time only
+    assert capsys.readouterr().err.count('no-such-sound.wav') == 1
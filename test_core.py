@@ -0,0 +1,22 @@
+"""
+Checks of the rules of the game, run them with python -m pytest
+"""
+import pytest
+
+from Gobang_core import GoBang
+
+
+def test_map_of_the_bitboard_is_read_only():
+    game = GoBang(15, 'bitboard')
+    game.start_move()
+    game.move(7, 7)
+    assert game.map[7][7] == 1
+    with pytest.raises(TypeError):
+        game.map[8][8] = -1
+    game.board.set(8, 8, -1)
+    assert game.map[8][8] == -1
+
+    # the map of the list backend is the board itself
+    game = GoBang(15, 'list')
+    game.map[8][8] = -1
+    assert game.board.get(8, 8) == -1
@@ -0,0 +1,22 @@
+"""
+Checks of the training data export, run them with python -m pytest
+"""
+import os
+
+import pytest
+
+from Gobang_dataset import INDEX_NAME, ShardWriter, empty_samples, load_index
+
+
+def test_failed_export_has_no_index(tmp_path):
+    directory = str(tmp_path)
+    with ShardWriter(directory, map_size=5, shard_size=4) as writer:
+        writer.add(empty_samples(6, 5))
+    assert load_index(directory)['samples'] == 6
+
+    # the export fails in the middle: the index of the first one is gone and no new one is written
+    with pytest.raises(RuntimeError):
+        with ShardWriter(directory, map_size=5, shard_size=4) as writer:
+            writer.add(empty_samples(3, 5))
+            raise RuntimeError('the export failed')
+    assert not os.path.exists(os.path.join(directory, INDEX_NAME))
@@ -0,0 +1,29 @@
+"""
+Checks of the static evaluation, run them with python -m pytest
+"""
+import random
+
+import pytest
+
+from Gobang_core import GoBang
+from Gobang_eval import PatternEvaluator, evaluate
+
+
+@pytest.mark.parametrize('backend', GoBang.BACKENDS)
+def test_incremental_evaluation_matches_full_scan(backend):
+    for seed in range(20):
+        rng = random.Random(seed)
+        game = GoBang(16, backend)
+        game.start_move()
+        evaluator = PatternEvaluator(game)
+        spots = [(x, y) for x in range(16) for y in range(16)]
+        rng.shuffle(spots)
+        for x, y in spots:
+            game.move(x, y)
+            assert evaluator.evaluate(game) == evaluate(game)
+            if rng.random() < 0.2:
+                game.rollback()
+                assert evaluator.evaluate(game) == evaluate(game)
+                game.move(x, y)
+            if game.get_current_status() >= 3:
+                break
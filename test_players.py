@@ -0,0 +1,84 @@
+"""
+Checks of the worker process of the computer players, run them with python -m pytest
+"""
+import os
+import signal
+import threading
+import time
+
+from Gobang_core import GoBang
+from Gobang_players import Computer, Human, MoveWorker
+from Gobang_profile import headless_window
+
+
+class FailingPolicy:
+    def __call__(self, game):
+        raise RuntimeError('the policy failed')
+
+
+class SlowPolicy:
+    def __call__(self, game):
+        time.sleep(30)
+
+
+def started_game():
+    game = GoBang(15)
+    game.start_move()
+    game.move(7, 7)
+    return game
+
+
+def test_worker_survives_a_failing_policy_and_a_dead_process():
+    results = []
+    done = threading.Event()
+
+    def on_result(ticket, move, elapsed):
+        results.append((ticket, move))
+        done.set()
+
+    worker = MoveWorker(on_result)
+    try:
+        # the policy raises: the worker answers with a legal spot
+        worker.set_policy(0, FailingPolicy())
+        ticket = worker.think(0, started_game())
+        assert done.wait(10)
+        assert results[-1][0] == ticket and results[-1][1] is not None
+        done.clear()
+
+        # the process is killed during a search: the search ends without a move
+        worker.set_policy(0, SlowPolicy())
+        ticket = worker.think(0, started_game())
+        time.sleep(0.3)
+        os.kill(worker.process.pid, signal.SIGKILL)
+        assert done.wait(10)
+        assert results[-1] == (ticket, None) and worker.busy is None
+        done.clear()
+
+        # the next search starts a new process
+        worker.set_policy(0, FailingPolicy())
+        ticket = worker.think(0, started_game())
+        assert done.wait(10)
+        assert results[-1][0] == ticket and results[-1][1] is not None
+    finally:
+        worker.close()
+
+
+def test_window_plays_for_a_computer_without_a_move():
+    window = headless_window()
+    from Gobang_main import COMPUTER_MOVE, pygame
+    window.set_players((Human(), Computer(SlowPolicy())))
+    try:
+        window.start_round()
+        click = (window.width + 7 * window.unit, window.width + 7 * window.unit)
+        window.done_move(click)
+        assert window.get_steps() == 1 and window.thinking is not None
+        # the human can not play the color of the computer, even when it does not search
+        ticket = window.thinking
+        window.cancel_thinking()
+        assert window.done_move((click[0] + window.unit, click[1])) < 0 and window.get_steps() == 1
+        # the worker ended without a move: a legal spot is played for the computer
+        window.thinking = ticket
+        window.handle_event(pygame.event.Event(COMPUTER_MOVE, ticket=ticket, move=None, elapsed=0.0))
+        assert window.get_steps() == 2 and window.get_current_status() == 1
+    finally:
+        window.set_players((Human(), Human()))
@@ -0,0 +1,48 @@
+"""
+Checks of the game record files, run them with python -m pytest
+"""
+import os
+
+from Gobang_record import GameRecord, RecordIndex, read_records, write_records
+from Gobang_core import GoBang
+from Gobang_replay import replay_chunk, replay_game, replay_records
+
+
+def test_rules_are_saved_and_replayed(tmp_path):
+    path = str(tmp_path / 'games.gbr')
+    records = [GameRecord([(7, 7), (8, 8), (7, 8)], 0, 15, 'renju'),
+               GameRecord([(1, 1), (2, 2)], 0, 19, 'exact'),
+               GameRecord([(3, 3)], 0, 16)]
+    write_records(path, records)
+    assert list(read_records(path)) == records
+    assert [stats.is_valid() for stats in replay_records(read_records(path), workers=1)] == [True] * 3
+    assert read_records(path).__next__().to_game().rule.name == 'renju'
+
+
+def test_index_is_rebuilt_when_the_file_changes_with_the_same_size(tmp_path):
+    path = str(tmp_path / 'games.gbr')
+    write_records(path, [GameRecord([(1, 1)]), GameRecord([(2, 2), (3, 3)])])
+    with RecordIndex(path) as index:
+        assert index[1].moves == [(2, 2), (3, 3)]
+    size = os.path.getsize(path)
+    # the same bytes count with other game lengths, the modification time moves on
+    write_records(path, [GameRecord([(4, 4), (5, 5)]), GameRecord([(6, 6)])])
+    assert os.path.getsize(path) == size
+    status = os.stat(path)
+    os.utime(path, ns=(status.st_atime_ns, status.st_mtime_ns + 1000000))
+    with RecordIndex(path) as index:
+        assert index[0].moves == [(4, 4), (5, 5)] and index[1].moves == [(6, 6)]
+
+
+def test_reused_game_replays_like_a_new_one():
+    records = [GameRecord([(7, 7), (8, 8), (7, 8), (8, 7), (7, 9), (8, 6), (7, 10), (8, 5), (7, 11)], 1, 15),
+               GameRecord([(7, 7), (7, 7)], 0, 15),
+               GameRecord([(0, 0), (1, 1)], -1, 15),
+               GameRecord([(3, 3), (4, 4)], 0, 19, 'exact')]
+    for backend in GoBang.BACKENDS:
+        chunk = list(enumerate(records))
+        expect = [replay_game(number, record, backend) for number, record in chunk]
+        reused = replay_chunk(chunk, backend)
+        assert [(stats.steps, stats.winner, stats.error_step) for stats in reused] == \
+            [(stats.steps, stats.winner, stats.error_step) for stats in expect]
+        assert [stats.is_valid() for stats in reused] == [True, False, False, True]
@@ -0,0 +1,48 @@
+"""
+Checks of the game server, run them with python -m pytest
+"""
+import asyncio
+import json
+
+from Gobang_server import GameClient, GameServer
+
+
+async def seats_and_turns():
+    server = GameServer(port=0)
+    await server.start()
+    black = await GameClient.connect(port=server.port)
+    white = await GameClient.connect(port=server.port)
+    watcher = await GameClient.connect(port=server.port)
+    try:
+        reply = await black.request(op='new', size=15)
+        game_id = reply['game']
+        assert reply['seat'] == 'black'
+        assert (await white.request(op='join', game=game_id))['seat'] == 'white'
+        assert (await watcher.request(op='join', game=game_id))['seat'] is None
+
+        # only the seat of the player to move can play, and only its own last move can be undone
+        assert (await white.request(op='move', game=game_id, x=7, y=7))['error'] == 'not your turn'
+        assert (await watcher.request(op='move', game=game_id, x=7, y=7))['error'] == 'not your turn'
+        assert (await black.request(op='move', game=game_id, x=7, y=7))['ok']
+        assert not (await black.request(op='move', game=game_id, x=8, y=8))['ok']
+        assert not (await white.request(op='undo', game=game_id))['ok']
+        assert not (await watcher.request(op='undo', game=game_id))['ok']
+        assert (await black.request(op='undo', game=game_id))['ok']
+
+        # a free seat is taken by the next client which joins
+        await white.request(op='leave', game=game_id)
+        assert (await watcher.request(op='leave', game=game_id))['ok']
+        assert (await watcher.request(op='join', game=game_id))['seat'] == 'white'
+
+        # a reply to an id the client never sent is ignored and the client goes on
+        black.writer.write((json.dumps({'op': 'stats', 'id': 999}) + '\n').encode())
+        assert (await black.request(op='stats'))['ok']
+        assert not black.task.done()
+    finally:
+        for client in (black, white, watcher):
+            await client.close()
+        await server.close()
+
+
+def test_seats_and_turns():
+    asyncio.run(seats_and_turns())
@@ -0,0 +1,24 @@
+"""
+Checks of the tournament runner, run them with python -m pytest
+"""
+from Gobang_ai import AlphaBetaAI
+from Gobang_book import read_games
+from Gobang_tournament import GreedyPolicy, RandomPolicy, play_one, run_tournament, summary, write_results
+
+
+def test_results_of_big_boards_are_written_and_read_back(tmp_path):
+    path = str(tmp_path / 'games.jsonl')
+    players = [('random', RandomPolicy()), ('greedy', GreedyPolicy())]
+    results = list(write_results(run_tournament(players, 4, workers=1, map_size=19, rule='exact'), path))
+    assert [(moves, winner, size) for moves, winner, size in read_games(path)] == \
+        [(result.moves, result.winner, 19) for result in results]
+    scores, count, _ = summary(iter(results))
+    assert count == 4 and sum(sum(score) for score in scores.values()) == 8
+
+
+def test_ai_game_does_not_depend_on_the_games_before():
+    ai = ('ai', AlphaBetaAI(time_budget=float('inf'), max_depth=2))
+    greedy = ('greedy', GreedyPolicy())
+    first = play_one(0, ai, greedy, 5, max_steps=16).moves
+    play_one(1, ai, ('random', RandomPolicy()), 9, max_steps=24)
+    assert play_one(0, ai, greedy, 5, max_steps=16).moves == first
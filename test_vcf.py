@@ -0,0 +1,49 @@
+"""
+Checks of the threat-space solver, run them with python -m pytest
+"""
+import pytest
+
+from Gobang_core import GoBang
+from Gobang_vcf import NO_WIN, WIN, ThreatSolver, tag_record
+
+
+def game_after(moves, rule='freestyle'):
+    game = GoBang(15, rule=rule)
+    game.start_move()
+    for x, y in moves:
+        assert game.move(x, y) == 0
+    return game
+
+
+def test_vcf_finds_a_double_four():
+    # black has an open three on row 7 and can make a four on column 5 next to it
+    game = game_after([(7, 5), (0, 0), (7, 6), (0, 2), (7, 7), (0, 4), (4, 4), (0, 6), (5, 4), (0, 8),
+                       (6, 4), (0, 10)])
+    result = ThreatSolver('vcf').solve(game)
+    assert result.result == WIN
+
+
+def test_vcf_without_a_win():
+    # the three of black is closed by white on one end, its fours are blocked one by one
+    game = game_after([(7, 5), (7, 4), (7, 6), (0, 0), (7, 7), (14, 0)])
+    assert ThreatSolver('vcf').solve(game).result == NO_WIN
+
+
+def test_vcf_refuted_by_a_counter_four():
+    # black (7, 7) makes a four and two threes, but the forced block at (7, 8) makes a white four
+    black = [(7, 4), (7, 5), (7, 6), (5, 7), (6, 7), (8, 8), (9, 9)]
+    white = [(7, 3), (7, 9), (7, 10), (7, 11), (0, 0), (2, 0), (14, 14)]
+    game = game_after([move for pair in zip(black, white) for move in pair])
+    result = ThreatSolver('vcf').solve(game)
+    assert result.result != WIN
+    assert game.move(7, 7) == 0 and game.move(7, 8) == 0
+    assert ThreatSolver('vcf').solve(game).result != WIN
+
+
+@pytest.mark.parametrize('rule', ['renju', 'exact', 'caro'])
+def test_other_rules_are_refused(rule):
+    game = game_after([(7, 7), (8, 8)], rule)
+    with pytest.raises(ValueError):
+        ThreatSolver('vcf').solve(game)
+    with pytest.raises(ValueError):
+        tag_record([(1, 7, 7), (-1, 8, 8)], map_size=15, rule=rule)